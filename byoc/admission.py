@@ -0,0 +1,131 @@
+"""
+Controlo de admissão em /invocations: deadlines por pedido, load shedding e limite de linhas.
+
+- Deadline: BYOC_DEADLINE_MS (0 = sem deadline) ou o cliente, com o header X-Byoc-Deadline-Ms
+  ou "deadline_ms=N" nos custom attributes do SageMaker (o BYOC_DEADLINE_MS passa a ser o máximo).
+  Conta desde a chegada do pedido à app, ou desde o X-Request-Start de um proxy à frente
+  (ex.: nginx com "X-Request-Start: t=${msec}"): só com ele é que o tempo à espera no backlog do
+  socket e na fila do gunicorn conta. Um pedido cujo deadline já passou não é avaliado (504).
+  Em streaming, o deadline é verificado antes do primeiro chunk; depois de a resposta começar,
+  o stream corre até ao fim.
+- Shedding: com BYOC_MAX_INFLIGHT > 0, um worker com esse número de pedidos em curso responde
+  logo 503 + Retry-After, sem ler o body nem fazer parse. Só há pedidos concorrentes num worker
+  com mais threads do que o limite (gunicorn_conf.py passa então a 64 threads por omissão) ou
+  com o worker ASGI; com um worker sync de uma thread, o limite nunca é atingido.
+- BYOC_MAX_ROWS > 0 rejeita (413) pedidos com mais linhas; em streaming, conta as linhas chunk a
+  chunk e corta o pedido quando passam o limite.
+
+O --timeout do gunicorn (BYOC_TIMEOUT) continua a ser a última proteção, e mata o worker.
+"""
+import os
+import threading
+import time
+from typing import List, Optional, Tuple
+
+from payloads import parse_custom_attributes
+
+DEADLINE_MS = float(os.getenv("BYOC_DEADLINE_MS", "0"))
+MAX_INFLIGHT = int(os.getenv("BYOC_MAX_INFLIGHT", "0"))
+MAX_ROWS = int(os.getenv("BYOC_MAX_ROWS", "0"))
+RETRY_AFTER_S = os.getenv("BYOC_RETRY_AFTER_S", "1")
+
+DEADLINE_HEADER = "X-Byoc-Deadline-Ms"
+REQUEST_START_HEADER = "X-Request-Start"
+
+
+class Rejected(Exception):
+    """
+    Pedido recusado pela admissão; o servidor responde com status e headers.
+    """
+
+    status = 503
+
+    def headers(self) -> List[Tuple[str, str]]:
+        return [("Retry-After", RETRY_AFTER_S)]
+
+
+class Overloaded(Rejected):
+    pass
+
+
+class DeadlineExceeded(Rejected):
+    status = 504
+
+    def headers(self) -> List[Tuple[str, str]]:
+        return []
+
+
+class TooManyRows(Rejected):
+    status = 413
+
+    def headers(self) -> List[Tuple[str, str]]:
+        return []
+
+
+def request_start(now: float, header_value: Optional[str]) -> float:
+    """
+    Chegada do pedido em time.perf_counter: now recuado pelo tempo desde o X-Request-Start
+    (epoch em segundos, ms ou µs, com ou sem "t="). Sem header ou com um valor inválido, now.
+    """
+    if not header_value:
+        return now
+    value = header_value.strip()
+    try:
+        start = float(value[2:] if value.startswith("t=") else value)
+    except ValueError:
+        return now
+    while start > 1e11:
+        start /= 1000
+    # relógios desacertados entre proxy e container não podem adiantar a chegada
+    return now - max(0.0, time.time() - start)
+
+
+def request_deadline(t0: float, header_value: Optional[str], custom_attributes: str = "") -> Optional[float]:
+    """
+    Instante (time.perf_counter) a partir do qual o pedido já não vale a pena, ou None.
+    """
+    value = header_value or parse_custom_attributes(custom_attributes).get("deadline_ms")
+    budget_ms = DEADLINE_MS
+    if value:
+        try:
+            client_ms = float(value)
+        except ValueError:
+            client_ms = -1.0
+        if not client_ms > 0:
+            raise ValueError(f"Invalid deadline: {value!r} (expected milliseconds > 0)")
+        budget_ms = min(client_ms, DEADLINE_MS) if DEADLINE_MS > 0 else client_ms
+    return t0 + budget_ms / 1000 if budget_ms > 0 else None
+
+
+def check_deadline(deadline: Optional[float], stage: str):
+    if deadline is not None and time.perf_counter() >= deadline:
+        raise DeadlineExceeded(f"Deadline exceeded before {stage}")
+
+
+def check_rows(n_rows: int, max_rows: int = MAX_ROWS):
+    if max_rows > 0 and n_rows > max_rows:
+        raise TooManyRows(f"Request has {n_rows} rows, limit is {max_rows}")
+
+
+class InflightLimiter:
+    """
+    Conta os pedidos em curso num worker; try_acquire() falha acima do limite (0 = sem limite).
+    """
+
+    def __init__(self, limit: int = MAX_INFLIGHT):
+        self.limit = limit
+        self.inflight = 0
+        self.shed = 0
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            if 0 < self.limit <= self.inflight:
+                self.shed += 1
+                return False
+            self.inflight += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self.inflight -= 1
@@ -0,0 +1,148 @@
+"""
+App ASGI (asyncio) com o mesmo contrato que wsgi.py: /ping e /invocations sobre os handlers de inference.py.
+
+O scoring (input_fn + predict_fn + output_fn) corre num executor limitado, fora do event loop,
+pelo que o /ping responde mesmo com o scoring saturado. Pedidos acima de BYOC_ASGI_MAX_PENDING
+em espera/execução levam 503 imediato em vez de ficarem em fila; deadlines e limite de linhas
+como no WSGI (ver admission.py).
+
+Corre com: BYOC_SERVER=asgi serve (gunicorn + uvicorn.workers.UvicornWorker).
+"""
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import admission
+import inference
+import metrics
+import profiler
+from wsgi import ensure_watcher, extra_gauges, get_model, invoke, start_profile
+
+EXECUTOR_THREADS = int(os.getenv("BYOC_ASGI_EXECUTOR_THREADS", "2"))
+MAX_PENDING = int(os.getenv("BYOC_ASGI_MAX_PENDING", "64"))
+
+_executor = None
+_pending = 0
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    # criado já dentro do worker (depois do fork)
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=EXECUTOR_THREADS, thread_name_prefix="byoc-score")
+    return _executor
+
+
+async def _respond(send, status: int, body, content_type: str = "text/plain", headers=()):
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", content_type.encode("latin-1")),
+            (b"content-length", str(len(body)).encode("latin-1")),
+            *((k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _read_body(receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            return b"".join(chunks)
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            loop = asyncio.get_running_loop()
+            try:
+                await loop.run_in_executor(_get_executor(), get_model)
+                ensure_watcher()
+            except Exception as e:
+                # o /ping fica a 503 e volta a tentar
+                inference.log_event("model_load_failed", error=str(e))
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            if _executor is not None:
+                _executor.shutdown(wait=False)
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    global _pending
+
+    if scope["type"] == "lifespan":
+        return await _lifespan(receive, send)
+    if scope["type"] != "http":
+        return
+
+    path = scope.get("path", "")
+    method = scope.get("method", "GET")
+    headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope.get("headers", [])}
+    loop = asyncio.get_running_loop()
+
+    if path == "/ping":
+        # nunca passa pelo executor do scoring
+        try:
+            await loop.run_in_executor(None, get_model)
+        except Exception as e:
+            return await _respond(send, 503, str(e))
+        return await _respond(send, 200, "")
+
+    if path == "/metrics" and method == "GET":
+        return await _respond(send, 200, metrics.render(extra_gauges()), "text/plain; version=0.0.4")
+
+    if path == "/admin/profile" and method == "POST":
+        return await _respond(send, *start_profile(scope.get("query_string", b"").decode("latin-1")))
+
+    if path == "/invocations" and method == "POST":
+        t0 = time.perf_counter()
+        timings = {}
+        if _pending >= MAX_PENDING:
+            timings["total"] = time.perf_counter() - t0
+            metrics.record_request(503, timings, 0, 0, 0)
+            return await _respond(send, 503, "Too many pending requests", headers=admission.Overloaded().headers())
+
+        _pending += 1
+        rows = 0
+        body = b""
+        extra_headers = []
+        try:
+            body = await _read_body(receive)
+            content_type = headers.get("content-type", "")
+            accept = headers.get("accept") or "application/json"
+            custom_attributes = headers.get("x-amzn-sagemaker-custom-attributes", "")
+            # o tempo à espera no executor conta para o deadline (e o anterior, com X-Request-Start)
+            arrived = admission.request_start(t0, headers.get("x-request-start"))
+            deadline = admission.request_deadline(arrived, headers.get("x-byoc-deadline-ms"), custom_attributes)
+            out, out_type, rows, version = await loop.run_in_executor(
+                _get_executor(), invoke, body, content_type, accept, timings, custom_attributes, deadline)
+            extra_headers.append(("X-Byoc-Model-Version", version))
+            status = 200
+        except admission.Rejected as e:
+            status, out, out_type = e.status, str(e), "text/plain"
+            extra_headers += e.headers()
+        except ValueError as e:
+            status, out, out_type = 400, str(e), "text/plain"
+        except Exception as e:
+            status, out, out_type = 500, str(e), "text/plain"
+        finally:
+            _pending -= 1
+        timings["total"] = time.perf_counter() - t0
+
+        if isinstance(out, str):
+            out = out.encode("utf-8")
+        metrics.record_request(status, timings, rows, len(body), len(out))
+        profiler.request_finished()
+        return await _respond(send, status, out, out_type, extra_headers + metrics.timing_headers(timings))
+
+    return await _respond(send, 404, "Not Found")
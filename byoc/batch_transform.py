@@ -0,0 +1,115 @@
+"""
+Modo batch em streaming para ficheiros grandes (CSV ou JSON Lines, um registo por linha).
+
+Os registos são lidos em chunks de BYOC_STREAM_CHUNK_ROWS linhas, cada chunk passa por
+input_fn -> predict_fn -> output_fn e o resultado é escrito logo a seguir, pelo que a memória
+não depende do tamanho do ficheiro. A saída tem uma linha por registo de entrada, na mesma ordem,
+que é o que o batch transform espera com SplitType=Line / AssembleWith=Line.
+
+Usado pelo servidor (pedidos grandes em /invocations) e como CLI local, ficheiro a ficheiro:
+  python batch_transform.py --model-dir /opt/ml/model --input in.csv --output out.jsonl \
+      --content-type text/csv --accept application/jsonlines
+"""
+import argparse
+import os
+import time
+from typing import Iterable, Iterator, Tuple
+
+import admission
+import inference
+from payloads import JSONLINES_CONTENT_TYPES, parse_media_type
+
+STREAM_CHUNK_ROWS = int(os.getenv("BYOC_STREAM_CHUNK_ROWS", "10000"))
+
+LINE_CONTENT_TYPES = ("text/csv",) + JSONLINES_CONTENT_TYPES
+
+
+def is_line_format(content_type: str) -> bool:
+    return parse_media_type(content_type)[0] in LINE_CONTENT_TYPES
+
+
+def iter_chunks(lines: Iterable[bytes], chunk_rows: int = STREAM_CHUNK_ROWS) -> Iterator[Tuple[bytes, int]]:
+    """
+    Junta linhas em chunks de chunk_rows registos (linhas vazias ignoradas).
+    """
+    chunk = []
+    for line in lines:
+        if not line.strip():
+            continue
+        chunk.append(line if line.endswith(b"\n") else line + b"\n")
+        if len(chunk) >= chunk_rows:
+            yield b"".join(chunk), len(chunk)
+            chunk = []
+    if chunk:
+        yield b"".join(chunk), len(chunk)
+
+
+def stream_transform(lines: Iterable[bytes], content_type: str, accept: str, model,
+                     chunk_rows: int = STREAM_CHUNK_ROWS, stats: dict = None, max_rows: int = 0,
+                     deadline: float = None) -> Iterator[bytes]:
+    """
+    Avalia um stream de linhas chunk a chunk e devolve a saída (uma linha por registo) incrementalmente.
+    stats, se dado, acumula linhas e tempos por fase.
+    max_rows > 0 levanta admission.TooManyRows no chunk em que o total passa o limite; deadline
+    (time.perf_counter) é verificado antes do parse e do scoring do primeiro chunk.
+    """
+    if not is_line_format(accept):
+        raise ValueError(f"Streaming needs a line-based Accept ({', '.join(LINE_CONTENT_TYPES)}), got {accept}")
+    media = parse_media_type(content_type)[0]
+    if media not in LINE_CONTENT_TYPES:
+        raise ValueError(f"Streaming needs a line-based Content-Type ({', '.join(LINE_CONTENT_TYPES)}), "
+                         f"got {content_type}")
+
+    explain = inference.explain_top_k(accept)
+    total_rows = 0
+    for body, n_rows in iter_chunks(lines, chunk_rows):
+        total_rows += n_rows
+        admission.check_rows(total_rows, max_rows)
+        admission.check_deadline(deadline, "parsing")
+        t0 = time.perf_counter()
+        data = inference.input_fn(body, media)
+        t1 = time.perf_counter()
+        admission.check_deadline(deadline, "scoring")
+        # a resposta começa com este chunk: daqui em diante o stream corre até ao fim
+        deadline = None
+        prediction = inference.predict_fn(data, model, explain=explain)
+        t2 = time.perf_counter()
+        out, _ = inference.output_fn(prediction, accept)
+        if stats is not None:
+            stats["rows"] = stats.get("rows", 0) + n_rows
+            stats["input_fn"] = stats.get("input_fn", 0.0) + (t1 - t0)
+            stats["predict_fn"] = stats.get("predict_fn", 0.0) + (t2 - t1)
+            stats["output_fn"] = stats.get("output_fn", 0.0) + (time.perf_counter() - t2)
+        yield out.encode("utf-8") if isinstance(out, str) else out
+
+
+def parse_args():
+    p = argparse.ArgumentParser()
+    p.add_argument("--model-dir", type=str, default=os.getenv("SM_MODEL_DIR", "/opt/ml/model"))
+    p.add_argument("--input", type=str, required=True)
+    p.add_argument("--output", type=str, required=True)
+    p.add_argument("--content-type", type=str, default="text/csv")
+    p.add_argument("--accept", type=str, default="application/jsonlines")
+    p.add_argument("--chunk-rows", type=int, default=STREAM_CHUNK_ROWS)
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    model = inference.model_fn(args.model_dir)
+
+    stats = {}
+    t0 = time.perf_counter()
+    with open(args.input, "rb") as src, open(args.output, "wb") as dst:
+        for out in stream_transform(src, args.content_type, args.accept, model, args.chunk_rows, stats):
+            dst.write(out)
+    elapsed = time.perf_counter() - t0
+
+    rows = stats.get("rows", 0)
+    inference.log_event("batch_transform", input=args.input, output=args.output, rows=rows,
+                        elapsed_s=elapsed, rows_per_s=rows / elapsed if elapsed > 0 else None,
+                        **{k: v for k, v in stats.items() if k != "rows"})
+
+
+if __name__ == "__main__":
+    main()
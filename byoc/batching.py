@@ -0,0 +1,131 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from admission import DeadlineExceeded
+
+BATCH_ENABLED = os.getenv("BYOC_BATCH_ENABLED", "0") == "1"
+BATCH_MAX_ROWS = int(os.getenv("BYOC_BATCH_MAX_ROWS", "256"))
+BATCH_MAX_WAIT_US = int(os.getenv("BYOC_BATCH_MAX_WAIT_US", "1000"))
+
+
+def _slice_prediction(prediction: Dict, start: int, stop: int) -> Dict:
+    return {
+        k: (v[start:stop] if isinstance(v, np.ndarray) and v.ndim >= 1 else v)
+        for k, v in prediction.items()
+    }
+
+
+class Coalescer:
+    """
+    Junta pedidos concorrentes numa só matriz antes de chamar o predict.
+
+    Cada thread de pedido chama submit(X) e bloqueia; uma thread de fundo
+    acumula pedidos até max_rows linhas ou max_wait_us microssegundos desde
+    o primeiro, faz um único predict e devolve a cada um a sua fatia.
+    Pedidos cujo deadline passou enquanto esperavam saem do batch com DeadlineExceeded.
+    """
+
+    def __init__(self, predict: Callable[[np.ndarray], Dict],
+                 max_rows: int = BATCH_MAX_ROWS, max_wait_us: int = BATCH_MAX_WAIT_US):
+        self.predict = predict
+        self.max_rows = max_rows
+        self.max_wait = max_wait_us / 1_000_000
+        self._queue: "queue.Queue[Tuple[np.ndarray, Future, Optional[float]]]" = queue.Queue()
+        self._closed = False
+        self._closing = False
+        self._submit_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._loop, name="byoc-coalescer", daemon=True)
+        self._thread.start()
+
+    def submit(self, X: np.ndarray, deadline: Optional[float] = None) -> Dict:
+        # pedidos que já enchem um batch não ganham nada em esperar
+        if len(X) >= self.max_rows:
+            return self.predict(X)
+        fut: Future = Future()
+        with self._submit_lock:
+            if self._closing:
+                return self.predict(X)
+            self._queue.put((X, fut, deadline))
+        return fut.result()
+
+    def close(self):
+        """
+        Termina a thread depois de avaliar o que já está em fila.
+        """
+        with self._submit_lock:
+            self._closing = True
+            self._queue.put(None)
+
+    def _collect(self) -> List[Tuple[np.ndarray, Future, Optional[float]]]:
+        first = self._queue.get()
+        if first is None:
+            self._closed = True
+            return []
+        batch = [first]
+        rows = len(batch[0][0])
+        deadline = time.perf_counter() + self.max_wait
+        while rows < self.max_rows:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if item is None:
+                self._closed = True
+                break
+            batch.append(item)
+            rows += len(item[0])
+        return batch
+
+    def _loop(self):
+        while not self._closed:
+            batch = self._collect()
+            if not batch:
+                continue
+            try:
+                self._run(batch)
+            except Exception as e:  # nunca deixar a thread morrer
+                for _, fut, _ in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+
+    def _run(self, batch: List[Tuple[np.ndarray, Future, Optional[float]]]):
+        now = time.perf_counter()
+        expired = [item for item in batch if item[2] is not None and now >= item[2]]
+        if expired:
+            for _, fut, _ in expired:
+                fut.set_exception(DeadlineExceeded("Deadline exceeded while waiting for a batch"))
+            batch = [item for item in batch if not item[1].done()]
+            if not batch:
+                return
+
+        if len(batch) == 1:
+            X, fut, _ = batch[0]
+            fut.set_result(self.predict(X))
+            return
+
+        try:
+            X = np.vstack([x for x, _, _ in batch])
+        except ValueError:
+            # larguras diferentes: cada pedido é avaliado (e falha) sozinho
+            for x, fut, _ in batch:
+                try:
+                    fut.set_result(self.predict(x))
+                except Exception as e:
+                    fut.set_exception(e)
+            return
+
+        prediction = self.predict(X)
+        start = 0
+        for x, fut, _ in batch:
+            stop = start + len(x)
+            fut.set_result(_slice_prediction(prediction, start, stop))
+            start = stop
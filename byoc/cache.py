@@ -0,0 +1,126 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+CACHE_ENABLED = os.getenv("BYOC_CACHE_ENABLED", "0") == "1"
+CACHE_MAX_ENTRIES = int(os.getenv("BYOC_CACHE_MAX_ENTRIES", "100000"))
+CACHE_TTL_S = float(os.getenv("BYOC_CACHE_TTL_S", "300"))
+# lotes maiores do que isto não passam pela cache: o score do lote inteiro custa menos do que
+# procurar e guardar cada linha
+CACHE_MAX_BATCH_ROWS = int(os.getenv("BYOC_CACHE_MAX_BATCH_ROWS", "16"))
+
+
+def row_keys(X: np.ndarray) -> List[bytes]:
+    """
+    Uma chave por linha: os próprios bytes float64 da linha (8 bytes por feature).
+    Ver cada linha como um único valor np.void e fazer tolist() cria os bytes todos numa
+    passagem em C, sem hash por linha em Python; o dict faz o hash e a comparação é exata.
+    """
+    X = np.ascontiguousarray(X, dtype=np.float64)
+    return X.view(np.dtype((np.void, X.shape[1] * 8))).ravel().tolist()
+
+
+class PredictionCache:
+    """
+    Cache LRU com TTL de (pred, proba) por linha, com chave (versão do modelo, bytes da linha).
+
+    Durante um hot reload, ou com pedidos ainda na versão anterior, as versões alternam entre
+    pedidos: cada uma acerta nas suas entradas, e as da versão que deixou de ser usada saem
+    pelo LRU ou pelo TTL, sem limpar a cache a cada mudança.
+    """
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, ttl_s: float = CACHE_TTL_S):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self._entries: "OrderedDict[Tuple[str, bytes], tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expired = 0
+
+    def invalidate(self, reset_stats: bool = False):
+        with self._lock:
+            self._entries.clear()
+            if reset_stats:
+                self.hits = self.misses = self.evictions = self.expired = 0
+
+    def get_many(self, keys: List[bytes], version: str) -> List[Optional[tuple]]:
+        now = time.monotonic()
+        out: List[Optional[tuple]] = []
+        with self._lock:
+            for row in keys:
+                key = (version, row)
+                entry = self._entries.get(key)
+                if entry is not None and entry[2] < now:
+                    del self._entries[key]
+                    self.expired += 1
+                    entry = None
+                if entry is None:
+                    self.misses += 1
+                    out.append(None)
+                else:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    out.append(entry)
+        return out
+
+    def put_many(self, keys: List[bytes], preds, probas, version: str):
+        expires = time.monotonic() + self.ttl_s
+        with self._lock:
+            for row, pred, proba in zip(keys, preds, probas):
+                key = (version, row)
+                self._entries[key] = (pred, proba, expires)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expired": self.expired,
+            }
+
+
+def predict_cached(cache: PredictionCache, X: np.ndarray, version: str,
+                   predict: Callable[[np.ndarray], Dict]) -> Dict:
+    """
+    Serve de cache as linhas já vistas e só chama predict para as restantes.
+    Lotes com mais de CACHE_MAX_BATCH_ROWS linhas vão direto a predict.
+    """
+    if len(X) > CACHE_MAX_BATCH_ROWS:
+        return predict(X)
+    keys = row_keys(X)
+    cached = cache.get_many(keys, version)
+    miss_idx = [i for i, entry in enumerate(cached) if entry is None]
+
+    if len(miss_idx) == len(keys):
+        prediction = predict(X)
+        probas = prediction["proba"] if prediction["proba"] is not None else [None] * len(keys)
+        cache.put_many(keys, prediction["pred"], probas, version)
+        return prediction
+
+    preds = [entry[0] if entry is not None else None for entry in cached]
+    probas = [entry[1] if entry is not None else None for entry in cached]
+    if miss_idx:
+        scored = predict(X[miss_idx])
+        scored_probas = scored["proba"] if scored["proba"] is not None else [None] * len(miss_idx)
+        cache.put_many([keys[i] for i in miss_idx], scored["pred"], scored_probas, version)
+        for j, i in enumerate(miss_idx):
+            preds[i] = scored["pred"][j]
+            probas[i] = scored_probas[j]
+
+    has_proba = probas[0] is not None
+    return {
+        "pred": np.asarray(preds),
+        "proba": np.asarray(probas, dtype=np.float64) if has_proba else None,
+    }
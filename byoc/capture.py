@@ -0,0 +1,272 @@
+"""
+Data capture dentro do container, com amostragem guiada pelo score.
+
+Com BYOC_CAPTURE_DIR definido, cada linha avaliada é guardada com probabilidade
+    p = min(1, BYOC_CAPTURE_BASE_RATE + BYOC_CAPTURE_PROBA_WEIGHT * proba
+               + BYOC_CAPTURE_RARE_WEIGHT * [alguma feature com |z| > BYOC_CAPTURE_RARE_Z])
+pelo que transações com score alto e valores fora do normal ficam quase todas, e o resto
+é uma amostra pequena. Cada linha leva o peso 1/p para estimativas sem viés.
+
+No caminho do pedido só se sorteiam as linhas e se põe uma cópia das escolhidas num buffer
+limitado (BYOC_CAPTURE_MAX_BUFFERED_ROWS; acima disso descarta e conta). Uma thread por worker
+escreve ficheiros em BYOC_CAPTURE_DIR/AAAA/MM/DD/HH/, rodados por linhas ou idade:
+  - jsonl: .jsonl.gz no formato do data capture do SageMaker (captureData/eventMetadata),
+    com o input e o output em CSV e os pesos em eventMetadata.samplingWeights
+  - npz: colunas features, pred, proba, weight, time e inference_id (np.savez_compressed)
+Os ficheiros são escritos com sufixo .tmp e renomeados quando fechados.
+"""
+import atexit
+import gzip
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Dict, Optional
+
+import numpy as np
+
+CAPTURE_DIR = os.getenv("BYOC_CAPTURE_DIR", "")
+CAPTURE_FORMAT = os.getenv("BYOC_CAPTURE_FORMAT", "jsonl")
+CAPTURE_BASE_RATE = float(os.getenv("BYOC_CAPTURE_BASE_RATE", "0.01"))
+CAPTURE_PROBA_WEIGHT = float(os.getenv("BYOC_CAPTURE_PROBA_WEIGHT", "1.0"))
+CAPTURE_RARE_Z = float(os.getenv("BYOC_CAPTURE_RARE_Z", "4.0"))
+CAPTURE_RARE_WEIGHT = float(os.getenv("BYOC_CAPTURE_RARE_WEIGHT", "0.5"))
+CAPTURE_MAX_BUFFERED_ROWS = int(os.getenv("BYOC_CAPTURE_MAX_BUFFERED_ROWS", "100000"))
+CAPTURE_ROTATE_ROWS = int(os.getenv("BYOC_CAPTURE_ROTATE_ROWS", "50000"))
+CAPTURE_ROTATE_S = float(os.getenv("BYOC_CAPTURE_ROTATE_S", "300"))
+
+CAPTURE_FORMATS = ("jsonl", "npz")
+
+
+def sampling_probability(X: np.ndarray, proba, mean=None, scale=None,
+                         base_rate: float = CAPTURE_BASE_RATE, proba_weight: float = CAPTURE_PROBA_WEIGHT,
+                         rare_z: float = CAPTURE_RARE_Z, rare_weight: float = CAPTURE_RARE_WEIGHT) -> np.ndarray:
+    """
+    Probabilidade de captura de cada linha (vetorizado).
+    """
+    p = np.full(len(X), base_rate, dtype=np.float64)
+    if proba is not None and proba_weight > 0:
+        p += proba_weight * np.asarray(proba, dtype=np.float64)
+    if mean is not None and scale is not None and rare_weight > 0:
+        # |x - mean| / scale > rare_z sem dividir a matriz: compara com os limites por feature
+        X = np.asarray(X)
+        low, high = mean - rare_z * scale, mean + rare_z * scale
+        p += rare_weight * ((X < low) | (X > high)).any(axis=1)
+    return np.minimum(p, 1.0)
+
+
+def _csv_lines(rows) -> str:
+    return "".join(",".join(repr(v) for v in row) + "\n" for row in rows)
+
+
+def _record(batch: Dict) -> str:
+    """
+    Uma linha no formato do data capture do SageMaker (um registo por pedido, só com as linhas amostradas).
+    """
+    proba = batch["proba"].tolist() if batch["proba"] is not None else [""] * len(batch["pred"])
+    output = "".join(f"{p},{q}\n" for p, q in zip(batch["pred"].tolist(), proba))
+    return json.dumps({
+        "captureData": {
+            "endpointInput": {"observedContentType": "text/csv", "mode": "INPUT",
+                              "data": _csv_lines(batch["X"].tolist()), "encoding": "CSV"},
+            "endpointOutput": {"observedContentType": "text/csv", "mode": "OUTPUT",
+                               "data": output, "encoding": "CSV"},
+        },
+        "eventMetadata": {
+            "eventId": batch["id"],
+            "inferenceTime": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(batch["time"])),
+            "samplingWeights": batch["weight"].tolist(),
+        },
+        "eventVersion": "0",
+    }) + "\n"
+
+
+class _Segment:
+    """
+    Um ficheiro de captura aberto (ainda com sufixo .tmp).
+    """
+
+    def __init__(self, base_dir: str, fmt: str, now: float, seq: int):
+        hour_dir = os.path.join(base_dir, time.strftime("%Y/%m/%d/%H", time.gmtime(now)))
+        os.makedirs(hour_dir, exist_ok=True)
+        ext = ".jsonl.gz" if fmt == "jsonl" else ".npz"
+        name = f"capture-{time.strftime('%Y%m%dT%H%M%S', time.gmtime(now))}-{os.getpid()}-{seq:05d}{ext}"
+        self.path = os.path.join(hour_dir, name)
+        self.fmt = fmt
+        self.opened = now
+        self.rows = 0
+        self._file = gzip.open(self.path + ".tmp", "wt", encoding="utf-8") if fmt == "jsonl" else None
+        self._batches = []
+
+    def write(self, batch: Dict):
+        if self._file is not None:
+            self._file.write(_record(batch))
+        else:
+            self._batches.append(batch)
+        self.rows += len(batch["pred"])
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+        else:
+            batches = self._batches
+            n = [len(b["pred"]) for b in batches]
+            with open(self.path + ".tmp", "wb") as f:
+                np.savez_compressed(
+                    f,
+                    features=np.concatenate([b["X"] for b in batches]),
+                    pred=np.concatenate([b["pred"] for b in batches]),
+                    proba=np.concatenate([b["proba"] if b["proba"] is not None else np.full(k, np.nan)
+                                          for b, k in zip(batches, n)]),
+                    weight=np.concatenate([b["weight"] for b in batches]),
+                    time=np.repeat([b["time"] for b in batches], n),
+                    inference_id=np.repeat(np.array([b["id"] for b in batches], dtype="U32"), n),
+                )
+        os.replace(self.path + ".tmp", self.path)
+
+    def discard(self):
+        """
+        Depois de um erro a meio: fecha o ficheiro e apaga o .tmp, que pode estar truncado.
+        """
+        if self._file is not None:
+            try:
+                self._file.close()
+            except Exception:
+                pass
+        self._batches = []
+        try:
+            os.remove(self.path + ".tmp")
+        except OSError:
+            pass
+
+
+class CaptureWriter:
+    def __init__(self, base_dir: str = CAPTURE_DIR, fmt: str = CAPTURE_FORMAT,
+                 max_buffered_rows: int = CAPTURE_MAX_BUFFERED_ROWS,
+                 rotate_rows: int = CAPTURE_ROTATE_ROWS, rotate_s: float = CAPTURE_ROTATE_S):
+        if fmt not in CAPTURE_FORMATS:
+            raise ValueError(f"Unsupported capture format: {fmt} (expected one of {', '.join(CAPTURE_FORMATS)})")
+        self.base_dir = base_dir
+        self.fmt = fmt
+        self.max_buffered_rows = max_buffered_rows
+        self.rotate_rows = rotate_rows
+        self.rotate_s = rotate_s
+        self._buffer: deque = deque()
+        self._buffered_rows = 0
+        self._cond = threading.Condition()
+        self._pid: Optional[int] = None
+        self._stop = False
+        self._thread = None
+        self._rng = None
+        self.captured = 0
+        self.dropped = 0
+        self.seen = 0
+
+    def _ensure_thread(self):
+        # a thread não sobrevive ao fork (o model_fn corre no master)
+        if self._pid != os.getpid():
+            with self._cond:
+                if self._pid != os.getpid():
+                    self._buffer.clear()
+                    self._buffered_rows = 0
+                    self._stop = False
+                    # cada worker com a sua seed: o estado herdado do master seria igual em todos
+                    self._rng = np.random.default_rng()
+                    self._thread = threading.Thread(target=self._run, name="byoc-capture", daemon=True)
+                    self._thread.start()
+                    self._pid = os.getpid()
+                    atexit.register(self.close)
+
+    def submit(self, X, prediction: Dict, model=None):
+        """
+        Chamado no caminho do pedido: sorteia as linhas e nunca bloqueia à espera de disco.
+        """
+        n = len(X)
+        if n == 0:
+            return
+        self._ensure_thread()
+        proba = prediction.get("proba")
+        p = sampling_probability(X, proba, getattr(model, "mean", None), getattr(model, "scale", None))
+        keep = np.flatnonzero(self._rng.random(n) < p)
+        if len(keep) == 0:
+            # com gthread há vários pedidos a contar ao mesmo tempo
+            with self._cond:
+                self.seen += n
+            return
+        batch = {
+            "X": np.array(np.asarray(X)[keep], dtype=np.float64),
+            "pred": np.asarray(prediction["pred"])[keep],
+            "proba": np.asarray(proba, dtype=np.float64)[keep] if proba is not None else None,
+            "weight": 1.0 / p[keep],
+            "time": time.time(),
+            "id": uuid.uuid4().hex,
+        }
+        with self._cond:
+            self.seen += n
+            if self._buffered_rows + len(keep) > self.max_buffered_rows:
+                self.dropped += len(keep)
+                return
+            self._buffer.append(batch)
+            self._buffered_rows += len(keep)
+            self._cond.notify()
+
+    def _run(self):
+        segment = None
+        seq = 0
+        while True:
+            with self._cond:
+                timeout = None
+                if segment is not None:
+                    timeout = max(0.0, segment.opened + self.rotate_s - time.time())
+                if not self._buffer and not self._stop:
+                    self._cond.wait(timeout)
+                batches = list(self._buffer)
+                self._buffer.clear()
+                self._buffered_rows = 0
+                stop = self._stop
+            written = 0
+            try:
+                for batch in batches:
+                    if segment is None:
+                        segment = _Segment(self.base_dir, self.fmt, batch["time"], seq)
+                        seq += 1
+                    segment.write(batch)
+                    written += 1
+                    self.captured += len(batch["pred"])
+                    if segment.rows >= self.rotate_rows:
+                        segment.close()
+                        segment = None
+                if segment is not None and (stop or time.time() - segment.opened >= self.rotate_s):
+                    segment.close()
+                    segment = None
+            except Exception as e:
+                # sem disco para capture não pode derrubar o worker
+                from inference import log_event
+
+                # o segmento aberto vai com o erro: as linhas dele também se perdem
+                lost = sum(len(b["pred"]) for b in batches[written:])
+                if segment is not None:
+                    lost += segment.rows
+                    self.captured -= segment.rows
+                    segment.discard()
+                    segment = None
+                log_event("capture_failed", error=str(e), rows=lost)
+            if stop:
+                return
+
+    def close(self, timeout: float = 10.0):
+        """
+        Escreve o que está em buffer e fecha o ficheiro atual (atexit em cada worker).
+        """
+        if self._pid != os.getpid() or self._thread is None:
+            return
+        with self._cond:
+            self._stop = True
+            self._cond.notify()
+        self._thread.join(timeout)
+
+    def stats(self) -> Dict[str, int]:
+        return {"rows_seen": self.seen, "rows_captured": self.captured, "rows_dropped": self.dropped,
+                "rows_buffered": self._buffered_rows}
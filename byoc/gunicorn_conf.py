@@ -0,0 +1,64 @@
+"""
+Configuração do gunicorn para o container BYOC.
+
+- workers: BYOC_WORKERS ou um por CPU disponível
+- o modelo é carregado uma vez no master (preload_app) e partilhado pelos workers em copy-on-write
+- threads BLAS por worker: BYOC_BLAS_THREADS ou CPUs / workers, para não sobre-subscrever cores
+"""
+import gc
+import os
+
+
+def _available_cpus() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+_cpus = _available_cpus()
+
+bind = "0.0.0.0:" + os.getenv("PORT", "8080")
+timeout = int(os.getenv("BYOC_TIMEOUT", "60"))
+workers = int(os.getenv("BYOC_WORKERS", "0")) or _cpus
+MAX_INFLIGHT = int(os.getenv("BYOC_MAX_INFLIGHT", "0"))
+# com coalescing ligado, cada worker precisa de várias threads a receber pedidos para haver pedidos
+# concorrentes para juntar; com load shedding (BYOC_MAX_INFLIGHT), de mais threads do que o limite,
+# senão um worker sync só tem um pedido em curso e os restantes esperam no backlog sem serem descartados
+_concurrent = os.getenv("BYOC_BATCH_ENABLED", "0") == "1" or MAX_INFLIGHT > 0
+threads = int(os.getenv("BYOC_THREADS", "64" if _concurrent else "1"))
+preload_app = True
+# ligações à espera de accept; acima disto o cliente falha logo em vez de esperar numa fila longa
+backlog = int(os.getenv("BYOC_BACKLOG", "2048"))
+
+BLAS_THREADS = os.getenv("BYOC_BLAS_THREADS") or str(max(1, _cpus // workers))
+
+# tem de estar no ambiente antes de o numpy ser importado (o preload importa-o no master)
+for _var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+    os.environ.setdefault(_var, BLAS_THREADS)
+
+
+def when_ready(server):
+    # corre no master depois do preload e antes do primeiro fork
+    import wsgi
+
+    try:
+        wsgi.get_model()
+        server.log.info("Model loaded before fork (%d workers, %s BLAS threads each)", workers, BLAS_THREADS)
+    except Exception as e:
+        # cada worker volta a tentar no /ping
+        server.log.warning("Model preload failed, workers will load lazily: %s", e)
+    if 0 < threads <= MAX_INFLIGHT and "uvicorn" not in server.cfg.worker_class_str.lower():
+        server.log.warning("BYOC_MAX_INFLIGHT=%d with %d threads per worker: requests are never shed",
+                           MAX_INFLIGHT, threads)
+
+    # objetos já carregados deixam de ser tocados pelo GC, o que mantém as páginas partilhadas
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    try:
+        from threadpoolctl import threadpool_limits
+    except ImportError:
+        return
+    threadpool_limits(limits=int(BLAS_THREADS))
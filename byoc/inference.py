@@ -1,58 +1,171 @@
-import json
-import os
-from io import StringIO
-from typing import Any, Tuple
+import time
 
-import joblib
-import numpy as np
-import pandas as pd
+_IMPORT_T0 = time.perf_counter()
 
+import json  # noqa: E402
+import os  # noqa: E402
+from typing import Optional, Tuple  # noqa: E402
 
-def _ensure_2d(x: Any) -> np.ndarray:
-    arr = np.asarray(x)
-    if arr.ndim == 1:
-        arr = arr.reshape(1, -1)
-    return arr
+from cache import CACHE_ENABLED, PredictionCache, predict_cached  # noqa: E402
+from capture import CAPTURE_DIR, CaptureWriter  # noqa: E402
+from payloads import (  # noqa: E402
+    FEATURE_NAMES,
+    JSONLINES_CONTENT_TYPES,
+    NPY_CONTENT_TYPE,
+    PROBA_PRECISION,
+    RAW_F32_CONTENT_TYPE,
+    decode_csv,
+    decode_json,
+    decode_jsonlines,
+    decode_npy,
+    decode_raw_f32,
+    encode_csv,
+    encode_json,
+    encode_jsonlines,
+    encode_npy,
+    encode_raw_f32,
+    parse_custom_attributes,
+    parse_media_type,
+)
+from scorer import compile_model, load_compiled  # noqa: E402
+from shadow import CHALLENGER_DIR, Shadow  # noqa: E402
+
+WARMUP_ENABLED = os.getenv("BYOC_WARMUP", "1") == "1"
+WARMUP_ROWS = int(os.getenv("BYOC_WARMUP_ROWS", "64"))
+# "explain" sem valor no Accept / custom attributes
+EXPLAIN_TOP_K = int(os.getenv("BYOC_EXPLAIN_TOP_K", "5"))
+
+_cache = PredictionCache() if CACHE_ENABLED else None
+# challenger em shadow (BYOC_CHALLENGER_DIR), carregado uma vez no primeiro model_fn
+_shadow = None
+# data capture no container (BYOC_CAPTURE_DIR), ligado no primeiro model_fn
+_capture = None
+
+# tempos de arranque (segundos), publicados numa linha de log JSON
+STARTUP = {"import_s": time.perf_counter() - _IMPORT_T0}
+
+
+def log_event(event: str, **fields):
+    print(json.dumps({"event": event, **fields}), flush=True)
+
+
+def _load_model(model_dir: str):
+    scorer = load_compiled(model_dir)
+    if scorer is not None:
+        return scorer
+
+    path = os.path.join(model_dir, "model.joblib")
+    if not os.path.exists(path):
+        contents = os.listdir(model_dir) if os.path.exists(model_dir) else []
+        raise FileNotFoundError(f"model.joblib not found at {path}. Contents: {contents}")
+    # joblib (e, através do pickle, o sklearn) só é importado quando não há artefacto compilado
+    import joblib
+
+    model = joblib.load(path)
+    scorer = compile_model(model)
+    return scorer if scorer is not None else model
+
+
+def warmup(model, rows: int = WARMUP_ROWS):
+    """
+    Passa um batch sintético por input_fn/predict_fn/output_fn, para que o primeiro
+    pedido real não pague as alocações e imports preguiçosos do numpy/sklearn.
+    Corre com observe=False: as linhas sintéticas não passam pela cache, pelo shadow nem
+    pelo capture, também num hot reload (em que estes já existem e há pedidos a correr).
+    """
+    n_features = getattr(model, "n_features", len(FEATURE_NAMES))
+    csv_row = ",".join(["0"] * n_features)
+    payloads = [
+        ((csv_row + "\n").encode("utf-8"), "text/csv", "application/json"),
+        (("\n".join([csv_row] * rows) + "\n").encode("utf-8"), "text/csv", "text/csv"),
+        (json.dumps({"instances": [[0.0] * n_features]}).encode("utf-8"), "application/json", "application/json"),
+    ]
+    for body, content_type, accept in payloads:
+        output_fn(predict_fn(input_fn(body, content_type), model, observe=False), accept)
 
 
 def model_fn(model_dir: str):
     """
     SageMaker extrai model.tar.gz para /opt/ml/model.
     Precisamos de encontrar model.joblib na raiz.
+    Se existir o artefacto compilado (model_compiled/), é lido com mmap e o joblib nem é aberto.
+    Senão, se o modelo for StandardScaler + LogisticRegression, devolve o scorer compilado;
+    caso contrário devolve o estimador sklearn tal como está.
+    Com BYOC_WARMUP=1 (default) faz warmup e regista os tempos de arranque.
+    Com BYOC_CHALLENGER_DIR, carrega também o challenger para shadow scoring (ver shadow.py).
+    Com BYOC_CAPTURE_DIR, liga o data capture amostrado (ver capture.py).
     """
-    path = os.path.join(model_dir, "model.joblib")
-    if not os.path.exists(path):
-        contents = os.listdir(model_dir) if os.path.exists(model_dir) else []
-        raise FileNotFoundError(f"model.joblib not found at {path}. Contents: {contents}")
-    return joblib.load(path)
+    global _shadow, _capture
+    t0 = time.perf_counter()
+    model = _load_model(model_dir)
+    STARTUP["load_s"] = time.perf_counter() - t0
+
+    if WARMUP_ENABLED:
+        t0 = time.perf_counter()
+        try:
+            warmup(model)
+        except Exception as e:
+            # um schema que não bate com o modelo falharia em todos os pedidos: avisar já no arranque
+            log_event("warmup_failed", error=str(e))
+        STARTUP["warmup_s"] = time.perf_counter() - t0
 
+    if CAPTURE_DIR and _capture is None:
+        _capture = CaptureWriter()
+    if CHALLENGER_DIR and _shadow is None:
+        t0 = time.perf_counter()
+        challenger = _load_model(CHALLENGER_DIR)
+        _shadow = Shadow(challenger, _score, model_version, model_version(challenger))
+        STARTUP["challenger_load_s"] = time.perf_counter() - t0
+        STARTUP["challenger_version"] = model_version(challenger)
 
-def input_fn(request_body: str, content_type: str):
+    log_event("startup", model=type(model).__name__, **STARTUP)
+    return model
+
+
+def input_fn(request_body, content_type: str):
     """
     Suporta:
       - application/json com {"instances": [[...], ...]} (recomendado)
         ou {"data": [[...], ...]} (fallback)
       - text/csv com linhas numéricas (sem header)
+      - application/jsonlines com um registo por linha ([...] ou {"features": [...]})
+      - application/x-npy (np.save) e application/x-float32 (header uint32 + float32 row-major),
+        lidos sem cópia a partir do body
+    Todos são validados contra o schema fixo (payloads.N_FEATURES colunas).
     """
+    if content_type == NPY_CONTENT_TYPE:
+        return decode_npy(request_body)
+
+    if content_type == RAW_F32_CONTENT_TYPE:
+        return decode_raw_f32(request_body)
+
+    if isinstance(request_body, (bytes, bytearray, memoryview)):
+        request_body = bytes(request_body).decode("utf-8")
+
+    if content_type in JSONLINES_CONTENT_TYPES:
+        return decode_jsonlines(request_body)
+
     if content_type and content_type.startswith("application/json"):
-        payload = json.loads(request_body)
-        rows = payload.get("instances", payload.get("data"))
-        if rows is None:
-            raise ValueError("JSON must include 'instances' (preferred) or 'data'.")
-        return _ensure_2d(rows)
+        return decode_json(request_body)
 
     if content_type in ("text/csv", "text/plain"):
-        df = pd.read_csv(StringIO(request_body), header=None)
-        return df.values
+        return decode_csv(request_body)
 
     raise ValueError(f"Unsupported Content-Type: {content_type}")
 
 
-def predict_fn(input_data, model):
+def model_version(model) -> str:
     """
-    Devolve classe e, se existir, probabilidade da classe positiva.
+    Identifica o modelo carregado (o scorer compilado traz um hash dos pesos).
     """
-    X = input_data
+    return getattr(model, "version", None) or f"{type(model).__name__}-{id(model):x}"
+
+
+def _score(X, model):
+    # scorer compilado: classe e probabilidade numa só passagem
+    if hasattr(model, "predict_with_proba"):
+        pred, proba = model.predict_with_proba(X)
+        return {"pred": pred, "proba": proba}
 
     if hasattr(model, "predict_proba"):
         proba = model.predict_proba(X)[:, 1]
@@ -63,18 +176,102 @@ def predict_fn(input_data, model):
     return {"pred": pred, "proba": proba}
 
 
-def output_fn(prediction, accept: str) -> Tuple[str, str]:
+def explain_top_k(accept: str, custom_attributes: str = "") -> Optional[int]:
+    """
+    Pedido de explicação: "explain=K" como parâmetro do Accept ou nos custom attributes
+    (X-Amzn-SageMaker-Custom-Attributes, pares separados por ";" ou ",").
+    "explain" sem valor usa BYOC_EXPLAIN_TOP_K, "explain=all" devolve todas as features.
+    Devolve None se não foi pedido, senão K (0 = todas).
+    """
+    value = parse_media_type(accept)[1].get("explain")
+    if value is None:
+        value = parse_custom_attributes(custom_attributes).get("explain")
+    if value is None:
+        return None
+    value = value.lower()
+    if value in ("", "true"):
+        return EXPLAIN_TOP_K
+    if value == "all":
+        return 0
+    try:
+        top_k = int(value)
+    except ValueError:
+        top_k = -1
+    if top_k < 0:
+        raise ValueError(f"Invalid explain value: {value!r} (expected a feature count or 'all')")
+    return top_k
+
+
+def _score_explained(X, model, top_k: int):
+    if not hasattr(model, "predict_with_contributions"):
+        raise ValueError("Feature contributions are only available for the compiled linear model")
+    pred, proba, features, values = model.predict_with_contributions(X, top_k)
+    names = model.feature_names
+    if names is None or len(names) != model.n_features:
+        names = FEATURE_NAMES if len(FEATURE_NAMES) == model.n_features else [f"f{i}" for i in range(model.n_features)]
+    return {"pred": pred, "proba": proba,
+            "contributions": {"names": list(names), "features": features, "values": values,
+                              "base": model.intercept}}
+
+
+def predict_fn(input_data, model, explain: Optional[int] = None, observe: bool = True):
     """
-    Resposta JSON.
+    Devolve classe e, se existir, probabilidade da classe positiva.
+    Com BYOC_CACHE_ENABLED=1, linhas repetidas são servidas da cache e só as restantes são avaliadas.
+    Com explain=K (ver explain_top_k), junta as K maiores contribuições de cada linha, calculadas
+    na mesma passagem do score; esses pedidos não passam pela cache.
+    Com um challenger carregado, a mesma matriz segue para o shadow sem esperar pelo resultado.
+    observe=False (warmup) avalia só o modelo, sem cache, shadow nem capture.
+    """
+    t0 = time.perf_counter()
+    if explain is not None:
+        prediction = _score_explained(input_data, model, explain)
+    elif _cache is not None and observe:
+        prediction = predict_cached(_cache, input_data, model_version(model), lambda X: _score(X, model))
+    else:
+        prediction = _score(input_data, model)
+    if not observe:
+        return prediction
+    if _shadow is not None:
+        _shadow.submit(input_data, prediction, model, time.perf_counter() - t0)
+    if _capture is not None:
+        _capture.submit(input_data, prediction, model)
+    return prediction
+
+
+def output_fn(prediction, accept: str) -> Tuple[object, str]:
+    """
+    Resposta em:
+      - application/json (default) com {"pred": [...], "proba": [...]}
+      - text/csv com uma linha "pred,proba" por registo
+      - application/jsonlines com um objeto por registo
+      - application/x-npy e application/x-float32: matriz binária [pred, proba] por linha
+    Nos formatos de texto, "; precision=N" no Accept (ou BYOC_PROBA_PRECISION)
+    fixa as casas decimais da proba (e das contribuições, se pedidas).
     """
-    if accept in ("application/json", "*/*", None):
-        pred = prediction["pred"]
-        proba = prediction["proba"]
-
-        out = {
-            "pred": pred.tolist() if hasattr(pred, "tolist") else pred,
-            "proba": proba.tolist() if proba is not None and hasattr(proba, "tolist") else None,
-        }
-        return json.dumps(out), "application/json"
+    media, params = parse_media_type(accept)
+    precision = params.get("precision", PROBA_PRECISION)
+    try:
+        precision = int(precision) if precision != "" else None
+    except ValueError:
+        raise ValueError(f"Invalid precision in Accept: {precision!r}") from None
+
+    if media in ("application/json", "*/*", ""):
+        return encode_json(prediction, precision), "application/json"
+
+    if media == "text/csv":
+        return encode_csv(prediction, precision), "text/csv"
+
+    if media in JSONLINES_CONTENT_TYPES:
+        return encode_jsonlines(prediction, precision), media
+
+    if "contributions" in prediction and media in (NPY_CONTENT_TYPE, RAW_F32_CONTENT_TYPE):
+        raise ValueError(f"Feature contributions are not available in {media} responses")
+
+    if media == NPY_CONTENT_TYPE:
+        return encode_npy(prediction), NPY_CONTENT_TYPE
+
+    if media == RAW_F32_CONTENT_TYPE:
+        return encode_raw_f32(prediction), RAW_F32_CONTENT_TYPE
 
     raise ValueError(f"Unsupported Accept: {accept}")
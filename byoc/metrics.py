@@ -0,0 +1,137 @@
+"""
+Métricas do container BYOC em formato de texto Prometheus (GET /metrics).
+
+Os contadores vivem em memória partilhada (multiprocessing.RawArray) criada no master antes
+do fork, pelo que qualquer worker devolve os totais de todos os workers.
+"""
+import multiprocessing
+import os
+from bisect import bisect_left
+from typing import Dict, Optional, Sequence
+
+TIMING_HEADERS = os.getenv("BYOC_TIMING_HEADERS", "0") == "1"
+LOG_REQUESTS = os.getenv("BYOC_LOG_REQUESTS", "0") == "1"
+
+STAGES = ("input_fn", "predict_fn", "output_fn", "total")
+STAGE_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+ROWS_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 4096, 16384, 65536)
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864)
+STATUSES = ("200", "400", "413", "500", "503", "504", "other")
+
+_lock = multiprocessing.Lock()
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Histogram:
+    """
+    Histograma Prometheus: contagens por bucket (não cumulativas em memória), soma e total.
+    """
+
+    def __init__(self, name: str, help_text: str, buckets: Sequence[float], labels: Optional[Dict[str, str]] = None):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self.labels = labels or {}
+        # len(buckets) buckets + "+Inf" + soma + total
+        self._values = multiprocessing.RawArray("d", len(self.buckets) + 3)
+
+    def observe(self, value: float):
+        i = bisect_left(self.buckets, value)
+        with _lock:
+            self._values[i] += 1
+            self._values[-2] += value
+            self._values[-1] += 1
+
+    def samples(self):
+        with _lock:
+            values = list(self._values)
+        extra = "".join(f',{k}="{v}"' for k, v in self.labels.items())
+        cumulative = 0.0
+        for bound, count in zip(self.buckets + (float("inf"),), values):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else _format_value(bound)
+            yield f'{self.name}_bucket{{le="{le}"{extra}}} {_format_value(cumulative)}'
+        label_txt = "{" + extra.lstrip(",") + "}" if extra else ""
+        yield f"{self.name}_sum{label_txt} {_format_value(values[-2])}"
+        yield f"{self.name}_count{label_txt} {_format_value(values[-1])}"
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, label: str, label_values: Sequence[str]):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self.label_values = tuple(label_values)
+        self._values = multiprocessing.RawArray("d", len(self.label_values))
+
+    def inc(self, label_value: str, amount: float = 1.0):
+        try:
+            i = self.label_values.index(label_value)
+        except ValueError:
+            i = len(self.label_values) - 1
+        with _lock:
+            self._values[i] += amount
+
+    def samples(self):
+        with _lock:
+            values = list(self._values)
+        for label_value, value in zip(self.label_values, values):
+            yield f'{self.name}{{{self.label}="{label_value}"}} {_format_value(value)}'
+
+
+STAGE_SECONDS = {
+    stage: Histogram("byoc_stage_seconds", "Latency of each /invocations stage.", STAGE_BUCKETS, {"stage": stage})
+    for stage in STAGES
+}
+ROWS_PER_REQUEST = Histogram("byoc_rows_per_request", "Rows scored per request.", ROWS_BUCKETS)
+REQUEST_BYTES = Histogram("byoc_request_bytes", "Request payload size.", BYTES_BUCKETS)
+RESPONSE_BYTES = Histogram("byoc_response_bytes", "Response payload size.", BYTES_BUCKETS)
+REQUESTS = Counter("byoc_requests_total", "Requests to /invocations by status.", "status", STATUSES)
+
+
+def record_request(status: int, timings: Dict[str, float], rows: int, request_bytes: int, response_bytes: int):
+    REQUESTS.inc(str(status))
+    for stage, seconds in timings.items():
+        STAGE_SECONDS[stage].observe(seconds)
+    REQUEST_BYTES.observe(request_bytes)
+    if status == 200:
+        ROWS_PER_REQUEST.observe(rows)
+        RESPONSE_BYTES.observe(response_bytes)
+
+    if LOG_REQUESTS:
+        from inference import log_event
+
+        log_event("request", status=status, rows=rows, request_bytes=request_bytes,
+                  response_bytes=response_bytes,
+                  **{f"{stage}_ms": round(seconds * 1000, 3) for stage, seconds in timings.items()})
+
+
+def timing_headers(timings: Dict[str, float]):
+    """
+    Cabeçalhos X-Byoc-<stage>-Ms, quando BYOC_TIMING_HEADERS=1.
+    """
+    if not TIMING_HEADERS:
+        return []
+    return [(f"X-Byoc-{stage.replace('_fn', '').title()}-Ms", f"{seconds * 1000:.3f}")
+            for stage, seconds in timings.items()]
+
+
+def _metric_block(name: str, help_text: str, kind: str, samples):
+    return [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}", *samples]
+
+
+def render(extra_gauges: Optional[Dict[str, float]] = None) -> str:
+    lines = []
+    lines += _metric_block("byoc_stage_seconds", STAGE_SECONDS["total"].help_text, "histogram",
+                           (s for h in STAGE_SECONDS.values() for s in h.samples()))
+    for hist in (ROWS_PER_REQUEST, REQUEST_BYTES, RESPONSE_BYTES):
+        lines += _metric_block(hist.name, hist.help_text, "histogram", hist.samples())
+    lines += _metric_block(REQUESTS.name, REQUESTS.help_text, "counter", REQUESTS.samples())
+    # valores por processo (ex.: cache), com o pid do worker que respondeu
+    for name, value in (extra_gauges or {}).items():
+        lines += _metric_block(name, name.replace("_", " ") + ".", "gauge",
+                               [f'{name}{{pid="{os.getpid()}"}} {_format_value(value)}'])
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,397 @@
+"""
+Decoders/encoders para o schema fixo do modelo: Time, V1..V28, Amount (30 features numéricas).
+
+Os decoders de texto escrevem diretamente num array float pré-alocado e nunca importam pandas;
+os formatos binários são lidos com np.frombuffer, sem cópia nem parsing.
+"""
+import json
+import os
+import struct
+from io import BytesIO
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+FEATURE_NAMES = ["Time"] + [f"V{i}" for i in range(1, 29)] + ["Amount"]
+N_FEATURES = int(os.getenv("BYOC_N_FEATURES", str(len(FEATURE_NAMES))))
+FEATURE_DTYPE = np.dtype(os.getenv("BYOC_FEATURE_DTYPE", "float64"))
+
+NPY_CONTENT_TYPE = "application/x-npy"
+# uint32 little-endian com o número de linhas, seguido de linhas*features float32 little-endian
+RAW_F32_CONTENT_TYPE = "application/x-float32"
+_RAW_HEADER = struct.Struct("<I")
+
+JSONLINES_CONTENT_TYPES = ("application/jsonlines", "application/x-jsonlines", "application/jsonl")
+
+# casas decimais fixas para a proba nas respostas de texto (vazio = precisão total)
+PROBA_PRECISION = os.getenv("BYOC_PROBA_PRECISION", "")
+
+
+def _check_finite(out: np.ndarray, cell: Callable[[int, int], object]) -> np.ndarray:
+    """
+    Recusa NaN/inf ("nan", "inf" no CSV, null no JSON), com a linha e coluna do primeiro valor;
+    cell(i, j) devolve o valor original, só para a mensagem de erro.
+    """
+    bad = ~np.isfinite(out)
+    if bad.any():
+        i, j = (int(k) for k in np.argwhere(bad)[0])
+        value = cell(i, j)
+        if value is None:
+            raise ValueError(f"Row {i}, column {j}: missing value (null)")
+        raise ValueError(f"Row {i}, column {j}: non-finite value {value!r}")
+    return out
+
+
+def _fill_rows(rows: Sequence[Sequence], n_features: int, dtype) -> np.ndarray:
+    """
+    Copia linha a linha para o array final, para dar um erro claro
+    a indicar a linha e o valor que falharam.
+    """
+    out = np.empty((len(rows), n_features), dtype=dtype)
+    for i, row in enumerate(rows):
+        if isinstance(row, (str, bytes)) or not hasattr(row, "__len__"):
+            raise ValueError(f"Row {i}: expected a list of {n_features} values, got {type(row).__name__}")
+        if len(row) != n_features:
+            raise ValueError(f"Row {i}: expected {n_features} values, got {len(row)}")
+        for j, value in enumerate(row):
+            try:
+                out[i, j] = value
+            except (TypeError, ValueError):
+                if value is None or (isinstance(value, str) and not value.strip()):
+                    kind = "null" if value is None else "empty field"
+                    raise ValueError(f"Row {i}, column {j}: missing value ({kind})") from None
+                raise ValueError(f"Row {i}, column {j}: invalid numeric value {value!r}") from None
+    return _check_finite(out, lambda i, j: rows[i][j])
+
+
+def decode_csv(body: str, n_features: int = N_FEATURES, dtype=FEATURE_DTYPE) -> np.ndarray:
+    """
+    CSV sem header, uma linha por registo.
+    """
+    lines: List[str] = [ln for ln in body.replace("\r", "").split("\n") if ln.strip()]
+    if not lines:
+        raise ValueError("Empty CSV payload.")
+
+    fields = ",".join(lines).split(",")
+    out = np.empty((len(lines), n_features), dtype=dtype)
+    if len(fields) == out.size:
+        try:
+            out.reshape(-1)[:] = fields
+            # o total pode bater certo com linhas de larguras diferentes
+            if all(ln.count(",") == n_features - 1 for ln in lines):
+                return _check_finite(out, lambda i, j: lines[i].split(",")[j])
+        except ValueError:
+            pass
+    return _fill_rows([ln.split(",") for ln in lines], n_features, dtype)
+
+
+def decode_json(body: str, n_features: int = N_FEATURES, dtype=FEATURE_DTYPE) -> np.ndarray:
+    """
+    {"instances": [[...], ...]} (recomendado) ou {"data": [[...], ...]}.
+    Uma única linha plana ([...]) é aceite como um registo.
+    """
+    payload = json.loads(body)
+    if not isinstance(payload, dict):
+        raise ValueError("JSON must be an object with 'instances' (preferred) or 'data'.")
+    rows = payload.get("instances", payload.get("data"))
+    if rows is None:
+        raise ValueError("JSON must include 'instances' (preferred) or 'data'.")
+    if not isinstance(rows, list) or not rows:
+        raise ValueError("'instances' must be a non-empty list of rows.")
+    if not isinstance(rows[0], list):
+        rows = [rows]
+
+    try:
+        out = np.array(rows, dtype=dtype)
+        if out.shape == (len(rows), n_features):
+            return _check_finite(out, lambda i, j: rows[i][j])
+    except (TypeError, ValueError):
+        pass
+    return _fill_rows(rows, n_features, dtype)
+
+
+def decode_jsonlines(body: str, n_features: int = N_FEATURES, dtype=FEATURE_DTYPE) -> np.ndarray:
+    """
+    Um registo por linha: [...] ou {"features": [...]} (formato do batch transform com SplitType=Line).
+    """
+    lines = [ln for ln in body.split("\n") if ln.strip()]
+    if not lines:
+        raise ValueError("Empty JSON Lines payload.")
+    try:
+        # um único json.loads para o chunk todo
+        records = json.loads("[" + ",".join(lines) + "]")
+    except json.JSONDecodeError:
+        for i, ln in enumerate(lines):
+            try:
+                json.loads(ln)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Row {i}: invalid JSON ({e.msg})") from None
+        raise
+    rows = [r.get("features") if isinstance(r, dict) else r for r in records]
+
+    try:
+        out = np.array(rows, dtype=dtype)
+        if out.shape == (len(rows), n_features):
+            return _check_finite(out, lambda i, j: rows[i][j])
+    except (TypeError, ValueError):
+        pass
+    return _fill_rows(rows, n_features, dtype)
+
+
+def decode_npy(body: bytes, n_features: int = N_FEATURES) -> np.ndarray:
+    """
+    Ficheiro .npy (np.save) com shape (linhas, features) ou (features,).
+    O array devolvido aponta para o buffer do pedido (só de leitura).
+    """
+    stream = BytesIO(body)
+    try:
+        version = np.lib.format.read_magic(stream)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(stream)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(stream)
+    except ValueError as e:
+        raise ValueError(f"Invalid .npy payload: {e}") from None
+
+    if dtype.hasobject or dtype.kind not in "fiu":
+        raise ValueError(f"Unsupported .npy dtype: {dtype}")
+    if len(shape) == 1:
+        shape = (1,) + tuple(shape)
+    if len(shape) != 2 or shape[1] != n_features:
+        raise ValueError(f"Expected .npy shape (rows, {n_features}), got {shape}")
+
+    count = shape[0] * shape[1]
+    offset = stream.tell()
+    if len(body) - offset != count * dtype.itemsize:
+        raise ValueError(f"Truncated .npy payload: expected {count} values of {dtype}")
+    arr = np.frombuffer(body, dtype=dtype, count=count, offset=offset)
+    return arr.reshape(shape, order="F" if fortran_order else "C")
+
+
+def decode_raw_f32(body: bytes, n_features: int = N_FEATURES) -> np.ndarray:
+    """
+    Formato RAW_F32_CONTENT_TYPE: header uint32 com o número de linhas + float32 row-major.
+    """
+    if len(body) < _RAW_HEADER.size:
+        raise ValueError("Raw float32 payload is missing the row-count header.")
+    (n_rows,) = _RAW_HEADER.unpack_from(body)
+    expected = _RAW_HEADER.size + n_rows * n_features * 4
+    if n_rows == 0 or len(body) != expected:
+        raise ValueError(
+            f"Raw float32 payload: header says {n_rows} rows of {n_features} features "
+            f"({expected} bytes), got {len(body)} bytes"
+        )
+    arr = np.frombuffer(body, dtype="<f4", count=n_rows * n_features, offset=_RAW_HEADER.size)
+    return arr.reshape(n_rows, n_features)
+
+
+def _prediction_matrix(prediction: Dict, dtype) -> np.ndarray:
+    """
+    Matriz (linhas, 2): coluna 0 = pred, coluna 1 = proba (NaN se o modelo não a tiver).
+    """
+    pred = np.asarray(prediction["pred"])
+    out = np.empty((len(pred), 2), dtype=dtype)
+    out[:, 0] = pred
+    out[:, 1] = np.nan if prediction["proba"] is None else prediction["proba"]
+    return out
+
+
+def encode_npy(prediction: Dict) -> bytes:
+    buf = BytesIO()
+    np.save(buf, _prediction_matrix(prediction, np.float64), allow_pickle=False)
+    return buf.getvalue()
+
+
+def encode_raw_f32(prediction: Dict) -> bytes:
+    out = _prediction_matrix(prediction, "<f4")
+    return _RAW_HEADER.pack(len(out)) + out.tobytes()
+
+
+def parse_media_type(value: Optional[str]) -> Tuple[str, Dict[str, str]]:
+    """
+    "application/json; precision=4" -> ("application/json", {"precision": "4"})
+    """
+    if not value:
+        return "", {}
+    media, *params = value.split(";")
+    parsed = {}
+    for param in params:
+        key, _, val = param.partition("=")
+        if key.strip():
+            parsed[key.strip().lower()] = val.strip().strip('"')
+    return media.strip().lower(), parsed
+
+
+def parse_custom_attributes(value: Optional[str]) -> Dict[str, str]:
+    """
+    X-Amzn-SageMaker-Custom-Attributes: "explain=3; deadline_ms=200" -> {"explain": "3", "deadline_ms": "200"}
+    (aceita ";" ou "," entre pares; uma chave sem "=" fica com valor vazio).
+    """
+    parsed = {}
+    for pair in (value or "").replace(",", ";").split(";"):
+        key, _, val = pair.partition("=")
+        if key.strip():
+            parsed[key.strip().lower()] = val.strip()
+    return parsed
+
+
+def _scalar_format(values: np.ndarray, precision: Optional[int]) -> Optional[str]:
+    if values.dtype.kind in "iub":
+        return "%d"
+    if values.dtype.kind == "f" and np.isfinite(values).all():
+        return f"%.{precision}f" if precision is not None else "%r"
+    # NaN/inf, strings, objects: fica para o json.dumps
+    return None
+
+
+def _json_values(values) -> List:
+    """
+    Lista para json.dumps com NaN/inf como null: o json.dumps escreveria NaN, que não é JSON válido.
+    """
+    values = np.asarray(values)
+    if values.dtype.kind == "f" and not np.isfinite(values).all():
+        return np.where(np.isfinite(values), values, None).tolist()
+    return values.tolist()
+
+
+def _row_values(prediction: Dict, precision: Optional[int]):
+    """
+    Prepara pred/proba para formatação em bloco com o operador %:
+    devolve (formato pred, formato proba, valores intercalados) ou None se não der.
+    """
+    pred = np.asarray(prediction["pred"])
+    proba = prediction["proba"]
+    pred_fmt = _scalar_format(pred, None)
+    if pred_fmt is None:
+        return None
+    if proba is None:
+        return pred_fmt, None, pred.tolist()
+    proba = np.asarray(proba)
+    proba_fmt = _scalar_format(proba, precision)
+    if proba_fmt is None:
+        return None
+    values = [None] * (2 * len(pred))
+    values[0::2] = pred.tolist()
+    values[1::2] = proba.tolist()
+    return pred_fmt, proba_fmt, values
+
+
+def _join(fmt: str, n: int, values: List, sep: str = ",") -> str:
+    """
+    Repete fmt n vezes separado por sep e formata tudo numa só operação %.
+    """
+    if n == 0:
+        return ""
+    return ((fmt + sep) * (n - 1) + fmt) % tuple(values)
+
+
+def _contribution_objects(prediction: Dict, precision: Optional[int]) -> Optional[List[str]]:
+    """
+    Um objeto JSON {"feature": contribuição, ...} por linha, pela ordem do scorer
+    (|contribuição| decrescente), ou None se o pedido não pediu explicações.
+    """
+    contributions = prediction.get("contributions")
+    if contributions is None:
+        return None
+    names = contributions["names"]
+    values = np.asarray(contributions["values"], dtype=np.float64)
+    if precision is not None:
+        values = np.round(values, precision)
+    return [
+        json.dumps({names[i]: v for i, v in zip(idx, vals)})
+        for idx, vals in zip(contributions["features"].tolist(), values.tolist())
+    ]
+
+
+def encode_json(prediction: Dict, precision: Optional[int] = None) -> str:
+    """
+    {"pred": [...], "proba": [...]} formatado direto dos arrays numpy,
+    sem passar por json.dumps de uma lista de floats Python.
+    Com explicações, junta "contributions" (um objeto por linha) e "base_value" (o intercept).
+    """
+    body = _encode_json_scores(prediction, precision)
+    objects = _contribution_objects(prediction, precision)
+    if objects is None:
+        return body
+    base = json.dumps(float(prediction["contributions"]["base"]))
+    return body[:-1] + ', "contributions": [' + ", ".join(objects) + '], "base_value": ' + base + "}"
+
+
+def _encode_json_scores(prediction: Dict, precision: Optional[int]) -> str:
+    pred = np.asarray(prediction["pred"])
+    proba = prediction["proba"]
+    pred_fmt = _scalar_format(pred, None)
+    proba_fmt = _scalar_format(np.asarray(proba), precision) if proba is not None else "null"
+    if pred_fmt is None or proba_fmt is None:
+        out = {
+            "pred": _json_values(pred),
+            "proba": _json_values(proba) if proba is not None else None,
+        }
+        return json.dumps(out)
+
+    pred_txt = "[" + _join(pred_fmt, len(pred), pred.tolist(), ", ") + "]"
+    proba_txt = "null" if proba is None else "[" + _join(proba_fmt, len(pred), np.asarray(proba).tolist(), ", ") + "]"
+    return '{"pred": ' + pred_txt + ', "proba": ' + proba_txt + "}"
+
+
+def encode_csv(prediction: Dict, precision: Optional[int] = None) -> str:
+    """
+    Uma linha "pred,proba" por registo (proba vazia se o modelo não a tiver).
+    Com explicações, cada linha continua com pares feature,contribuição.
+    """
+    body = _encode_csv_scores(prediction, precision)
+    contributions = prediction.get("contributions")
+    if contributions is None or not body:
+        return body
+    names = contributions["names"]
+    values = np.asarray(contributions["values"], dtype=np.float64)
+    fmt = f"%.{precision}f" if precision is not None else "%r"
+    lines = body[:-1].split("\n")
+    return "".join(
+        line + "".join("," + names[i] + "," + fmt % v for i, v in zip(idx, vals)) + "\n"
+        for line, idx, vals in zip(lines, contributions["features"].tolist(), values.tolist())
+    )
+
+
+def _encode_csv_scores(prediction: Dict, precision: Optional[int]) -> str:
+    prepared = _row_values(prediction, precision)
+    if prepared is None:
+        pred = np.asarray(prediction["pred"]).tolist()
+        proba = [""] * len(pred) if prediction["proba"] is None else np.asarray(prediction["proba"]).tolist()
+        return "".join(f"{p},{q}\n" for p, q in zip(pred, proba))
+
+    pred_fmt, proba_fmt, values = prepared
+    n = len(prediction["pred"])
+    if n == 0:
+        return ""
+    if proba_fmt is None:
+        return _join(pred_fmt + ",", n, values, "\n") + "\n"
+    return _join(pred_fmt + "," + proba_fmt, n, values, "\n") + "\n"
+
+
+def encode_jsonlines(prediction: Dict, precision: Optional[int] = None) -> str:
+    """
+    Um objeto {"pred": ..., "proba": ...} por linha (mais "contributions" se pedido).
+    """
+    body = _encode_jsonlines_scores(prediction, precision)
+    objects = _contribution_objects(prediction, precision)
+    if objects is None or not body:
+        return body
+    lines = body[:-1].split("\n")
+    return "".join(line[:-1] + ', "contributions": ' + obj + "}\n" for line, obj in zip(lines, objects))
+
+
+def _encode_jsonlines_scores(prediction: Dict, precision: Optional[int]) -> str:
+    prepared = _row_values(prediction, precision)
+    if prepared is None:
+        pred = _json_values(prediction["pred"])
+        proba = [None] * len(pred) if prediction["proba"] is None else _json_values(prediction["proba"])
+        return "".join(json.dumps({"pred": p, "proba": q}) + "\n" for p, q in zip(pred, proba))
+
+    pred_fmt, proba_fmt, values = prepared
+    n = len(prediction["pred"])
+    if n == 0:
+        return ""
+    if proba_fmt is None:
+        return _join('{"pred": ' + pred_fmt + ', "proba": null}', n, values, "\n") + "\n"
+    return _join('{"pred": ' + pred_fmt + ', "proba": ' + proba_fmt + "}", n, values, "\n") + "\n"
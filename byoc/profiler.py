@@ -0,0 +1,183 @@
+"""
+Profiler por amostragem para o container BYOC, ligado a pedido.
+
+Uma thread de fundo lê sys._current_frames() a cada BYOC_PROFILE_INTERVAL_MS e agrega as stacks.
+No fim escreve em BYOC_PROFILE_DIR:
+  - <nome>.collapsed: stacks colapsadas ("a;b;c N"), prontas para flamegraph.pl / speedscope
+  - <nome>.top.txt: top de funções por amostras próprias e inclusivas
+
+Ativação:
+  - BYOC_PROFILE_SECONDS=N ou BYOC_PROFILE_REQUESTS=N: perfila o model_fn e, em cada worker,
+    os primeiros N segundos/pedidos
+  - POST /admin/profile?seconds=N ou ?requests=N: perfila o worker que recebe o pedido
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+PROFILE_DIR = os.getenv("BYOC_PROFILE_DIR", "/tmp/byoc-profiles")
+PROFILE_INTERVAL_MS = float(os.getenv("BYOC_PROFILE_INTERVAL_MS", "5"))
+PROFILE_SECONDS = float(os.getenv("BYOC_PROFILE_SECONDS", "0"))
+PROFILE_REQUESTS = int(os.getenv("BYOC_PROFILE_REQUESTS", "0"))
+# por omissão só contam amostras dentro dos handlers; 1 = todas as threads, incluindo as paradas
+PROFILE_ALL_THREADS = os.getenv("BYOC_PROFILE_ALL_THREADS", "0") == "1"
+TOP_N = 30
+
+HANDLERS = frozenset(("model_fn", "input_fn", "predict_fn", "output_fn"))
+
+
+def _frame_name(code) -> str:
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+class SamplingProfiler:
+    def __init__(self, label: str, seconds: float = 0, requests: int = 0,
+                 interval_ms: float = PROFILE_INTERVAL_MS, out_dir: str = PROFILE_DIR,
+                 all_threads: bool = PROFILE_ALL_THREADS):
+        self.label = label
+        self.seconds = seconds
+        self.requests_left = requests
+        self.interval = interval_ms / 1000
+        self.out_dir = out_dir
+        self.all_threads = all_threads
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="byoc-profiler", daemon=True)
+        self.paths: Optional[Tuple[str, str]] = None
+
+    def start(self) -> "SamplingProfiler":
+        self._started = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def stop(self, wait: bool = True):
+        self._stop.set()
+        if wait and threading.current_thread() is not self._thread:
+            self._thread.join()
+
+    def request_finished(self):
+        if self.requests_left <= 0:
+            return
+        with self._lock:
+            self.requests_left -= 1
+            if self.requests_left == 0:
+                self._stop.set()
+
+    def _sample(self, own_ident: int):
+        for ident, frame in sys._current_frames().items():
+            if ident == own_ident:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(frame.f_code)
+                frame = frame.f_back
+            if not self.all_threads and not any(code.co_name in HANDLERS for code in stack):
+                continue
+            self.stacks[";".join(_frame_name(code) for code in reversed(stack))] += 1
+            self.samples += 1
+
+    def _run(self):
+        own_ident = threading.get_ident()
+        deadline = self._started + self.seconds if self.seconds > 0 else None
+        while not self._stop.wait(self.interval):
+            self._sample(own_ident)
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+        self.paths = self._write()
+
+    def top_functions(self) -> Tuple[Dict[str, int], Dict[str, int]]:
+        own: Counter = Counter()
+        inclusive: Counter = Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")
+            own[frames[-1]] += count
+            for name in set(frames):
+                inclusive[name] += count
+        return own, inclusive
+
+    def _write(self) -> Tuple[str, str]:
+        os.makedirs(self.out_dir, exist_ok=True)
+        name = f"profile-{self.label}-{os.getpid()}-{time.strftime('%Y%m%d-%H%M%S')}"
+        collapsed_path = os.path.join(self.out_dir, name + ".collapsed")
+        top_path = os.path.join(self.out_dir, name + ".top.txt")
+
+        with open(collapsed_path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+        own, inclusive = self.top_functions()
+        total = max(self.samples, 1)
+        elapsed = time.perf_counter() - self._started
+        with open(top_path, "w") as f:
+            f.write(f"label={self.label} pid={os.getpid()} samples={self.samples} "
+                    f"interval_ms={self.interval * 1000:g} elapsed_s={elapsed:.3f}\n\n")
+            for title, counts in (("self", own), ("inclusive", inclusive)):
+                f.write(f"{'samples':>8} {'%':>6}  function ({title})\n")
+                for fn, count in counts.most_common(TOP_N):
+                    f.write(f"{count:>8} {100 * count / total:>6.1f}  {fn}\n")
+                f.write("\n")
+
+        from inference import log_event
+
+        log_event("profile_written", label=self.label, samples=self.samples,
+                  collapsed=collapsed_path, top=top_path)
+        return collapsed_path, top_path
+
+
+_active: Optional[SamplingProfiler] = None
+_env_started_pid: Optional[int] = None
+_global_lock = threading.Lock()
+
+
+def start(label: str, seconds: float = 0, requests: int = 0) -> SamplingProfiler:
+    """
+    Começa uma sessão neste processo; falha se já houver uma ativa.
+    """
+    global _active
+    if seconds <= 0 and requests <= 0:
+        raise ValueError("Profiling needs seconds > 0 or requests > 0.")
+    with _global_lock:
+        if _active is not None and _active._thread.is_alive():
+            raise RuntimeError("A profiling session is already running in this worker.")
+        _active = SamplingProfiler(label, seconds=seconds, requests=requests).start()
+        return _active
+
+
+def start_from_env():
+    """
+    Sessão configurada por BYOC_PROFILE_SECONDS/BYOC_PROFILE_REQUESTS, uma vez por processo.
+    """
+    global _env_started_pid
+    if (PROFILE_SECONDS <= 0 and PROFILE_REQUESTS <= 0) or _env_started_pid == os.getpid():
+        return
+    _env_started_pid = os.getpid()
+    try:
+        start("requests", seconds=PROFILE_SECONDS, requests=PROFILE_REQUESTS)
+    except RuntimeError:
+        pass
+
+
+def request_finished():
+    if _active is not None:
+        _active.request_finished()
+
+
+@contextmanager
+def profile_model_load():
+    """
+    Perfila o model_fn quando o profiling por env var está ligado.
+    """
+    session = None
+    if PROFILE_SECONDS > 0 or PROFILE_REQUESTS > 0:
+        session = SamplingProfiler("model_fn", interval_ms=min(PROFILE_INTERVAL_MS, 1)).start()
+    try:
+        yield
+    finally:
+        if session is not None:
+            session.stop()
@@ -0,0 +1,97 @@
+"""
+Hot reload do modelo sem reiniciar workers.
+
+Com BYOC_RELOAD_INTERVAL_S > 0, cada worker tem uma thread que verifica BYOC_RELOAD_PATH
+(por omissão o SM_MODEL_DIR) a cada intervalo:
+  - se o caminho for um diretório de modelo (model.joblib ou model_compiled/), recarrega quando
+    os ficheiros mudam (mtime/tamanho);
+  - se tiver subdiretórios de modelo (ex.: v0001/, v0002/), usa o último por ordem de nome.
+
+O novo modelo é carregado em fundo e trocado de uma só vez; pedidos em curso terminam com o
+modelo que tinham. Para evitar apanhar ficheiros a meio da escrita, publicar cada versão num
+diretório escondido (.v0003/) e fazer rename para o nome final no fim.
+"""
+import os
+import threading
+from typing import Callable, Optional, Tuple
+
+import inference
+
+RELOAD_INTERVAL_S = float(os.getenv("BYOC_RELOAD_INTERVAL_S", "0"))
+RELOAD_PATH = os.getenv("BYOC_RELOAD_PATH", "")
+
+_MODEL_FILES = ("model.joblib", os.path.join("model_compiled", "header.json"))
+
+
+def is_model_dir(path: str) -> bool:
+    return any(os.path.exists(os.path.join(path, f)) for f in _MODEL_FILES)
+
+
+def resolve_model_dir(path: str) -> Optional[str]:
+    """
+    O próprio path se for um diretório de modelo, senão o último subdiretório de modelo por nome.
+    """
+    if is_model_dir(path):
+        return path
+    try:
+        names = sorted(os.listdir(path))
+    except OSError:
+        return None
+    # diretórios escondidos (.v0003) são versões a meio da publicação
+    versions = [os.path.join(path, n) for n in names
+                if not n.startswith(".") and is_model_dir(os.path.join(path, n))]
+    return versions[-1] if versions else None
+
+
+def fingerprint(model_dir: str) -> Tuple:
+    entries = []
+    for root, _, files in os.walk(model_dir):
+        for name in sorted(files):
+            try:
+                st = os.stat(os.path.join(root, name))
+            except OSError:
+                continue
+            entries.append((os.path.relpath(os.path.join(root, name), model_dir), st.st_mtime_ns, st.st_size))
+    return tuple(sorted(entries))
+
+
+class ModelWatcher:
+    def __init__(self, path: str, current_dir: str, on_new_model: Callable[[object, str], None],
+                 interval_s: float = RELOAD_INTERVAL_S):
+        self.path = path
+        self.interval_s = interval_s
+        self.on_new_model = on_new_model
+        self._seen = (current_dir, fingerprint(current_dir))
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="byoc-model-watcher", daemon=True)
+
+    def start(self) -> "ModelWatcher":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def check(self) -> bool:
+        """
+        Uma verificação; devolve True se trocou de modelo.
+        """
+        model_dir = resolve_model_dir(self.path)
+        if model_dir is None:
+            return False
+        current = (model_dir, fingerprint(model_dir))
+        if current == self._seen:
+            return False
+        # mesmo que falhe, só volta a tentar quando os ficheiros mudarem outra vez
+        self._seen = current
+        try:
+            model = inference.model_fn(model_dir)
+        except Exception as e:
+            inference.log_event("model_reload_failed", model_dir=model_dir, error=str(e))
+            return False
+        self.on_new_model(model, model_dir)
+        return True
+
+    def _run(self):
+        while not self._stop.wait(self.interval_s):
+            self.check()
@@ -0,0 +1,178 @@
+import hashlib
+import json
+import os
+from typing import Any, Optional, Tuple
+
+import numpy as np
+
+# float64 reproduz o sklearn bit a bit; float32 é mais rápido em batches grandes
+SCORER_DTYPE = os.getenv("BYOC_SCORER_DTYPE", "float64")
+
+# artefacto escrito por src/steps/train_sm.py:save_compiled_model
+COMPILED_DIR = "model_compiled"
+COMPILED_FORMAT = "byoc-linear"
+COMPILED_FORMAT_VERSION = 1
+
+
+class LinearScorer:
+    """
+    Scorer compilado para o pipeline StandardScaler + LogisticRegression (binário).
+
+    A média/escala do scaler são dobradas num único vetor de pesos e bias:
+        z = ((x - mean) / scale) @ coef + b = x @ w + c
+    pelo que classe e probabilidade saem do mesmo produto escalar.
+
+    A contribuição exata de cada feature para o logit é ((x - mean) / scale) * coef = (x - mean) * w,
+    e z = intercept + soma das contribuições. Sem mean (artefactos antigos), a referência é x = 0
+    e a base é o próprio bias.
+    """
+
+    def __init__(self, weights, bias: float, classes, feature_names=None,
+                 dtype: str = SCORER_DTYPE, estimator: Any = None, mean=None, intercept: float = None,
+                 scale=None):
+        self.dtype = np.dtype(dtype)
+        self.weights = np.ascontiguousarray(weights, dtype=self.dtype)
+        self.bias = self.dtype.type(bias)
+        if mean is None:
+            self.mean = np.zeros_like(self.weights)
+            self.intercept = self.bias
+        else:
+            self.mean = np.ascontiguousarray(mean, dtype=self.dtype)
+            self.intercept = self.dtype.type(intercept)
+        # escala do scaler, já dobrada nos pesos; o capture usa-a para z-scores
+        self.scale = np.asarray(scale, dtype=np.float64) if scale is not None else None
+        self.classes = np.asarray(classes)
+        self.feature_names = list(feature_names) if feature_names is not None else None
+        self.n_features = int(self.weights.shape[0])
+        # muda sempre que os pesos mudam; usado como chave de cache/versão de modelo
+        digest = hashlib.blake2b(digest_size=8)
+        digest.update(np.asarray(weights, dtype=np.float64).tobytes())
+        digest.update(np.float64(bias).tobytes())
+        digest.update(repr(self.classes.tolist()).encode("utf-8"))
+        self.version = digest.hexdigest()
+        # modelo original, para quem precise do caminho genérico do sklearn
+        self.estimator = estimator
+
+    def _as_matrix(self, X) -> np.ndarray:
+        X = np.asarray(X, dtype=self.dtype)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[1] != self.n_features:
+            raise ValueError(f"Expected {self.n_features} features, got {X.shape[1]}")
+        # o sklearn recusa NaN/inf ("Input X contains NaN"); sem isto um NaN saía como pred=0, proba=nan
+        if not np.isfinite(X).all():
+            row, col = np.argwhere(~np.isfinite(X))[0]
+            raise ValueError(f"Row {row}, column {col}: non-finite value {float(X[row, col])!r}")
+        return X
+
+    def decision_function(self, X) -> np.ndarray:
+        return self._as_matrix(X) @ self.weights + self.bias
+
+    def _from_logit(self, z: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        # sigmoide estável: nunca faz exp de um valor positivo
+        e = np.exp(-np.abs(z))
+        proba = np.where(z >= 0, 1.0 / (1.0 + e), e / (1.0 + e))
+        # igual ao LogisticRegression.predict: classe positiva se z > 0
+        pred = self.classes[(z > 0).astype(np.intp)]
+        return pred, proba
+
+    def predict_with_proba(self, X) -> Tuple[np.ndarray, np.ndarray]:
+        return self._from_logit(self.decision_function(X))
+
+    def predict_with_contributions(self, X, top_k: int = 0):
+        """
+        Classe, probabilidade e contribuições por feature a partir da mesma matriz.
+        Devolve (pred, proba, índices, valores), com as colunas de cada linha ordenadas por
+        |contribuição| decrescente e cortadas às top_k maiores (0 = todas).
+        """
+        X = self._as_matrix(X)
+        # o logit vem do mesmo produto do predict_with_proba, para a classe não depender do explain
+        pred, proba = self._from_logit(X @ self.weights + self.bias)
+        contrib = (X - self.mean) * self.weights
+        magnitude = np.abs(contrib)
+        if 0 < top_k < self.n_features:
+            idx = np.argpartition(-magnitude, top_k - 1, axis=1)[:, :top_k]
+            order = np.argsort(-np.take_along_axis(magnitude, idx, axis=1), axis=1, kind="stable")
+            idx = np.take_along_axis(idx, order, axis=1)
+        else:
+            idx = np.argsort(-magnitude, axis=1, kind="stable")
+        return pred, proba, idx, np.take_along_axis(contrib, idx, axis=1)
+
+    def predict_proba(self, X) -> np.ndarray:
+        proba = self.predict_with_proba(X)[1]
+        return np.column_stack([1.0 - proba, proba])
+
+    def predict(self, X) -> np.ndarray:
+        return self.predict_with_proba(X)[0]
+
+
+def compile_model(model: Any, dtype: str = SCORER_DTYPE) -> Optional[LinearScorer]:
+    """
+    Tenta compilar o modelo num LinearScorer.
+    Devolve None para qualquer forma que não seja StandardScaler + LogisticRegression binário.
+    """
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import StandardScaler
+
+    if isinstance(model, Pipeline):
+        steps = [est for _, est in model.steps if est not in (None, "passthrough")]
+    else:
+        steps = [model]
+
+    if not steps or not isinstance(steps[-1], LogisticRegression):
+        return None
+    clf = steps[-1]
+    scalers = steps[:-1]
+    if len(scalers) > 1 or (scalers and not isinstance(scalers[0], StandardScaler)):
+        return None
+    if clf.coef_.shape[0] != 1 or len(clf.classes_) != 2:
+        return None
+
+    coef = clf.coef_[0].astype(np.float64)
+    intercept = float(clf.intercept_[0])
+    bias = intercept
+    mean = np.zeros_like(coef)
+    scale = None
+
+    if scalers:
+        scaler = scalers[0]
+        scale = scaler.scale_ if scaler.scale_ is not None else np.ones_like(coef)
+        if scaler.with_mean and scaler.mean_ is not None:
+            mean = scaler.mean_
+        coef = coef / scale
+        bias = bias - float(mean @ coef)
+
+    feature_names = getattr(model, "feature_names_in_", None)
+    return LinearScorer(coef, bias, clf.classes_, feature_names=feature_names,
+                        dtype=dtype, estimator=model, mean=mean, intercept=intercept, scale=scale)
+
+
+def load_compiled(model_dir: str, dtype: str = SCORER_DTYPE) -> Optional[LinearScorer]:
+    """
+    Lê o artefacto compilado (header.json + .npy) com mmap, sem unpickle.
+    Devolve None se não existir ou se for de um formato/versão que não conhecemos.
+    """
+    base = os.path.join(model_dir, COMPILED_DIR)
+    header_path = os.path.join(base, "header.json")
+    if not os.path.exists(header_path):
+        return None
+
+    with open(header_path) as f:
+        header = json.load(f)
+    if header.get("format") != COMPILED_FORMAT or header.get("version") != COMPILED_FORMAT_VERSION:
+        return None
+
+    # páginas partilhadas entre workers; com o mesmo dtype o scorer usa-as sem cópia
+    weights = np.load(os.path.join(base, header["arrays"]["weights"]), mmap_mode="r")
+    if weights.shape != (header["n_features"],):
+        raise ValueError(f"Compiled model weights have shape {weights.shape}, "
+                         f"expected ({header['n_features']},)")
+    mean = scale = None
+    if "mean" in header["arrays"] and "intercept" in header:
+        mean = np.load(os.path.join(base, header["arrays"]["mean"]), mmap_mode="r")
+    if "scale" in header["arrays"]:
+        scale = np.load(os.path.join(base, header["arrays"]["scale"]), mmap_mode="r")
+    return LinearScorer(weights, header["bias"], header["classes"],
+                        feature_names=header.get("feature_names"), dtype=dtype,
+                        mean=mean, intercept=header.get("intercept"), scale=scale)
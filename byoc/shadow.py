@@ -0,0 +1,159 @@
+"""
+Shadow scoring champion/challenger no mesmo container.
+
+Com BYOC_CHALLENGER_DIR definido, o model_fn carrega também o challenger. Depois de o champion
+responder, a mesma matriz já parseada vai para uma fila e é avaliada pelo challenger numa thread
+de fundo; o resultado (concordância, diferença de probabilidades, tempos) é registado fora da
+resposta, em BYOC_SHADOW_LOG (JSON Lines) ou no log.
+
+Orçamento, e o que garante (por worker):
+  - o pedido do champion nunca espera pelo challenger: paga o sorteio da amostra e um put_nowait;
+  - a fila é limitada em tempo: cada batch entra com o custo estimado de o drenar (linhas x custo
+    médio por linha dos batches anteriores de tamanho parecido, incluindo registo e pausas) e é descartado se o
+    trabalho em fila passar BYOC_SHADOW_MAX_BACKLOG_MS (além do limite em número de batches,
+    BYOC_SHADOW_QUEUE). As comparações ficam atrasadas no máximo cerca desse tempo e a memória
+    retida é proporcional;
+  - a thread do challenger está ocupada (score, comparação e registo) no máximo
+    BYOC_SHADOW_MAX_CPU_FRACTION do tempo, em média (dorme o necessário depois de cada batch).
+Não garante um limite à latência extra de cada pedido do champion: enquanto o challenger avalia
+um batch, partilha o GIL e o CPU do worker, e um pedido que chegue nesse momento pode esperar por
+eles (até sys.getswitchinterval() por troca de GIL, mais se os CPUs estiverem saturados).
+O efeito no p99 mede-se com src/steps/benchmark_byoc.py --challenger-dir ... --shadow off,on.
+"""
+import json
+import os
+import queue
+import random
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+CHALLENGER_DIR = os.getenv("BYOC_CHALLENGER_DIR", "")
+SHADOW_SAMPLE = float(os.getenv("BYOC_SHADOW_SAMPLE", "1.0"))
+SHADOW_QUEUE = int(os.getenv("BYOC_SHADOW_QUEUE", "64"))
+SHADOW_MAX_CPU_FRACTION = float(os.getenv("BYOC_SHADOW_MAX_CPU_FRACTION", "0.2"))
+SHADOW_MAX_BACKLOG_MS = float(os.getenv("BYOC_SHADOW_MAX_BACKLOG_MS", "200"))
+SHADOW_LOG = os.getenv("BYOC_SHADOW_LOG", "")
+
+
+def compare(champion: Dict, challenger: Dict) -> Dict:
+    pred_a = np.asarray(champion["pred"])
+    pred_b = np.asarray(challenger["pred"])
+    out = {
+        "rows": int(len(pred_a)),
+        "agreement": float(np.mean(pred_a == pred_b)) if len(pred_a) else None,
+        "champion_positive": int(np.count_nonzero(pred_a == 1)),
+        "challenger_positive": int(np.count_nonzero(pred_b == 1)),
+    }
+    if champion["proba"] is not None and challenger["proba"] is not None and len(pred_a):
+        diff = np.abs(np.asarray(champion["proba"]) - np.asarray(challenger["proba"]))
+        out["mean_abs_proba_diff"] = float(diff.mean())
+        out["max_abs_proba_diff"] = float(diff.max())
+    return out
+
+
+class Shadow:
+    def __init__(self, challenger, predict: Callable, champion_version: Callable[[object], str],
+                 challenger_version: str, queue_size: int = SHADOW_QUEUE,
+                 sample: float = SHADOW_SAMPLE, max_cpu_fraction: float = SHADOW_MAX_CPU_FRACTION,
+                 max_backlog_ms: float = SHADOW_MAX_BACKLOG_MS, log_path: str = SHADOW_LOG):
+        self.challenger = challenger
+        self.predict = predict
+        self.champion_version = champion_version
+        self.challenger_version = challenger_version
+        self.sample = sample
+        self.max_cpu_fraction = max_cpu_fraction
+        self.max_backlog_s = max_backlog_ms / 1000
+        self.log_path = log_path
+        self._queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+        # custo médio por linha do challenger (segundos, já com a pausa) por classe de tamanho de
+        # batch (potências de 2: o registo pesa mais por linha nos batches pequenos) e trabalho em fila
+        self._row_s: Dict[int, float] = {}
+        self._backlog_s = 0.0
+        self._backlog_lock = threading.Lock()
+        self.batches = 0
+        self.rows = 0
+        self.dropped = 0
+        self.errors = 0
+
+    def _ensure_thread(self):
+        # a thread não sobrevive ao fork (o model_fn corre no master)
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._queue = queue.Queue(maxsize=self._queue.maxsize)
+                    self._backlog_s = 0.0
+                    threading.Thread(target=self._run, name="byoc-shadow", daemon=True).start()
+                    self._pid = os.getpid()
+
+    def submit(self, X, champion: Dict, champion_model, champion_s: float):
+        """
+        Chamado no caminho do pedido: nunca bloqueia.
+        """
+        if self.sample < 1.0 and random.random() >= self.sample:
+            return
+        self._ensure_thread()
+        cost = len(X) * self._row_s.get(len(X).bit_length(), 0.0)
+        with self._backlog_lock:
+            if self._backlog_s + cost > self.max_backlog_s:
+                self.dropped += 1
+                return
+            self._backlog_s += cost
+        try:
+            self._queue.put_nowait((X, champion, self.champion_version(champion_model), champion_s, cost))
+        except queue.Full:
+            with self._backlog_lock:
+                self._backlog_s -= cost
+            self.dropped += 1
+
+    def _record(self, record: Dict):
+        if self.log_path:
+            with open(self.log_path, "a") as f:
+                f.write(json.dumps(record) + "\n")
+        else:
+            from inference import log_event
+
+            log_event("shadow", **record)
+
+    def _run(self):
+        while True:
+            X, champion, champion_version, champion_s, cost = self._queue.get()
+            t0 = time.perf_counter()
+            try:
+                challenger = self.predict(X, self.challenger)
+                challenger_s = time.perf_counter() - t0
+                self._record({
+                    "ts": time.time(),
+                    "champion_version": champion_version,
+                    "challenger_version": self.challenger_version,
+                    "champion_ms": champion_s * 1000,
+                    "challenger_ms": challenger_s * 1000,
+                    **compare(champion, challenger),
+                })
+                self.batches += 1
+                self.rows += len(X)
+            except Exception as e:
+                self.errors += 1
+                from inference import log_event
+
+                log_event("shadow_failed", error=str(e))
+            # duty cycle: trabalho/(trabalho+pausa) <= max_cpu_fraction; o trabalho inclui a
+            # comparação e a escrita do registo, que em batches pequenos custam mais do que o score
+            work_s = time.perf_counter() - t0
+            pause_s = 0.0
+            if 0 < self.max_cpu_fraction < 1:
+                pause_s = work_s * (1 - self.max_cpu_fraction) / self.max_cpu_fraction
+            if len(X):
+                size, row_s = len(X).bit_length(), (work_s + pause_s) / len(X)
+                self._row_s[size] = 0.8 * self._row_s[size] + 0.2 * row_s if size in self._row_s else row_s
+            time.sleep(pause_s)
+            with self._backlog_lock:
+                self._backlog_s = max(0.0, self._backlog_s - cost)
+
+    def stats(self) -> Dict[str, float]:
+        return {"batches": self.batches, "rows": self.rows, "dropped": self.dropped,
+                "errors": self.errors, "queued": self._queue.qsize(), "backlog_ms": self._backlog_s * 1000}
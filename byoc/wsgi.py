@@ -0,0 +1,321 @@
+"""
+App WSGI com o contrato SageMaker (/ping e /invocations) sobre os handlers de inference.py.
+
+Corre com: gunicorn -c gunicorn_conf.py wsgi:app (ver serve). O modelo é carregado
+no master antes do fork (preload), e os workers partilham-no em copy-on-write.
+Deadlines, load shedding e limite de linhas em /invocations: ver admission.py.
+"""
+import json
+import os
+import threading
+import time
+from urllib.parse import parse_qs
+
+import admission
+import inference
+import metrics
+import profiler
+from batch_transform import is_line_format, stream_transform
+from batching import BATCH_ENABLED, Coalescer
+from payloads import parse_media_type
+from reload import RELOAD_INTERVAL_S, RELOAD_PATH, ModelWatcher, resolve_model_dir
+
+MODEL_DIR = os.getenv("SM_MODEL_DIR", "/opt/ml/model")
+# pedidos CSV/JSON Lines acima disto (ou sem Content-Length) são avaliados em streaming
+STREAM_MIN_BYTES = int(os.getenv("BYOC_STREAM_MIN_BYTES", str(8 * 1024 * 1024)))
+
+_lock = threading.Lock()
+_model = None
+_model_dir = None
+# threads (coalescer, watcher) não sobrevivem ao fork: cada processo cria as suas
+_coalescer = None
+_coalescer_pid = None
+_coalescer_model = None
+_watcher_pid = None
+_first_request_pid = None
+_limiter = admission.InflightLimiter()
+
+
+def _initial_model_dir() -> str:
+    if RELOAD_PATH:
+        return resolve_model_dir(RELOAD_PATH) or MODEL_DIR
+    return MODEL_DIR
+
+
+def get_model():
+    global _model, _model_dir
+    if _model is None:
+        with _lock:
+            if _model is None:
+                model_dir = _initial_model_dir()
+                with profiler.profile_model_load():
+                    _model = inference.model_fn(model_dir)
+                _model_dir = model_dir
+    return _model
+
+
+def _set_model(model, model_dir: str):
+    """
+    Troca atómica do modelo; quem já tinha a referência antiga termina com ela.
+    """
+    global _model, _model_dir
+    with _lock:
+        _model, _model_dir = model, model_dir
+    inference.log_event("model_reloaded", pid=os.getpid(), model_dir=model_dir,
+                        model_version=inference.model_version(model))
+
+
+def ensure_watcher():
+    """
+    Arranca o watcher de hot reload neste worker (nunca no master, onde a thread morreria no fork).
+    """
+    global _watcher_pid
+    if RELOAD_INTERVAL_S <= 0 or _watcher_pid == os.getpid():
+        return
+    get_model()
+    with _lock:
+        if _watcher_pid == os.getpid():
+            return
+        ModelWatcher(RELOAD_PATH or MODEL_DIR, _model_dir, _set_model).start()
+        _watcher_pid = os.getpid()
+
+
+def _get_coalescer(model):
+    global _coalescer, _coalescer_pid, _coalescer_model
+    if _coalescer_pid != os.getpid() or _coalescer_model is not model:
+        with _lock:
+            if model is not _model:
+                # pedido que começou antes de um reload: avalia sozinho no modelo antigo
+                return None
+            if _coalescer_pid != os.getpid() or _coalescer_model is not model:
+                if _coalescer is not None and _coalescer_pid == os.getpid():
+                    _coalescer.close()
+                _coalescer = Coalescer(lambda X: inference.predict_fn(X, model))
+                _coalescer_pid, _coalescer_model = os.getpid(), model
+    return _coalescer
+
+
+def _predict(X, model, deadline=None):
+    coalescer = _get_coalescer(model) if BATCH_ENABLED else None
+    if coalescer is not None:
+        return coalescer.submit(X, deadline)
+    return inference.predict_fn(X, model)
+
+
+def invoke(body: bytes, content_type: str, accept: str, timings: dict, custom_attributes: str = "",
+           deadline: float = None):
+    """
+    input_fn -> predict_fn -> output_fn, com o tempo de cada fase em timings (segundos).
+    Partilhado pelos servidores WSGI e ASGI. Devolve (resposta, content type, linhas, versão do modelo).
+    Pedidos com explicações (inference.explain_top_k) são avaliados sozinhos, fora do coalescer.
+    Com deadline (time.perf_counter), um pedido que já expirou levanta admission.DeadlineExceeded
+    antes do parse e antes do scoring.
+    """
+    profiler.start_from_env()
+    ensure_watcher()
+    admission.check_deadline(deadline, "parsing")
+    t0 = time.perf_counter()
+    # uma só leitura: um reload a meio do pedido não o afeta
+    model = get_model()
+    explain = inference.explain_top_k(accept, custom_attributes)
+    data = inference.input_fn(body, content_type)
+    t1 = time.perf_counter()
+    timings["input_fn"] = t1 - t0
+    admission.check_rows(len(data))
+    admission.check_deadline(deadline, "scoring")
+    if explain is not None:
+        prediction = inference.predict_fn(data, model, explain=explain)
+    else:
+        prediction = _predict(data, model, deadline)
+    t2 = time.perf_counter()
+    timings["predict_fn"] = t2 - t1
+    out, out_type = inference.output_fn(prediction, accept)
+    timings["output_fn"] = time.perf_counter() - t2
+    return out, out_type, len(data), inference.model_version(model)
+
+
+def start_profile(query_string: str):
+    """
+    POST /admin/profile?seconds=N ou ?requests=N. Devolve (status, corpo).
+    """
+    params = parse_qs(query_string)
+    try:
+        seconds = float(params.get("seconds", ["0"])[0])
+        requests = int(params.get("requests", ["0"])[0])
+        session = profiler.start("admin", seconds=seconds, requests=requests)
+    except ValueError as e:
+        return 400, str(e)
+    except RuntimeError as e:
+        return 409, str(e)
+    return 200, f"Profiling pid {os.getpid()} (seconds={session.seconds:g}, requests={requests}) into {session.out_dir}"
+
+
+def extra_gauges() -> dict:
+    gauges = {"byoc_inflight": _limiter.inflight, "byoc_shed_total": _limiter.shed}
+    cache = inference._cache
+    if cache is not None:
+        gauges.update({f"byoc_cache_{k}": v for k, v in cache.stats().items()})
+    shadow = inference._shadow
+    if shadow is not None:
+        gauges.update({f"byoc_shadow_{k}": v for k, v in shadow.stats().items()})
+    capture = inference._capture
+    if capture is not None:
+        gauges.update({f"byoc_capture_{k}": v for k, v in capture.stats().items()})
+    return gauges
+
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 409: "Conflict", 413: "Payload Too Large",
+            500: "Internal Server Error", 503: "Service Unavailable", 504: "Gateway Timeout"}
+
+
+def _respond(start_response, status: int, body, content_type: str = "text/plain", headers=()):
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    start_response(f"{status} {_REASONS.get(status, '')}".rstrip(),
+                   [("Content-Type", content_type), ("Content-Length", str(len(body))), *headers])
+    return [body]
+
+
+def _content_length(environ):
+    try:
+        return int(environ["CONTENT_LENGTH"])
+    except (KeyError, ValueError):
+        return None
+
+
+def _read_body(environ) -> bytes:
+    length = _content_length(environ) or 0
+    return environ["wsgi.input"].read(length) if length > 0 else b""
+
+
+def execution_parameters() -> dict:
+    """
+    GET /execution-parameters, consultado pelo batch transform quando os parâmetros não são dados.
+    """
+    workers = int(os.getenv("BYOC_WORKERS", "0")) or os.cpu_count() or 1
+    return {"MaxConcurrentTransforms": workers, "BatchStrategy": "MULTI_RECORD", "MaxPayloadInMB": 100}
+
+
+def _stream_invocation(environ, start_response, content_type: str, accept: str, t0: float, deadline):
+    """
+    /invocations em streaming: lê o body linha a linha e devolve a resposta por chunks.
+    Chamado já com o slot do _limiter, que é libertado no fim do stream.
+    Os erros no primeiro chunk (incluindo deadline e limite de linhas) dão 4xx/5xx; depois do
+    início da resposta só podem cortar o stream.
+    """
+    stats = {}
+    request_bytes = _content_length(environ) or 0
+    lines = iter(environ["wsgi.input"].readline, b"")
+    try:
+        model = get_model()
+        chunks = stream_transform(lines, content_type, accept, model, stats=stats,
+                                  max_rows=admission.MAX_ROWS, deadline=deadline)
+        first = next(chunks, b"")
+    except Exception as e:
+        _limiter.release()
+        headers = []
+        if isinstance(e, admission.Rejected):
+            status, headers = e.status, e.headers()
+        else:
+            status = 400 if isinstance(e, ValueError) else 500
+        metrics.record_request(status, {"total": time.perf_counter() - t0}, 0, request_bytes, len(str(e)))
+        return _respond(start_response, status, str(e), headers=headers)
+
+    start_response("200 OK", [("Content-Type", parse_media_type(accept)[0]),
+                              ("X-Byoc-Model-Version", inference.model_version(model))])
+
+    def body():
+        sent = len(first)
+        try:
+            yield first
+            for out in chunks:
+                sent += len(out)
+                yield out
+        except Exception as e:
+            inference.log_event("stream_failed", error=str(e), rows=stats.get("rows", 0))
+            raise
+        finally:
+            _limiter.release()
+            timings = {k: v for k, v in stats.items() if k != "rows"}
+            timings["total"] = time.perf_counter() - t0
+            metrics.record_request(200, timings, stats.get("rows", 0), request_bytes, sent)
+            profiler.request_finished()
+
+    return body()
+
+
+def app(environ, start_response):
+    global _first_request_pid
+    path = environ.get("PATH_INFO", "")
+    method = environ.get("REQUEST_METHOD", "GET")
+
+    if path == "/ping":
+        try:
+            ensure_watcher()
+            get_model()
+        except Exception as e:
+            return _respond(start_response, 503, str(e))
+        return _respond(start_response, 200, "")
+
+    if path == "/metrics" and method == "GET":
+        return _respond(start_response, 200, metrics.render(extra_gauges()), "text/plain; version=0.0.4")
+
+    if path == "/admin/profile" and method == "POST":
+        return _respond(start_response, *start_profile(environ.get("QUERY_STRING", "")))
+
+    if path == "/execution-parameters" and method == "GET":
+        return _respond(start_response, 200, json.dumps(execution_parameters()), "application/json")
+
+    if path == "/invocations" and method == "POST":
+        t0 = time.perf_counter()
+        timings = {}
+        if not _limiter.try_acquire():
+            # sem ler o body: o gunicorn descarta-o antes do próximo pedido na mesma ligação
+            timings["total"] = time.perf_counter() - t0
+            metrics.record_request(503, timings, 0, 0, 0)
+            return _respond(start_response, 503, "Too many in-flight requests",
+                            headers=admission.Overloaded().headers())
+
+        content_type = environ.get("CONTENT_TYPE", "")
+        accept = environ.get("HTTP_ACCEPT") or "application/json"
+        custom_attributes = environ.get("HTTP_X_AMZN_SAGEMAKER_CUSTOM_ATTRIBUTES", "")
+        length = _content_length(environ)
+        rows = 0
+        body = b""
+        headers = []
+        streaming = False
+        try:
+            arrived = admission.request_start(t0, environ.get("HTTP_X_REQUEST_START"))
+            deadline = admission.request_deadline(arrived, environ.get("HTTP_X_BYOC_DEADLINE_MS"), custom_attributes)
+            admission.check_deadline(deadline, "reading the body")
+            if (is_line_format(content_type) and is_line_format(accept)
+                    and (length is None or length >= STREAM_MIN_BYTES)):
+                # o slot do _limiter passa para o stream, que o liberta quando acaba
+                streaming = True
+                return _stream_invocation(environ, start_response, content_type, accept, t0, deadline)
+            body = _read_body(environ)
+            out, out_type, rows, version = invoke(body, content_type, accept, timings, custom_attributes, deadline)
+            headers.append(("X-Byoc-Model-Version", version))
+            status = 200
+        except admission.Rejected as e:
+            status, out, out_type = e.status, str(e), "text/plain"
+            headers += e.headers()
+        except ValueError as e:
+            status, out, out_type = 400, str(e), "text/plain"
+        except Exception as e:
+            status, out, out_type = 500, str(e), "text/plain"
+        finally:
+            if not streaming:
+                _limiter.release()
+        timings["total"] = time.perf_counter() - t0
+
+        if isinstance(out, str):
+            out = out.encode("utf-8")
+        metrics.record_request(status, timings, rows, len(body), len(out))
+        profiler.request_finished()
+        if status == 200 and _first_request_pid != os.getpid():
+            _first_request_pid = os.getpid()
+            inference.log_event("first_request", pid=_first_request_pid, first_request_s=timings["total"])
+        return _respond(start_response, status, out, out_type, headers + metrics.timing_headers(timings))
+
+    return _respond(start_response, 404, "Not Found")
@@ -0,0 +1,267 @@
+"""
+Leitura de ficheiros de data capture (árvore local, ex.: descarregada de monitoring/datacapture/).
+
+Suporta:
+  - JSON Lines do data capture do SageMaker (.jsonl, também .jsonl.gz), um registo por pedido:
+    captureData.endpointInput/endpointOutput com "data" em CSV ou JSON, possivelmente em
+    base64 (encoding "BASE64"), e eventMetadata com eventId/inferenceId/inferenceTime
+  - .npz do capture do container BYOC (byoc/capture.py), já em colunas
+  - partes do store colunar (convert_capture_columnar.py), com read_columnar_part
+
+decode_capture_file e read_columnar_part devolvem colunas com uma linha por registo (pedidos com várias linhas são
+explodidos): features, pred, proba, weight (1/p da amostragem, 1 sem amostragem),
+event_time (epoch, segundos) e inference_id.
+"""
+import base64
+import gzip
+import json
+import os
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+CAPTURE_SUFFIXES = (".jsonl", ".jsonl.gz", ".npz")
+
+# schema do endpoint (igual a byoc/payloads.py)
+FEATURE_NAMES = ["Time"] + [f"V{i}" for i in range(1, 29)] + ["Amount"]
+
+# colunas do store colunar além das features
+COLUMNAR_EXTRA = ("pred", "proba", "weight", "event_time", "inference_id")
+
+
+def capture_feature_names(n: int) -> List[str]:
+    return FEATURE_NAMES if n == len(FEATURE_NAMES) else [f"_c{i}" for i in range(n)]
+
+
+def iter_capture_files(root: str) -> Iterator[str]:
+    """
+    Ficheiros de capture por ordem de caminho (a árvore AAAA/MM/DD/HH/ fica por ordem de tempo).
+    Ficheiros .tmp (ainda a ser escritos) e diretórios escondidos são ignorados.
+    """
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith("."))
+        for name in sorted(filenames):
+            if name.endswith(CAPTURE_SUFFIXES) and not name.startswith("."):
+                yield os.path.join(dirpath, name)
+
+
+def _payload_text(entry: Dict) -> Tuple[str, str]:
+    """
+    (texto, media type) de um endpointInput/endpointOutput.
+    """
+    data = entry.get("data", "")
+    if entry.get("encoding", "").upper() == "BASE64":
+        data = base64.b64decode(data).decode("utf-8")
+    media = entry.get("observedContentType", "").split(";")[0].strip().lower()
+    return data, media
+
+
+def _csv_rows(text: str) -> List[List[str]]:
+    return [line.split(",") for line in text.splitlines() if line.strip()]
+
+
+def _to_float(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def parse_input(text: str, media: str) -> np.ndarray:
+    """
+    Matriz (linhas, features) de um pedido; valores não numéricos ficam NaN.
+    """
+    if media in ("application/jsonlines", "application/x-jsonlines", "application/jsonl"):
+        rows = []
+        for line in text.splitlines():
+            if line.strip():
+                obj = json.loads(line)
+                rows.append(obj.get("features", obj) if isinstance(obj, dict) else obj)
+    elif media.startswith("application/json"):
+        obj = json.loads(text)
+        if isinstance(obj, dict):
+            obj = obj.get("instances", obj.get("data", []))
+        rows = obj if obj and isinstance(obj[0], list) else [obj]
+    else:
+        rows = _csv_rows(text)
+    if not rows:
+        return np.empty((0, 0))
+    try:
+        # caso comum (retangular e tudo numérico): uma só conversão
+        out = np.array(rows, dtype=np.float64)
+        if out.ndim == 2:
+            return out
+    except (TypeError, ValueError):
+        pass
+    width = max(len(r) for r in rows)
+    out = np.full((len(rows), width), np.nan)
+    for i, row in enumerate(rows):
+        out[i, :len(row)] = [_to_float(v) for v in row]
+    return out
+
+
+def parse_output(text: str, media: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (pred, proba) da resposta do BYOC: JSON {"pred": [...], "proba": [...]}, JSON Lines
+    ou CSV "pred,proba" por linha.
+    """
+    if media in ("application/jsonlines", "application/x-jsonlines", "application/jsonl"):
+        objs = [json.loads(line) for line in text.splitlines() if line.strip()]
+        pred = [o.get("pred") for o in objs]
+        proba = [o.get("proba") for o in objs]
+    elif media.startswith("application/json"):
+        obj = json.loads(text)
+        pred = obj.get("pred", []) if isinstance(obj, dict) else obj
+        proba = obj.get("proba") if isinstance(obj, dict) else None
+        if not isinstance(pred, list):
+            pred = [pred]
+        if proba is None:
+            proba = [None] * len(pred)
+        elif not isinstance(proba, list):
+            proba = [proba]
+    else:
+        rows = _csv_rows(text)
+        pred = [r[0] for r in rows]
+        proba = [r[1] if len(r) > 1 else None for r in rows]
+    return (np.array([_to_float(v) for v in pred], dtype=np.float64),
+            np.array([_to_float(v) for v in proba], dtype=np.float64))
+
+
+def _event_time(value: Optional[str]) -> float:
+    if not value:
+        return np.nan
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return np.nan
+
+
+def _empty(n_features: int) -> Dict[str, np.ndarray]:
+    return {
+        "features": np.empty((0, n_features)),
+        "pred": np.empty(0),
+        "proba": np.empty(0),
+        "weight": np.empty(0),
+        "event_time": np.empty(0),
+        "inference_id": np.empty(0, dtype="U64"),
+    }
+
+
+def _decode_jsonl(path: str, n_features: Optional[int]) -> Dict[str, np.ndarray]:
+    opener = gzip.open if path.endswith(".gz") else open
+    features, preds, probas, weights, times, ids = [], [], [], [], [], []
+    with opener(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            capture = record.get("captureData", {})
+            meta = record.get("eventMetadata", {})
+            if "endpointInput" not in capture:
+                continue
+            X = parse_input(*_payload_text(capture["endpointInput"]))
+            n = len(X)
+            if n == 0:
+                continue
+            if "endpointOutput" in capture:
+                pred, proba = parse_output(*_payload_text(capture["endpointOutput"]))
+            else:
+                pred, proba = np.empty(0), np.empty(0)
+            if len(pred) != n:
+                # resposta de erro ou num formato que não conhecemos
+                pred, proba = np.full(n, np.nan), np.full(n, np.nan)
+            sampling = meta.get("samplingWeights")
+            features.append(X)
+            preds.append(pred)
+            probas.append(proba)
+            weights.append(np.asarray(sampling, dtype=np.float64) if sampling and len(sampling) == n
+                           else np.ones(n))
+            times.append(np.full(n, _event_time(meta.get("inferenceTime"))))
+            ids.append(np.full(n, meta.get("inferenceId") or meta.get("eventId") or "", dtype="U64"))
+
+    if not features:
+        return _empty(n_features or 0)
+    width = n_features or max(x.shape[1] for x in features)
+    # pedidos com colunas a mais/menos: corta ou completa com NaN até à largura esperada
+    features = [x[:, :width] if x.shape[1] >= width else np.pad(x, ((0, 0), (0, width - x.shape[1])),
+                                                                constant_values=np.nan) for x in features]
+    return {
+        "features": np.concatenate(features),
+        "pred": np.concatenate(preds),
+        "proba": np.concatenate(probas),
+        "weight": np.concatenate(weights),
+        "event_time": np.concatenate(times),
+        "inference_id": np.concatenate(ids),
+    }
+
+
+def _decode_npz(path: str) -> Dict[str, np.ndarray]:
+    with np.load(path, allow_pickle=False) as z:
+        return {
+            "features": z["features"].astype(np.float64),
+            "pred": z["pred"].astype(np.float64),
+            "proba": z["proba"].astype(np.float64),
+            "weight": z["weight"].astype(np.float64),
+            "event_time": z["time"].astype(np.float64),
+            "inference_id": z["inference_id"].astype("U64"),
+        }
+
+
+def decode_capture_file(path: str, n_features: Optional[int] = None) -> Dict[str, np.ndarray]:
+    if path.endswith(".npz"):
+        return _decode_npz(path)
+    return _decode_jsonl(path, n_features)
+
+
+def thin_to_uniform(weight: np.ndarray, rng: np.random.Generator, max_weight: Optional[float] = None) -> np.ndarray:
+    """
+    Máscara que transforma uma amostra com pesos 1/p numa amostra uniforme à menor taxa:
+    cada linha fica com probabilidade weight / max_weight (por omissão o maior peso presente).
+    Sem pesos (todos 1) e sem max_weight fica tudo; para juntar amostras de vários ficheiros
+    numa só amostra uniforme, todos têm de ser desbastados com o mesmo max_weight.
+    """
+    top = max_weight or (weight.max() if len(weight) else 1.0)
+    if top <= 1.0:
+        return np.ones(len(weight), dtype=bool)
+    return rng.random(len(weight)) < weight / top
+
+
+def iter_columnar_parts(root: str, since: Optional[str] = None) -> Iterator[str]:
+    """
+    Partes do store colunar por ordem de partição (dt=AAAA-MM-DD/hour=HH).
+    since ("AAAA-MM-DDTHH") deixa de fora as horas anteriores.
+    """
+    for dt in sorted(d for d in os.listdir(root) if d.startswith("dt=")):
+        for hour in sorted(h for h in os.listdir(os.path.join(root, dt)) if h.startswith("hour=")):
+            if since and f"{dt[3:]}T{hour[5:]}" < since:
+                continue
+            part_dir = os.path.join(root, dt, hour)
+            for name in sorted(os.listdir(part_dir)):
+                if name.startswith("part-") and not name.endswith(".tmp"):
+                    yield os.path.join(part_dir, name)
+
+
+def read_columnar_part(path: str) -> Dict[str, np.ndarray]:
+    """
+    Uma parte do store colunar (.parquet ou diretório de .npy, estes em mmap), com as mesmas
+    colunas que decode_capture_file.
+    """
+    if path.endswith(".parquet"):
+        import pandas as pd
+
+        df = pd.read_parquet(path)
+        columns = {c: df[c].to_numpy() for c in df.columns}
+        names = [c for c in df.columns if c not in COLUMNAR_EXTRA]
+    else:
+        columns = {name[:-4]: np.load(os.path.join(path, name), mmap_mode="r", allow_pickle=False)
+                   for name in os.listdir(path) if name.endswith(".npy")}
+        names = capture_feature_names(len(columns) - len(COLUMNAR_EXTRA))
+    return {
+        "features": np.column_stack([columns[n] for n in names]).astype(np.float64, copy=False),
+        "pred": np.asarray(columns["pred"], dtype=np.float64),
+        "proba": np.asarray(columns["proba"], dtype=np.float64),
+        "weight": np.asarray(columns["weight"], dtype=np.float64),
+        "event_time": np.asarray(columns["event_time"], dtype=np.float64),
+        "inference_id": np.asarray(columns["inference_id"]).astype("U64"),
+    }
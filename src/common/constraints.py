@@ -0,0 +1,179 @@
+"""
+Avaliação local de constraints.json (Model Monitor) sobre lotes inteiros de dados.
+
+CompiledConstraints lê constraints.json (e statistics.json, para o baseline_drift_check) uma
+vez e guarda tudo em arrays por coluna: completude mínima, tipo esperado, limites e a CDF do
+baseline já acumulada a partir do sketch KLL. evaluate(X) corre cada check para todas as
+colunas de uma vez e devolve as violações no formato de constraint_violations.json:
+  {"feature_name": ..., "constraint_check_type": ..., "description": ...}
+
+Checks:
+  - missing_column_check / extra_column_check: número de colunas diferente do baseline
+  - completeness_check: fração de valores presentes abaixo de "completeness"
+  - data_type_check: fração dos presentes com o tipo do baseline abaixo de datatype_check_threshold
+    (Integral exige valor inteiro; Fractional aceita qualquer número; String aceita tudo)
+  - bounds_check: valores abaixo de 0 com num_constraints.is_non_negative, ou fora de
+    num_constraints.min/max (extensão local, o Model Monitor não os escreve)
+  - baseline_drift_check: distância L-infinito entre a CDF do lote e a do baseline acima de
+    comparison_threshold (a de linf_distance em src/common/sketches.py, mas exata do lado do lote:
+    o lote é ordenado em vez de resumido num sketch)
+"""
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from src.common.sketches import DEFAULT_MONITORING_CONFIG, KLLSketch, default_feature_names
+
+NUMERIC_TYPES = ("Integral", "Fractional")
+
+
+def _enabled(value) -> bool:
+    return str(value).lower() in ("enabled", "true", "1")
+
+
+def _baseline_cdf(feature: Dict):
+    """
+    (itens distintos ordenados, CDF em cada item, CDF imediatamente antes de cada item) do sketch
+    KLL de uma feature do statistics.json.
+    """
+    sketch = feature.get("numerical_statistics", {}).get("distribution", {}).get("kll", {}).get("sketch")
+    if not sketch:
+        return None
+    items, cdf = KLLSketch.from_dict(sketch).sorted_cdf()
+    if len(items) == 0:
+        return None
+    last = np.append(items[1:] != items[:-1], True)
+    items, cdf = items[last], cdf[last]
+    return items, cdf, np.concatenate([[0.0], cdf[:-1]])
+
+
+def _linf(sorted_values: np.ndarray, items: np.ndarray, cdf: np.ndarray, cdf_before: np.ndarray) -> float:
+    """
+    Supremo de |F_lote - F_baseline|. Entre dois itens do baseline a CDF dele é constante e a do
+    lote só sobe, por isso chega avaliar a do lote em cada item e imediatamente antes dele:
+    duas pesquisas binárias por item, sem percorrer o lote.
+    """
+    n = len(sorted_values)
+    at = np.searchsorted(sorted_values, items, side="right") / n
+    before = np.searchsorted(sorted_values, items, side="left") / n
+    return float(max(np.max(np.abs(at - cdf)), np.max(np.abs(before - cdf_before))))
+
+
+def _violation(name: str, check: str, description: str) -> Dict:
+    return {"feature_name": name, "constraint_check_type": check, "description": description}
+
+
+class CompiledConstraints:
+    def __init__(self, constraints: Dict, statistics: Optional[Dict] = None):
+        config = {**DEFAULT_MONITORING_CONFIG, **constraints.get("monitoring_config", {})}
+        distribution = {**DEFAULT_MONITORING_CONFIG["distribution_constraints"],
+                        **config.get("distribution_constraints", {})}
+        features = constraints["features"]
+
+        self.names = [f["name"] for f in features]
+        self.types = [f.get("inferred_type", "Unknown") for f in features]
+        self.evaluate_constraints = _enabled(config.get("evaluate_constraints", "Enabled"))
+        self.datatype_threshold = float(config.get("datatype_check_threshold", 1.0))
+        self.completeness = np.array([f.get("completeness", 0.0) for f in features], dtype=np.float64)
+        self.integral = np.array([t == "Integral" for t in self.types])
+        self.numeric = np.array([t in NUMERIC_TYPES for t in self.types])
+
+        self.lower = np.full(len(features), -np.inf)
+        self.upper = np.full(len(features), np.inf)
+        for j, f in enumerate(features):
+            num = f.get("num_constraints", {})
+            if num.get("is_non_negative"):
+                self.lower[j] = 0.0
+            if "min" in num:
+                self.lower[j] = max(self.lower[j], float(num["min"]))
+            if "max" in num:
+                self.upper[j] = float(num["max"])
+
+        self.threshold = float(distribution.get("comparison_threshold", 0.1))
+        self.baseline = {}
+        if statistics and _enabled(distribution.get("perform_comparison", "Enabled")):
+            by_name = {f["name"]: f for f in statistics.get("features", [])}
+            for j, name in enumerate(self.names):
+                cdf = _baseline_cdf(by_name[name]) if name in by_name and self.numeric[j] else None
+                if cdf is not None:
+                    self.baseline[j] = cdf
+
+    def _check_columns(self, width: int) -> List[Dict]:
+        expected = len(self.names)
+        if width == expected:
+            return []
+        description = (f"There are {'missing' if width < expected else 'extra'} columns in current dataset. "
+                       f"Number of columns in current dataset: {width}, "
+                       f"Number of columns in baseline constraints: {expected}")
+        if width < expected:
+            return [_violation(name, "missing_column_check", description) for name in self.names[width:]]
+        return [_violation(name, "extra_column_check", description)
+                for name in default_feature_names(width)[expected:]]
+
+    def _drift(self, column: np.ndarray, n_numeric: int, j: int) -> float:
+        if n_numeric == 0:
+            return float("nan")
+        # o sort põe os NaN no fim
+        return _linf(np.sort(column)[:n_numeric], *self.baseline[j])
+
+    def evaluate(self, X: np.ndarray, n_string: Optional[np.ndarray] = None, workers: int = 1) -> Dict:
+        """
+        X: (linhas, colunas) float com NaN para vazio/não numérico; n_string conta, por coluna,
+        os não numéricos (ex.: de frame_to_matrix). Devolve {"violations": [...]}.
+        O custo está na ordenação das colunas do drift: X em ordem de Fortran (colunas
+        contíguas) ordena mais depressa, e com workers > 1 as colunas vão em paralelo
+        (o np.sort liberta o GIL).
+        """
+        X = np.asarray(X, dtype=np.float64)
+        violations = self._check_columns(X.shape[1])
+        width = min(X.shape[1], len(self.names))
+        n = len(X)
+        if not self.evaluate_constraints or n == 0 or width == 0:
+            return {"violations": violations}
+        X = X[:, :width]
+        n_string = np.zeros(width) if n_string is None else np.asarray(n_string[:width], dtype=np.float64)
+
+        n_numeric = n - np.count_nonzero(np.isnan(X), axis=0)
+        present = n_numeric + n_string
+        matching = np.where(self.numeric[:width], n_numeric, present)
+        for j in np.flatnonzero(self.integral[:width]):
+            matching[j] = np.count_nonzero(X[:, j] == np.floor(X[:, j]))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            completeness = present / n
+            match = np.where(present > 0, matching / present, 1.0)
+        outside = np.zeros(width, dtype=np.int64)
+        for j in np.flatnonzero(np.isfinite(self.lower[:width]) | np.isfinite(self.upper[:width])):
+            outside[j] = np.count_nonzero((X[:, j] < self.lower[j]) | (X[:, j] > self.upper[j]))
+
+        for j in np.flatnonzero(completeness < self.completeness[:width]):
+            violations.append(_violation(
+                self.names[j], "completeness_check",
+                f"Data completeness requirement is not met. Expected: {self.completeness[j]:.1%} complete. "
+                f"Observed: Only {completeness[j]:.1%} complete."))
+        for j in np.flatnonzero(match < self.datatype_threshold):
+            violations.append(_violation(
+                self.names[j], "data_type_check",
+                f"Data type match requirement is not met. Expected data type: {self.types[j]}, "
+                f"Expected match: {self.datatype_threshold:.1%}. "
+                f"Observed: Only {match[j]:.1%} of data is {self.types[j]}."))
+        for j in np.flatnonzero(outside):
+            bounds = "non-negative" if self.lower[j] == 0 and np.isinf(self.upper[j]) else \
+                f"within [{self.lower[j]:g}, {self.upper[j]:g}]"
+            violations.append(_violation(
+                self.names[j], "bounds_check",
+                f"Data is expected to be {bounds}. Observed: {int(outside[j])} of {int(n_numeric[j])} "
+                f"values outside."))
+
+        drift = [j for j in self.baseline if j < width]
+        if workers > 1 and len(drift) > 1:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                distances = list(pool.map(lambda j: self._drift(X[:, j], n_numeric[j], j), drift))
+        else:
+            distances = [self._drift(X[:, j], n_numeric[j], j) for j in drift]
+        for j, distance in zip(drift, distances):
+            if distance > self.threshold:
+                violations.append(_violation(
+                    self.names[j], "baseline_drift_check",
+                    f"Baseline drift distance: {distance:.4f} exceeds threshold: {self.threshold}"))
+        return {"violations": violations}
@@ -0,0 +1,387 @@
+"""
+Índice colunar, append-only, dos relatórios do Model Monitor.
+
+Cada execução de um schedule escreve statistics.json e constraint_violations.json em
+  <OUTPUT_S3>/<endpoint>/<schedule>/AAAA/MM/DD/HH/
+Execuções mais frequentes do que de hora a hora (ou relançadas) escrevem na mesma pasta HH/, por
+cima dos relatórios anteriores. Cada execução é por isso identificada pela hora do caminho mais
+o instante em que os relatórios foram escritos (execution_time), e entra no índice como uma fonte
+própria em vez de substituir a da execução anterior na mesma hora.
+O índice guarda uma linha por (schedule, execução, feature) em duas tabelas:
+  - stats: item_count, num_present/num_missing, completeness, mean, std_dev, min, max, sum e
+    os quantis p05/p50/p95 do sketch KLL
+  - violations: constraint_check_type, value (a distância, no baseline_drift_check) e description
+
+Disposição em disco (<root>/):
+  _manifest.json          segmentos, relatórios já lidos (por caminho@execução, com assinatura), dicionários de
+                          schedules/features/checks e as fontes substituídas
+  seg-000000/stats/*.npy  um .npy por coluna, lido com mmap
+  seg-000000/violations/*.npy
+Cada refresh só lê relatórios novos ou alterados e escreve um segmento novo. Um relatório
+alterado ganha uma fonte nova e a anterior passa a "superseded" (as linhas dela deixam de
+aparecer nas queries e desaparecem na compactação). Com muitos segmentos, compact() junta-os
+num só, ordenado por feature e tempo.
+"""
+import json
+import os
+import re
+import shutil
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.common.capture import FEATURE_NAMES
+from src.common.sketches import KLLSketch
+
+MANIFEST = "_manifest.json"
+# 2: relatórios identificados por caminho@execução e tempos ao segundo
+MANIFEST_VERSION = 2
+COMPACT_AFTER = 32
+QUANTILES = (0.05, 0.5, 0.95)
+
+STATS_COLUMNS = {
+    "source": np.int32, "schedule": np.int32, "time": np.int64, "feature": np.int32,
+    "item_count": np.int64, "num_present": np.int64, "num_missing": np.int64,
+    "completeness": np.float64, "mean": np.float64, "std_dev": np.float64,
+    "min": np.float64, "max": np.float64, "sum": np.float64,
+    "p05": np.float64, "p50": np.float64, "p95": np.float64,
+}
+VIOLATION_COLUMNS = {
+    "source": np.int32, "schedule": np.int32, "time": np.int64, "feature": np.int32,
+    "check": np.int32, "value": np.float64, "description": str,
+}
+TABLES = {"stats": STATS_COLUMNS, "violations": VIOLATION_COLUMNS}
+
+# .../<schedule>/AAAA/MM/DD/HH/statistics.json (ou constraint_violations.json)
+REPORT_PATH = re.compile(r"(?:^|/)([^/]+)/(\d{4})/(\d{2})/(\d{2})/(\d{2})/(?:[^/]+/)*"
+                         r"(statistics|constraint_violations)\.json$")
+DRIFT_DISTANCE = re.compile(r"distance:\s*([-+0-9.eE]+)")
+
+
+def parse_report_path(path: str):
+    """
+    (schedule, hora da execução em epoch, "statistics"|"constraint_violations") ou None.
+    """
+    match = REPORT_PATH.search(path.replace(os.sep, "/"))
+    if not match:
+        return None
+    schedule, year, month, day, hour, kind = match.groups()
+    when = datetime(int(year), int(month), int(day), int(hour), tzinfo=timezone.utc)
+    return schedule, int(when.timestamp()), kind
+
+
+# os dois relatórios de uma execução são escritos com segundos de diferença, no fim do job
+RUN_GAP_S = 60
+
+
+def run_written(written: List[float]) -> List[float]:
+    """
+    Instante de escrita da execução de cada relatório de uma pasta (mtime local ou LastModified
+    no S3, pela mesma ordem de written): relatórios escritos até RUN_GAP_S depois do primeiro de
+    um grupo são da mesma execução e ficam com o instante desse primeiro. Um relatório reescrito
+    sozinho por uma execução posterior fica assim com o instante dela, não com o da anterior.
+    """
+    out = [0.0] * len(written)
+    start = None
+    for i in sorted(range(len(written)), key=written.__getitem__):
+        if start is None or written[i] - start > RUN_GAP_S:
+            start = written[i]
+        out[i] = start
+    return out
+
+
+def execution_time(hour: int, written: Optional[float]) -> int:
+    """
+    Instante da execução (epoch): quando os relatórios foram escritos (run_written), se cair na
+    hora do caminho ou na seguinte (o job acaba depois de começar); senão, por exemplo numa cópia
+    posterior, a hora do caminho.
+    """
+    if written is not None and hour <= written < hour + 7200:
+        return int(written)
+    return hour
+
+
+def report_key(path: str, when: int) -> str:
+    return f"{path}@{when}"
+
+
+def to_epoch(value) -> Optional[int]:
+    """
+    Epoch (s) de um número, datetime ou texto ISO ("2026-10-18T13"); sem fuso é UTC.
+    """
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        return int(value)
+    text = str(value)
+    if re.fullmatch(r"\d{4}-\d{2}-\d{2}T\d{2}", text):
+        text += ":00"
+    ts = pd.Timestamp(text)
+    if ts.tzinfo is None:
+        ts = ts.tz_localize("UTC")
+    return int(ts.timestamp())
+
+
+def _save_columns(path: str, columns: Dict[str, np.ndarray]):
+    os.makedirs(path, exist_ok=True)
+    for name, values in columns.items():
+        np.save(os.path.join(path, f"{name}.npy"), values, allow_pickle=False)
+
+
+def _load_columns(path: str, spec: Dict) -> Dict[str, np.ndarray]:
+    return {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r", allow_pickle=False)
+            for name in spec}
+
+
+def _empty(spec: Dict) -> Dict[str, np.ndarray]:
+    return {name: np.empty(0, dtype=dtype if dtype is not str else "U1") for name, dtype in spec.items()}
+
+
+def _stats_row(feature: Dict, item_count: int) -> Dict:
+    stats = feature.get("numerical_statistics") or feature.get("string_statistics") or {}
+    common = stats.get("common", {})
+    present, missing = int(common.get("num_present", 0)), int(common.get("num_missing", 0))
+    row = {
+        "feature": feature["name"],
+        "item_count": item_count, "num_present": present, "num_missing": missing,
+        "completeness": present / (present + missing) if present + missing else np.nan,
+    }
+    for key in ("mean", "std_dev", "min", "max", "sum"):
+        row[key] = float(stats.get(key, np.nan))
+    sketch = stats.get("distribution", {}).get("kll", {}).get("sketch")
+    quantiles = KLLSketch.from_dict(sketch).quantile(QUANTILES) if sketch else [np.nan] * len(QUANTILES)
+    row.update({"p05": float(quantiles[0]), "p50": float(quantiles[1]), "p95": float(quantiles[2])})
+    return row
+
+
+def report_rows(report: Dict, kind: str):
+    """
+    (tabela, linhas) de um statistics.json ou constraint_violations.json, com os nomes de
+    feature/check ainda em texto. Não depende do índice, por isso corre num processo à parte.
+    """
+    if kind == "statistics":
+        item_count = report.get("dataset", {}).get("item_count", 0)
+        return "stats", [_stats_row(feature, item_count) for feature in report.get("features", [])]
+    rows = []
+    for v in report.get("violations", []):
+        description = v.get("description", "")
+        distance = DRIFT_DISTANCE.search(description)
+        rows.append({
+            "feature": v.get("feature_name", ""),
+            "check": v.get("constraint_check_type", ""),
+            "value": float(distance.group(1)) if distance else np.nan,
+            "description": description,
+        })
+    return "violations", rows
+
+
+class ReportIndex:
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        path = os.path.join(root, MANIFEST)
+        if os.path.exists(path):
+            with open(path) as f:
+                self.manifest = json.load(f)
+            if self.manifest.get("version") != MANIFEST_VERSION:
+                raise ValueError(f"Index at {root} has an older layout; remove it and ingest the reports again")
+        else:
+            self.manifest = {"version": MANIFEST_VERSION, "segments": [], "next_segment": 0, "next_source": 0,
+                             "files": {}, "superseded": [], "schedules": [], "features": [], "checks": []}
+        self._codes = {kind: {v: i for i, v in enumerate(self.manifest[kind])}
+                       for kind in ("schedules", "features", "checks")}
+        self._pending = {table: [] for table in TABLES}
+        self._cache = None
+
+    # --- ingestão ---
+
+    def _code(self, kind: str, value: str) -> int:
+        codes = self._codes[kind]
+        if value not in codes:
+            codes[value] = len(self.manifest[kind])
+            self.manifest[kind].append(value)
+        return codes[value]
+
+    def needs(self, key: str, signature: str) -> bool:
+        seen = self.manifest["files"].get(key)
+        return seen is None or seen["signature"] != signature
+
+    def add_rows(self, key: str, signature: str, schedule: str, when: int, table: str, rows: List[Dict]):
+        """
+        Junta ao lote pendente as linhas de um relatório (de report_rows); os nomes de feature e
+        de check passam a códigos do dicionário.
+        """
+        previous = self.manifest["files"].get(key)
+        if previous is not None:
+            self.manifest["superseded"].append(previous["source"])
+        source = self.manifest["next_source"]
+        self.manifest["next_source"] += 1
+        self.manifest["files"][key] = {"signature": signature, "source": source}
+
+        base = {"source": source, "schedule": self._code("schedules", schedule), "time": when}
+        for row in rows:
+            coded = {**row, **base, "feature": self._code("features", row["feature"])}
+            if table == "violations":
+                coded["check"] = self._code("checks", row["check"])
+            self._pending[table].append(coded)
+
+    def add_report(self, key: str, signature: str, report: Dict, schedule: str, when: int, kind: str):
+        self.add_rows(key, signature, schedule, when, *report_rows(report, kind))
+
+    def commit(self) -> int:
+        """
+        Escreve o lote pendente num segmento novo e atualiza o manifesto. Devolve as linhas escritas.
+        """
+        rows = sum(len(r) for r in self._pending.values())
+        if rows:
+            name = f"seg-{self.manifest['next_segment']:06d}"
+            tmp = os.path.join(self.root, name + ".tmp")
+            for table, spec in TABLES.items():
+                records = self._pending[table]
+                columns = {c: np.array([r[c] for r in records], dtype=dtype) if records else _empty(spec)[c]
+                           for c, dtype in spec.items()}
+                _save_columns(os.path.join(tmp, table), columns)
+            os.replace(tmp, os.path.join(self.root, name))
+            self.manifest["segments"].append(name)
+            self.manifest["next_segment"] += 1
+            self._pending = {table: [] for table in TABLES}
+        self._save_manifest()
+        self._cache = None
+        if len(self.manifest["segments"]) > COMPACT_AFTER:
+            self.compact()
+        return rows
+
+    def _save_manifest(self):
+        path = os.path.join(self.root, MANIFEST)
+        with open(path + ".tmp", "w") as f:
+            json.dump(self.manifest, f)
+        os.replace(path + ".tmp", path)
+
+    def compact(self):
+        """
+        Junta todos os segmentos num só, sem as linhas de fontes substituídas, ordenado por
+        (feature, tempo) para as queries por feature lerem um bloco contíguo.
+        """
+        if len(self.manifest["segments"]) <= 1 and not self.manifest["superseded"]:
+            return
+        tables = self._load()
+        name = f"seg-{self.manifest['next_segment']:06d}"
+        tmp = os.path.join(self.root, name + ".tmp")
+        for table, columns in tables.items():
+            order = np.lexsort((columns["time"], columns["feature"]))
+            _save_columns(os.path.join(tmp, table), {c: np.ascontiguousarray(v[order]) for c, v in columns.items()})
+        os.replace(tmp, os.path.join(self.root, name))
+        old = self.manifest["segments"]
+        self.manifest["segments"] = [name]
+        self.manifest["next_segment"] += 1
+        self.manifest["superseded"] = []
+        self._save_manifest()
+        for segment in old:
+            shutil.rmtree(os.path.join(self.root, segment), ignore_errors=True)
+        self._cache = None
+
+    # --- queries ---
+
+    def _load(self) -> Dict[str, Dict[str, np.ndarray]]:
+        if self._cache is None:
+            superseded = np.array(self.manifest["superseded"], dtype=np.int32)
+            tables = {}
+            for table, spec in TABLES.items():
+                parts = [_load_columns(os.path.join(self.root, s, table), spec) for s in self.manifest["segments"]]
+                parts = parts or [_empty(spec)]
+                columns = {c: np.concatenate([p[c] for p in parts]) for c in spec}
+                if len(superseded):
+                    live = ~np.isin(columns["source"], superseded)
+                    columns = {c: v[live] for c, v in columns.items()}
+                tables[table] = columns
+            self._cache = tables
+        return self._cache
+
+    def _feature_code(self, feature: str) -> int:
+        """
+        Código da feature no dicionário, ou -1 (nenhuma linha) se nunca foi indexada.
+        """
+        codes = self._codes["features"]
+        if feature in codes:
+            return codes[feature]
+        # baselines sem header: "Amount" é a coluna _c29
+        if feature in FEATURE_NAMES and f"_c{FEATURE_NAMES.index(feature)}" in codes:
+            return codes[f"_c{FEATURE_NAMES.index(feature)}"]
+        return -1
+
+    def has_feature(self, feature: str) -> bool:
+        return self._feature_code(feature) >= 0
+
+    def _mask(self, columns, feature=None, schedule=None, start=None, end=None) -> np.ndarray:
+        mask = np.ones(len(columns["time"]), dtype=bool)
+        if feature is not None:
+            mask &= columns["feature"] == self._feature_code(feature)
+        if schedule is not None:
+            mask &= columns["schedule"] == self._codes["schedules"].get(schedule, -1)
+        if start is not None:
+            mask &= columns["time"] >= to_epoch(start)
+        if end is not None:
+            mask &= columns["time"] < to_epoch(end)
+        return mask
+
+    def _frame(self, columns, mask) -> pd.DataFrame:
+        df = pd.DataFrame({c: np.asarray(v[mask]) for c, v in columns.items() if c != "source"})
+        df["schedule"] = np.array(self.manifest["schedules"], dtype=object)[df["schedule"]] if len(df) else []
+        df["feature"] = np.array(self.manifest["features"], dtype=object)[df["feature"]] if len(df) else []
+        if "check" in df:
+            df["check"] = np.array(self.manifest["checks"], dtype=object)[df["check"]] if len(df) else []
+        df.insert(0, "execution_time", pd.to_datetime(df.pop("time"), unit="s", utc=True))
+        return df.sort_values(["execution_time", "schedule", "feature"], ignore_index=True)
+
+    def stats(self, feature=None, schedule=None, start=None, end=None) -> pd.DataFrame:
+        columns = self._load()["stats"]
+        return self._frame(columns, self._mask(columns, feature, schedule, start, end))
+
+    def violations(self, feature=None, check=None, schedule=None, start=None, end=None) -> pd.DataFrame:
+        columns = self._load()["violations"]
+        mask = self._mask(columns, feature, schedule, start, end)
+        if check is not None:
+            mask &= columns["check"] == self._codes["checks"].get(check, -1)
+        return self._frame(columns, mask)
+
+    def trend(self, feature: str, column: str = "mean", schedule=None, start=None, end=None) -> pd.DataFrame:
+        """
+        Série temporal de uma estatística (ou de "distance", a do baseline_drift_check) de uma feature.
+        """
+        if column == "distance":
+            df = self.violations(feature, "baseline_drift_check", schedule, start, end)
+            return df[["execution_time", "schedule", "value"]].rename(columns={"value": "distance"})
+        return self.stats(feature, schedule, start, end)[["execution_time", "schedule", column]]
+
+    def onset(self, feature: str, check: str = "baseline_drift_check", schedule=None) -> List[Dict]:
+        """
+        Por schedule, a primeira execução da sequência atual de execuções com a violação (ou None se
+        a última execução já não a tem): "desde quando é que o Amount está em drift".
+        Uma feature que não está no índice não tem resposta: lista vazia.
+        """
+        if not self.has_feature(feature):
+            return []
+        stats = self._load()["stats"]
+        violations = self._load()["violations"]
+        check_code = self._codes["checks"].get(check, -1)
+        out = []
+        schedules = [schedule] if schedule else self.manifest["schedules"]
+        for name in schedules:
+            code = self._codes["schedules"].get(name, -1)
+            runs = np.unique(np.concatenate([stats["time"][stats["schedule"] == code],
+                                             violations["time"][violations["schedule"] == code]]))
+            hit = violations["time"][(violations["schedule"] == code) & (violations["check"] == check_code)
+                                     & (violations["feature"] == self._feature_code(feature))]
+            if len(runs) == 0:
+                continue
+            flagged = np.isin(runs, hit)
+            since = None
+            if flagged[-1]:
+                clean = np.flatnonzero(~flagged)
+                first = clean[-1] + 1 if len(clean) else 0
+                since = pd.Timestamp(int(runs[first]), unit="s", tz="UTC").isoformat()
+            out.append({"schedule": name, "since": since, "executions": int(flagged[::-1].cumprod().sum()),
+                        "last_execution": pd.Timestamp(int(runs[-1]), unit="s", tz="UTC").isoformat()})
+        return out
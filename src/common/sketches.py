@@ -0,0 +1,397 @@
+"""
+Sketches por feature, mergeable, no formato de estatísticas do SageMaker Model Monitor.
+
+- KLLSketch: sketch de quantis KLL (o mesmo que o Model Monitor/Deequ guarda em
+  statistics.json -> distribution.kll.sketch), com update em bloco e merge.
+- FeatureSketch: completude, contagens por tipo, momentos (média/M2 com merge de Chan),
+  min/max/soma e o KLL de uma feature.
+- DatasetSketch: uma FeatureSketch por coluna; lê e escreve statistics.json/constraints.json.
+
+Tudo é mergeable: chunks, processos ou janelas de tempo avaliados em separado e somados depois
+dão o mesmo resultado (a menos do erro do KLL) que uma passagem única.
+"""
+import math
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+# parâmetros por omissão do Model Monitor
+KLL_K = 2048
+KLL_C = 0.64
+N_BUCKETS = 10
+
+DEFAULT_MONITORING_CONFIG = {
+    "evaluate_constraints": "Enabled",
+    "emit_metrics": "Enabled",
+    "datatype_check_threshold": 1.0,
+    "domain_content_threshold": 1.0,
+    "distribution_constraints": {
+        "perform_comparison": "Enabled",
+        "comparison_threshold": 0.1,
+        "comparison_method": "Robust",
+        "categorical_comparison_threshold": 0.1,
+        "categorical_drift_method": "LInfinity",
+    },
+}
+
+
+class KLLSketch:
+    """
+    Níveis de compactores: um item no nível h vale 2^h itens originais.
+    A capacidade do nível h é max(2, ceil(k * c^(H-1-h))), com H o número de níveis.
+    """
+
+    def __init__(self, k: int = KLL_K, c: float = KLL_C, levels: Optional[List[np.ndarray]] = None,
+                 seed: Optional[int] = None):
+        self.k = int(k)
+        self.c = float(c)
+        self.levels = [np.asarray(lv, dtype=np.float64) for lv in levels] if levels else [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    def _capacity(self, h: int) -> int:
+        return max(2, int(math.ceil(self.k * self.c ** (len(self.levels) - 1 - h))))
+
+    def _compact(self, h: int):
+        level = np.sort(self.levels[h])
+        # com número ímpar, um item fica no nível
+        keep = level[:1] if len(level) % 2 else level[:0]
+        level = level[len(keep):]
+        promoted = level[self._rng.integers(2)::2]
+        if h + 1 == len(self.levels):
+            self.levels.append(np.empty(0))
+        self.levels[h] = keep
+        self.levels[h + 1] = np.concatenate([self.levels[h + 1], promoted])
+
+    def _compress(self):
+        while True:
+            for h, level in enumerate(self.levels):
+                if len(level) > self._capacity(h):
+                    break
+            else:
+                return
+            self._compact(h)
+
+    def update(self, values: np.ndarray):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if len(values):
+            self.levels[0] = np.concatenate([self.levels[0], values])
+            self._compress()
+
+    def merge(self, other: "KLLSketch") -> "KLLSketch":
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for h, level in enumerate(other.levels):
+            self.levels[h] = np.concatenate([self.levels[h], level])
+        self._compress()
+        return self
+
+    def _weighted_items(self):
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(lv), 2.0 ** h) for h, lv in enumerate(self.levels)])
+        order = np.argsort(items, kind="stable")
+        return items[order], weights[order]
+
+    @property
+    def weight(self) -> float:
+        return float(sum(len(lv) * 2.0 ** h for h, lv in enumerate(self.levels)))
+
+    def cdf(self, x) -> np.ndarray:
+        """
+        Fração estimada de valores <= x.
+        """
+        x = np.asarray(x, dtype=np.float64)
+        total = self.weight
+        if total == 0:
+            return np.full(x.shape, np.nan)
+        ranks = np.zeros(x.shape)
+        for h, level in enumerate(self.levels):
+            if len(level):
+                ranks += np.searchsorted(np.sort(level), x, side="right") * 2.0 ** h
+        return ranks / total
+
+    def quantile(self, q) -> np.ndarray:
+        items, weights = self._weighted_items()
+        q = np.asarray(q, dtype=np.float64)
+        if len(items) == 0:
+            return np.full(q.shape, np.nan)
+        cum = np.cumsum(weights)
+        idx = np.searchsorted(cum, q * cum[-1], side="left")
+        return items[np.minimum(idx, len(items) - 1)]
+
+    def items(self) -> np.ndarray:
+        return np.concatenate(self.levels)
+
+    def sorted_cdf(self):
+        """
+        (itens ordenados, CDF em cada item): a função de distribuição inteira, para avaliar muitas vezes.
+        """
+        items, weights = self._weighted_items()
+        cum = np.cumsum(weights)
+        return items, cum / cum[-1] if len(cum) else cum
+
+    def to_dict(self) -> Dict:
+        return {"parameters": {"c": self.c, "k": float(self.k)}, "data": [lv.tolist() for lv in self.levels]}
+
+    @classmethod
+    def from_dict(cls, d: Dict) -> "KLLSketch":
+        params = d.get("parameters", {})
+        return cls(k=int(params.get("k", KLL_K)), c=float(params.get("c", KLL_C)), levels=d.get("data") or None)
+
+
+def linf_distance(a: KLLSketch, b: KLLSketch) -> float:
+    """
+    Distância L-infinito entre as CDFs dos dois sketches (o "comparison_method" do Model Monitor),
+    avaliada em todos os itens guardados em ambos.
+    """
+    points = np.unique(np.concatenate([a.items(), b.items()]))
+    if len(points) == 0 or a.weight == 0 or b.weight == 0:
+        return float("nan")
+    return float(np.max(np.abs(a.cdf(points) - b.cdf(points))))
+
+
+def psi(base: KLLSketch, current: KLLSketch, edges: np.ndarray, eps: float = 1e-4) -> float:
+    """
+    Population Stability Index nos intervalos dados (os extremos abertos apanham o que sai fora).
+    """
+    edges = np.asarray(edges, dtype=np.float64)
+    if base.weight == 0 or current.weight == 0 or len(edges) < 2:
+        return float("nan")
+    inner = edges[1:-1]
+    p = np.diff(np.concatenate([[0.0], base.cdf(inner), [1.0]]))
+    q = np.diff(np.concatenate([[0.0], current.cdf(inner), [1.0]]))
+    p, q = np.maximum(p, eps), np.maximum(q, eps)
+    return float(np.sum((q - p) * np.log(q / p)))
+
+
+class FeatureSketch:
+    def __init__(self, name: str, k: int = KLL_K, c: float = KLL_C):
+        self.name = name
+        self.num_missing = 0
+        self.num_string = 0
+        self.num_integral = 0
+        self.num_fractional = 0
+        self.sum = 0.0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.kll = KLLSketch(k, c)
+        # estatísticas lidas de um statistics.json sem contagens por tipo
+        self._declared_type = None
+
+    @property
+    def num_numeric(self) -> int:
+        return self.num_integral + self.num_fractional
+
+    @property
+    def num_present(self) -> int:
+        return self.num_numeric + self.num_string
+
+    @property
+    def std_dev(self) -> float:
+        return math.sqrt(self.m2 / self.num_numeric) if self.num_numeric else 0.0
+
+    @property
+    def completeness(self) -> float:
+        total = self.num_present + self.num_missing
+        return self.num_present / total if total else 1.0
+
+    def inferred_type(self) -> str:
+        if self._declared_type is not None:
+            return self._declared_type
+        if self.num_string:
+            return "String"
+        if self.num_fractional:
+            return "Fractional"
+        if self.num_integral:
+            return "Integral"
+        return "Unknown"
+
+    def update(self, values: np.ndarray, num_string: int = 0):
+        """
+        values: float com NaN para vazio ou não numérico; num_string conta os não numéricos.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        numeric = values[~np.isnan(values)]
+        self.num_string += int(num_string)
+        self.num_missing += int(len(values) - len(numeric) - num_string)
+        n = len(numeric)
+        if n == 0:
+            return
+        integral = int(np.count_nonzero(numeric == np.floor(numeric)))
+        self.num_integral += integral
+        self.num_fractional += n - integral
+        self._merge_moments(n, float(numeric.sum()), float(numeric.mean()),
+                            float(np.square(numeric - numeric.mean()).sum()),
+                            float(numeric.min()), float(numeric.max()))
+        self.kll.update(numeric)
+
+    def _merge_moments(self, n: int, total: float, mean: float, m2: float, lo: float, hi: float):
+        # n já foi somado às contagens por tipo; n_a é o que havia antes
+        n_a = self.num_numeric - n
+        delta = mean - self.mean
+        self.mean = self.mean + delta * n / (n_a + n)
+        self.m2 = self.m2 + m2 + delta * delta * n_a * n / (n_a + n)
+        self.sum += total
+        self.min = min(self.min, lo)
+        self.max = max(self.max, hi)
+
+    def merge(self, other: "FeatureSketch") -> "FeatureSketch":
+        self.num_missing += other.num_missing
+        self.num_string += other.num_string
+        if other.num_numeric:
+            self.num_integral += other.num_integral
+            self.num_fractional += other.num_fractional
+            self._merge_moments(other.num_numeric, other.sum, other.mean, other.m2, other.min, other.max)
+        self.kll.merge(other.kll)
+        return self
+
+    def buckets(self, n_buckets: int = N_BUCKETS) -> List[Dict]:
+        """
+        Intervalos iguais entre min e max com contagens estimadas pelo KLL (como no Model Monitor).
+        """
+        if not self.num_numeric:
+            return []
+        edges = np.linspace(self.min, self.max, n_buckets + 1)
+        cdf = self.kll.cdf(edges[1:-1])
+        counts = np.diff(np.concatenate([[0.0], cdf, [1.0]])) * self.num_numeric
+        return [{"lower_bound": float(lo), "upper_bound": float(hi), "count": float(n)}
+                for lo, hi, n in zip(edges[:-1], edges[1:], counts)]
+
+    def to_statistics(self) -> Dict:
+        common = {"num_present": self.num_present, "num_missing": self.num_missing}
+        if self.inferred_type() == "String":
+            return {"name": self.name, "inferred_type": "String", "string_statistics": {"common": common}}
+        numeric = {"common": common, "mean": self.mean, "sum": self.sum, "std_dev": self.std_dev}
+        if self.num_numeric:
+            numeric.update({"min": self.min, "max": self.max})
+        numeric["distribution"] = {"kll": {"buckets": self.buckets(), "sketch": self.kll.to_dict()}}
+        return {"name": self.name, "inferred_type": self.inferred_type(), "numerical_statistics": numeric}
+
+    @classmethod
+    def from_statistics(cls, feature: Dict) -> "FeatureSketch":
+        sketch = cls(feature["name"])
+        sketch._declared_type = feature.get("inferred_type")
+        stats = feature.get("numerical_statistics") or feature.get("string_statistics") or {}
+        common = stats.get("common", {})
+        present = int(common.get("num_present", 0))
+        sketch.num_missing = int(common.get("num_missing", 0))
+        if "numerical_statistics" not in feature:
+            sketch.num_string = present
+            return sketch
+        if sketch._declared_type == "Integral":
+            sketch.num_integral = present
+        else:
+            sketch.num_fractional = present
+        sketch.mean = float(stats.get("mean", 0.0))
+        sketch.sum = float(stats.get("sum", 0.0))
+        sketch.m2 = float(stats.get("std_dev", 0.0)) ** 2 * present
+        sketch.min = float(stats.get("min", math.inf))
+        sketch.max = float(stats.get("max", -math.inf))
+        kll = stats.get("distribution", {}).get("kll", {}).get("sketch")
+        if kll:
+            sketch.kll = KLLSketch.from_dict(kll)
+        return sketch
+
+    def to_state(self) -> Dict:
+        return {
+            "name": self.name, "num_missing": self.num_missing, "num_string": self.num_string,
+            "num_integral": self.num_integral, "num_fractional": self.num_fractional,
+            "sum": self.sum, "mean": self.mean, "m2": self.m2,
+            "min": self.min if self.num_numeric else None, "max": self.max if self.num_numeric else None,
+            "kll": self.kll.to_dict(),
+        }
+
+    @classmethod
+    def from_state(cls, state: Dict) -> "FeatureSketch":
+        sketch = cls(state["name"])
+        for key in ("num_missing", "num_string", "num_integral", "num_fractional", "sum", "mean", "m2"):
+            setattr(sketch, key, state[key])
+        sketch.min = state["min"] if state["min"] is not None else math.inf
+        sketch.max = state["max"] if state["max"] is not None else -math.inf
+        sketch.kll = KLLSketch.from_dict(state["kll"])
+        return sketch
+
+
+def default_feature_names(n: int) -> List[str]:
+    """
+    Nomes que o Model Monitor dá às colunas de um CSV sem header.
+    """
+    return [f"_c{i}" for i in range(n)]
+
+
+def frame_to_matrix(df: pd.DataFrame):
+    """
+    DataFrame lido de CSV -> (matriz float com NaN para vazio/não numérico, contagem de não numéricos por coluna).
+    """
+    X = np.empty(df.shape, dtype=np.float64)
+    n_string = np.zeros(df.shape[1], dtype=np.int64)
+    for j, (_, col) in enumerate(df.items()):
+        if pd.api.types.is_numeric_dtype(col.dtype):
+            X[:, j] = col.to_numpy(dtype=np.float64, na_value=np.nan)
+            continue
+        text = col.astype("string").str.strip()
+        present = text.notna() & (text != "")
+        values = pd.to_numeric(text.where(present), errors="coerce")
+        X[:, j] = values.to_numpy(dtype=np.float64, na_value=np.nan)
+        n_string[j] = int((present & values.isna()).sum())
+    return X, n_string
+
+
+class DatasetSketch:
+    def __init__(self, names: Sequence[str], k: int = KLL_K, c: float = KLL_C):
+        self.features = [FeatureSketch(name, k, c) for name in names]
+        self.item_count = 0
+
+    @property
+    def names(self) -> List[str]:
+        return [f.name for f in self.features]
+
+    def update(self, X: np.ndarray, n_string: Optional[np.ndarray] = None):
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim != 2 or X.shape[1] != len(self.features):
+            raise ValueError(f"Expected {len(self.features)} columns, got shape {X.shape}")
+        for j, feature in enumerate(self.features):
+            feature.update(X[:, j], int(n_string[j]) if n_string is not None else 0)
+        self.item_count += len(X)
+
+    def merge(self, other: "DatasetSketch") -> "DatasetSketch":
+        if other.names != self.names:
+            raise ValueError("Cannot merge sketches with different columns")
+        for a, b in zip(self.features, other.features):
+            a.merge(b)
+        self.item_count += other.item_count
+        return self
+
+    def to_statistics(self) -> Dict:
+        return {"version": 0.0, "dataset": {"item_count": self.item_count},
+                "features": [f.to_statistics() for f in self.features]}
+
+    def to_constraints(self, monitoring_config: Optional[Dict] = None) -> Dict:
+        features = []
+        for f in self.features:
+            constraint = {"name": f.name, "inferred_type": f.inferred_type(), "completeness": f.completeness}
+            if f.inferred_type() in ("Integral", "Fractional") and f.num_numeric:
+                constraint["num_constraints"] = {"is_non_negative": bool(f.min >= 0)}
+            features.append(constraint)
+        return {"version": 0.0, "features": features,
+                "monitoring_config": monitoring_config or DEFAULT_MONITORING_CONFIG}
+
+    @classmethod
+    def from_statistics(cls, statistics: Dict) -> "DatasetSketch":
+        sketch = cls([])
+        sketch.features = [FeatureSketch.from_statistics(f) for f in statistics["features"]]
+        sketch.item_count = int(statistics.get("dataset", {}).get("item_count", 0))
+        return sketch
+
+    def to_state(self) -> Dict:
+        return {"item_count": self.item_count, "features": [f.to_state() for f in self.features]}
+
+    @classmethod
+    def from_state(cls, state: Dict) -> "DatasetSketch":
+        sketch = cls([])
+        sketch.features = [FeatureSketch.from_state(f) for f in state["features"]]
+        sketch.item_count = state["item_count"]
+        return sketch
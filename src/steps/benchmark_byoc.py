@@ -0,0 +1,314 @@
+"""
+Benchmark local do stack de inference BYOC, sem AWS.
+
+Dois modos:
+  - inproc: chama input_fn/predict_fn/output_fn de byoc/inference.py diretamente
+  - http: arranca o servidor local (gunicorn + byoc/gunicorn_conf.py) e envia pedidos para /invocations
+          (ou usa um servidor já a correr com --url)
+
+Cada combinação de content type x batch size x concorrência (x workers, em http) replica linhas
+de data/splits/test.csv e mede throughput, latências p50/p95/p99 e CPU por linha.
+Com --challenger-dir e --shadow off,on, cada cenário corre sem e com o challenger em shadow
+(byoc/shadow.py), para ver quanto o shadow custa à latência do champion.
+
+Exemplo:
+  python -m src.steps.benchmark_byoc --mode http --model-dir /tmp/model \
+      --content-types text/csv,application/x-npy --batch-sizes 1,64 --concurrency 1,8 --workers 1,2
+"""
+import argparse
+import http.client
+import io
+import json
+import os
+import struct
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import product
+from urllib.parse import urlparse
+
+import numpy as np
+import pandas as pd
+
+BYOC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "byoc"))
+TARGET = "Class"
+
+
+def parse_args():
+    p = argparse.ArgumentParser()
+    p.add_argument("--mode", choices=["inproc", "http"], default="inproc")
+    p.add_argument("--model-dir", type=str, default=os.getenv("SM_MODEL_DIR", "/opt/ml/model"))
+    p.add_argument("--data", type=str, default="data/splits/test.csv")
+    p.add_argument("--content-types", type=str, default="text/csv,application/json")
+    p.add_argument("--accept", type=str, default="application/json")
+    p.add_argument("--batch-sizes", type=str, default="1,16,256")
+    p.add_argument("--concurrency", type=str, default="1,4")
+    p.add_argument("--workers", type=str, default="1", help="só no modo http")
+    p.add_argument("--server", choices=["wsgi", "asgi"], default="wsgi", help="só no modo http")
+    p.add_argument("--url", type=str, default="", help="servidor já a correr (ignora --workers/--server)")
+    p.add_argument("--challenger-dir", type=str, default="", help="modelo challenger para --shadow on")
+    p.add_argument("--shadow", type=str, default="off", help="off, on ou off,on")
+    p.add_argument("--port", type=int, default=8089)
+    p.add_argument("--requests", type=int, default=500, help="pedidos por cenário")
+    p.add_argument("--warmup-requests", type=int, default=20)
+    p.add_argument("--output", type=str, default="reports/benchmark_byoc.json")
+    return p.parse_args()
+
+
+def _csv_list(value: str, cast=str):
+    return [cast(v.strip()) for v in value.split(",") if v.strip()]
+
+
+def load_rows(path: str) -> np.ndarray:
+    df = pd.read_csv(path)
+    if TARGET in df.columns:
+        df = df.drop(columns=[TARGET])
+    return np.ascontiguousarray(df.to_numpy(dtype=np.float64))
+
+
+def encode_body(rows: np.ndarray, content_type: str) -> bytes:
+    if content_type == "text/csv":
+        buf = io.StringIO()
+        np.savetxt(buf, rows, delimiter=",", fmt="%.10g")
+        return buf.getvalue().encode("utf-8")
+    if content_type == "application/json":
+        return json.dumps({"instances": rows.tolist()}).encode("utf-8")
+    if content_type == "application/x-npy":
+        buf = io.BytesIO()
+        np.save(buf, rows, allow_pickle=False)
+        return buf.getvalue()
+    if content_type == "application/x-float32":
+        return struct.pack("<I", len(rows)) + rows.astype("<f4").tobytes()
+    raise ValueError(f"Unsupported content type for benchmark: {content_type}")
+
+
+def make_bodies(rows: np.ndarray, content_type: str, batch_size: int, n: int):
+    """
+    n corpos pré-codificados, cada um com batch_size linhas consecutivas (circular) do test.csv,
+    para o custo de os gerar não entrar na medição.
+    """
+    bodies = []
+    for i in range(n):
+        start = (i * batch_size) % len(rows)
+        idx = np.arange(start, start + batch_size) % len(rows)
+        bodies.append(encode_body(rows[idx], content_type))
+    return bodies
+
+
+def _proc_tree_cpu(pid: int):
+    """
+    CPU (user+sys, segundos) do processo e descendentes diretos, via /proc (só Linux).
+    """
+    if not os.path.isdir("/proc"):
+        return None
+    ticks = os.sysconf("SC_CLK_TCK")
+    total = 0.0
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        # fields[1] = ppid, fields[11]/[12] = utime/stime (contando a partir do state)
+        if int(entry) == pid or int(fields[1]) == pid:
+            total += (int(fields[11]) + int(fields[12])) / ticks
+    return total
+
+
+def _summary(latencies, rows_per_request: int, wall_s: float, cpu_s, errors: int):
+    lat_ms = np.asarray(latencies) * 1000
+    n = len(latencies)
+    return {
+        "requests": n,
+        "errors": errors,
+        "wall_s": wall_s,
+        "requests_per_s": n / wall_s if wall_s > 0 else None,
+        "rows_per_s": n * rows_per_request / wall_s if wall_s > 0 else None,
+        "latency_ms": {
+            "mean": float(lat_ms.mean()) if n else None,
+            "p50": float(np.percentile(lat_ms, 50)) if n else None,
+            "p95": float(np.percentile(lat_ms, 95)) if n else None,
+            "p99": float(np.percentile(lat_ms, 99)) if n else None,
+            "max": float(lat_ms.max()) if n else None,
+        },
+        "cpu_s": cpu_s,
+        "cpu_us_per_row": cpu_s / (n * rows_per_request) * 1e6 if cpu_s is not None and n else None,
+    }
+
+
+def _run_concurrent(call, bodies, concurrency: int):
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def worker(chunk):
+        nonlocal errors
+        local_lat, local_err = [], 0
+        state = {}
+        for body in chunk:
+            t0 = time.perf_counter()
+            ok = call(body, state)
+            local_lat.append(time.perf_counter() - t0)
+            local_err += 0 if ok else 1
+        with lock:
+            latencies.extend(local_lat)
+            errors += local_err
+
+    chunks = [bodies[i::concurrency] for i in range(concurrency)]
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, chunks))
+    return latencies, errors, time.perf_counter() - t0
+
+
+def bench_inproc(model_dir: str, scenarios, rows, args, shadow: str = "off"):
+    if BYOC_DIR not in sys.path:
+        sys.path.insert(0, BYOC_DIR)
+    import inference
+    from shadow import Shadow
+
+    model = inference.model_fn(model_dir)
+    inference._shadow = None
+    if shadow == "on":
+        challenger = inference._load_model(args.challenger_dir)
+        inference._shadow = Shadow(challenger, inference._score, inference.model_version,
+                                   inference.model_version(challenger))
+    results = []
+    for content_type, batch_size, concurrency in scenarios:
+        def call(body, state, content_type=content_type):
+            data = inference.input_fn(body, content_type)
+            inference.output_fn(inference.predict_fn(data, model), args.accept)
+            return True
+
+        _run_concurrent(call, make_bodies(rows, content_type, batch_size, args.warmup_requests), concurrency)
+        bodies = make_bodies(rows, content_type, batch_size, args.requests)
+        cpu0 = time.process_time()
+        latencies, errors, wall = _run_concurrent(call, bodies, concurrency)
+        cpu = time.process_time() - cpu0
+        result = {"mode": "inproc", "shadow": shadow, "content_type": content_type, "batch_size": batch_size,
+                  "concurrency": concurrency, **_summary(latencies, batch_size, wall, cpu, errors)}
+        if inference._shadow is not None:
+            result["shadow_stats"] = inference._shadow.stats()
+        print(_one_line(result))
+        results.append(result)
+    return results
+
+
+def _http_call(url, content_type, accept):
+    parsed = urlparse(url)
+
+    def call(body, state):
+        conn = state.get("conn")
+        if conn is None:
+            conn = state["conn"] = http.client.HTTPConnection(parsed.hostname, parsed.port or 80, timeout=120)
+        try:
+            conn.request("POST", "/invocations", body=body,
+                         headers={"Content-Type": content_type, "Accept": accept})
+            resp = conn.getresponse()
+            resp.read()
+            return resp.status == 200
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            state.pop("conn", None)
+            return False
+    return call
+
+
+def start_server(model_dir: str, workers: int, server: str, port: int, challenger_dir: str = ""):
+    env = {**os.environ, "SM_MODEL_DIR": model_dir, "BYOC_WORKERS": str(workers), "PORT": str(port),
+           "BYOC_CHALLENGER_DIR": challenger_dir}
+    cmd = ["gunicorn", "-c", os.path.join(BYOC_DIR, "gunicorn_conf.py")]
+    cmd += ["-k", "uvicorn.workers.UvicornWorker", "asgi:app"] if server == "asgi" else ["wsgi:app"]
+    proc = subprocess.Popen(cmd, cwd=BYOC_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"Server exited with code {proc.returncode}: {' '.join(cmd)}")
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            conn.request("GET", "/ping")
+            if conn.getresponse().status == 200:
+                return proc
+        except OSError:
+            pass
+        time.sleep(0.5)
+    proc.terminate()
+    raise TimeoutError("Server did not answer /ping within 120s")
+
+
+def bench_http(url: str, scenarios, rows, args, workers=None, server_pid=None, shadow=None):
+    results = []
+    for content_type, batch_size, concurrency in scenarios:
+        call = _http_call(url, content_type, args.accept)
+        _run_concurrent(call, make_bodies(rows, content_type, batch_size, args.warmup_requests), concurrency)
+        bodies = make_bodies(rows, content_type, batch_size, args.requests)
+        cpu0 = _proc_tree_cpu(server_pid) if server_pid else None
+        latencies, errors, wall = _run_concurrent(call, bodies, concurrency)
+        cpu = _proc_tree_cpu(server_pid) - cpu0 if cpu0 is not None else None
+        result = {"mode": "http", "url": url, "server": args.server if server_pid else None, "workers": workers,
+                  "shadow": shadow,
+                  "content_type": content_type, "batch_size": batch_size, "concurrency": concurrency,
+                  **_summary(latencies, batch_size, wall, cpu, errors)}
+        print(_one_line(result))
+        results.append(result)
+    return results
+
+
+def _one_line(r) -> str:
+    lat = r["latency_ms"]
+    cpu = f"{r['cpu_us_per_row']:.1f}us/row" if r["cpu_us_per_row"] is not None else "n/a"
+    workers = f" workers={r['workers']}" if r.get("workers") else ""
+    workers += f" shadow={r['shadow']}" if r.get("shadow") else ""
+    return (f"{r['mode']}{workers} {r['content_type']} batch={r['batch_size']} conc={r['concurrency']}: "
+            f"{r['rows_per_s']:.0f} rows/s p50={lat['p50']:.2f}ms p95={lat['p95']:.2f}ms "
+            f"p99={lat['p99']:.2f}ms cpu={cpu} errors={r['errors']}")
+
+
+def main():
+    args = parse_args()
+    rows = load_rows(args.data)
+    scenarios = list(product(_csv_list(args.content_types), _csv_list(args.batch_sizes, int),
+                             _csv_list(args.concurrency, int)))
+
+    shadows = _csv_list(args.shadow)
+    if "on" in shadows and not args.challenger_dir:
+        raise SystemExit("--shadow on needs --challenger-dir")
+
+    if args.mode == "inproc":
+        results = []
+        for shadow in shadows:
+            results += bench_inproc(args.model_dir, scenarios, rows, args, shadow)
+    elif args.url:
+        results = bench_http(args.url, scenarios, rows, args)
+    else:
+        results = []
+        for workers, shadow in product(_csv_list(args.workers, int), shadows):
+            challenger_dir = args.challenger_dir if shadow == "on" else ""
+            proc = start_server(args.model_dir, workers, args.server, args.port, challenger_dir)
+            try:
+                results += bench_http(f"http://127.0.0.1:{args.port}", scenarios, rows, args,
+                                      workers=workers, server_pid=proc.pid, shadow=shadow)
+            finally:
+                proc.terminate()
+                proc.wait(timeout=30)
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "host": {"cpus": os.cpu_count(), "python": sys.version.split()[0]},
+        "data": args.data,
+        "requests_per_scenario": args.requests,
+        "results": results,
+    }
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print("Relatório guardado em:", args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Avalia constraints.json contra tráfego capturado, localmente, sem o analyzer do Model Monitor.
+
+As constraints são compiladas uma vez em checks por coluna (src/common/constraints.py) e
+avaliadas sobre o lote inteiro de uma vez. A origem pode ser:
+  --columnar-dir  store de convert_capture_columnar.py (o caminho rápido; --since filtra horas)
+  --capture-dir   árvore de data capture (JSON Lines/.npz), descodificada num pool de processos
+  --data          um CSV (sem header por omissão, como o baseline)
+Escreve um constraint_violations.json no formato do Model Monitor. Com --fail-on-violation
+o exit code é 1 quando há violações, para usar como gate de deploy.
+
+Exemplo:
+  python -m src.steps.check_constraints_local --columnar-dir data/capture_columnar \
+      --baseline-constraints reports/baseline/constraints.json \
+      --baseline-statistics reports/baseline/statistics.json --since 2026-10-18T00
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from src.common.capture import (decode_capture_file, iter_capture_files, iter_columnar_parts,
+                                read_columnar_part, thin_to_uniform)
+from src.common.constraints import CompiledConstraints
+from src.common.sketches import frame_to_matrix
+from src.steps.detect_drift_local import load_json
+
+
+def parse_args():
+    p = argparse.ArgumentParser()
+    source = p.add_mutually_exclusive_group(required=True)
+    source.add_argument("--columnar-dir", type=str, help="store colunar (convert_capture_columnar.py)")
+    source.add_argument("--capture-dir", type=str, help="árvore local de data capture")
+    source.add_argument("--data", type=str, help="CSV a avaliar")
+    p.add_argument("--header", action="store_true", help="com --data: o CSV tem header")
+    p.add_argument("--since", type=str, default="", help="com --columnar-dir: primeira hora (AAAA-MM-DDTHH)")
+    p.add_argument("--baseline-constraints", type=str, required=True, help="constraints.json (local ou s3://)")
+    p.add_argument("--baseline-statistics", type=str, default="",
+                   help="statistics.json (local ou s3://); sem ele não há baseline_drift_check")
+    p.add_argument("--output", type=str, default="reports/constraint_violations.json")
+    p.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    p.add_argument("--fail-on-violation", action="store_true")
+    return p.parse_args()
+
+
+def _concat(parts, n_features: int):
+    """
+    Junta as colunas de vários ficheiros/partes numa matriz em ordem de Fortran (os checks
+    trabalham coluna a coluna) e desbasta amostras com pesos 1/p para uniforme.
+    """
+    parts = [p for p in parts if len(p["weight"])]
+    if not parts:
+        return np.empty((0, n_features), order="F")
+    weight = np.concatenate([p["weight"] for p in parts])
+    keep = thin_to_uniform(weight, np.random.default_rng())
+    X = np.empty((int(keep.sum()), parts[0]["features"].shape[1]), order="F")
+    row, start = 0, 0
+    for p in parts:
+        mask = keep[start:start + len(p["weight"])]
+        start += len(p["weight"])
+        n = int(mask.sum())
+        X[row:row + n] = p["features"][mask]
+        row += n
+    return X
+
+
+def load_columnar(root: str, since: str, n_features: int) -> np.ndarray:
+    return _concat([read_columnar_part(path) for path in iter_columnar_parts(root, since or None)], n_features)
+
+
+def load_capture(root: str, workers: int, n_features: int) -> np.ndarray:
+    paths = list(iter_capture_files(root))
+    if workers > 1 and len(paths) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = list(pool.map(decode_capture_file, paths, chunksize=max(1, len(paths) // (workers * 4))))
+    else:
+        parts = [decode_capture_file(path) for path in paths]
+    # larguras diferentes entre ficheiros: cada um é completado com NaN até à maior
+    width = max((p["features"].shape[1] for p in parts if len(p["weight"])), default=n_features)
+    for p in parts:
+        missing = width - p["features"].shape[1]
+        if missing > 0:
+            p["features"] = np.pad(p["features"], ((0, 0), (0, missing)), constant_values=np.nan)
+    return _concat(parts, n_features)
+
+
+def load_csv(path: str, header: bool):
+    df = pd.read_csv(path, header=0 if header else None, skip_blank_lines=True, low_memory=False)
+    X, n_string = frame_to_matrix(df)
+    return np.asfortranarray(X), n_string
+
+
+def main():
+    args = parse_args()
+    t0 = time.perf_counter()
+    constraints = load_json(args.baseline_constraints)
+    statistics = load_json(args.baseline_statistics) if args.baseline_statistics else None
+    checks = CompiledConstraints(constraints, statistics)
+    n_features = len(checks.names)
+
+    t_load = time.perf_counter()
+    n_string = None
+    if args.columnar_dir:
+        X = load_columnar(args.columnar_dir, args.since, n_features)
+    elif args.capture_dir:
+        X = load_capture(args.capture_dir, args.workers, n_features)
+    else:
+        X, n_string = load_csv(args.data, args.header)
+
+    t_eval = time.perf_counter()
+    report = checks.evaluate(X, n_string, workers=args.workers)
+    t_end = time.perf_counter()
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"{len(X)} linhas, {X.shape[1]} colunas: leitura {t_eval - t_load:.2f}s, "
+          f"checks {t_end - t_eval:.2f}s (total {t_end - t0:.2f}s)")
+    for v in report["violations"]:
+        print(f"  {v['feature_name']}: {v['constraint_check_type']}")
+    print(f"{len(report['violations'])} violações")
+    print("Relatório guardado em:", args.output)
+    if args.fail_on_violation and report["violations"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
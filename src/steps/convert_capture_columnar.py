@@ -0,0 +1,180 @@
+"""
+Converte a árvore local de data capture (JSON Lines, ver enable_data_capture.py) num store colunar.
+
+Cada ficheiro de capture é descodificado num processo do pool (payloads CSV/JSON, base64 ou não,
+pedidos com várias linhas explodidos numa linha por registo; ver src/common/capture.py) e escrito
+particionado por hora do evento:
+  <output-dir>/dt=AAAA-MM-DD/hour=HH/part-<id do ficheiro>.parquet
+  ou, com --format npy, um diretório part-<id>/ com um .npy por coluna (lido com mmap)
+Colunas: uma por feature (Time, V1..V28, Amount), pred, proba, weight (1/p da amostragem),
+event_time (epoch, segundos) e inference_id.
+
+É incremental: o manifesto (<output-dir>/_manifest.json) guarda tamanho/mtime de cada ficheiro
+convertido, e as execuções seguintes só convertem ficheiros novos ou alterados.
+
+Exemplo:
+  aws s3 sync s3://aidm-creditcard-fraud-267567228900/monitoring/datacapture/ capture/
+  python -m src.steps.convert_capture_columnar --capture-dir capture/ --output-dir data/capture_columnar
+"""
+import argparse
+import hashlib
+import importlib.util
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from src.common.capture import FEATURE_NAMES, capture_feature_names, decode_capture_file, iter_capture_files
+
+MANIFEST = "_manifest.json"
+FORMATS = ("auto", "parquet", "npy")
+
+
+def parse_args():
+    p = argparse.ArgumentParser()
+    p.add_argument("--capture-dir", type=str, required=True)
+    p.add_argument("--output-dir", type=str, default="data/capture_columnar")
+    p.add_argument("--format", choices=FORMATS, default="auto",
+                   help="auto = parquet se houver pyarrow/fastparquet, senão npy")
+    p.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    p.add_argument("--n-features", type=int, default=len(FEATURE_NAMES))
+    return p.parse_args()
+
+
+def resolve_format(fmt: str) -> str:
+    has_parquet = any(importlib.util.find_spec(m) is not None for m in ("pyarrow", "fastparquet"))
+    if fmt == "parquet" and not has_parquet:
+        raise RuntimeError("--format parquet needs pyarrow or fastparquet installed")
+    if fmt == "auto":
+        return "parquet" if has_parquet else "npy"
+    return fmt
+
+
+def _write_part(out_path: str, columns: dict, fmt: str):
+    """
+    Escreve num caminho temporário e troca no fim: uma conversão interrompida não deixa partes a meio.
+    """
+    tmp = out_path + ".tmp"
+    if fmt == "parquet":
+        pd.DataFrame(columns).to_parquet(tmp, index=False)
+        os.replace(tmp, out_path)
+        return
+    os.makedirs(tmp, exist_ok=True)
+    for name, values in columns.items():
+        np.save(os.path.join(tmp, f"{name}.npy"), values, allow_pickle=False)
+    if os.path.isdir(out_path):
+        shutil.rmtree(out_path)
+    os.replace(tmp, out_path)
+
+
+def convert_file(task):
+    """
+    Corre num processo: um ficheiro de capture -> uma parte por hora do evento.
+    Devolve (ficheiro, linhas, partes escritas).
+    """
+    path, output_dir, fmt, n_features = task
+    cols = decode_capture_file(path, n_features=n_features)
+    n = len(cols["pred"])
+    if n == 0:
+        return path, 0, []
+
+    # eventos sem inferenceTime ficam na hora do ficheiro
+    event_time = np.where(np.isnan(cols["event_time"]), os.stat(path).st_mtime, cols["event_time"])
+    hour = (event_time // 3600).astype(np.int64)
+    part_id = hashlib.blake2b(os.path.abspath(path).encode("utf-8"), digest_size=8).hexdigest()
+    names = capture_feature_names(cols["features"].shape[1])
+
+    outputs = []
+    for h in np.unique(hour):
+        mask = hour == h
+        stamp = time.gmtime(int(h) * 3600)
+        part_dir = os.path.join(output_dir, time.strftime("dt=%Y-%m-%d", stamp), time.strftime("hour=%H", stamp))
+        os.makedirs(part_dir, exist_ok=True)
+        columns = {name: np.ascontiguousarray(cols["features"][mask, j]) for j, name in enumerate(names)}
+        columns.update({
+            "pred": cols["pred"][mask],
+            "proba": cols["proba"][mask],
+            "weight": cols["weight"][mask],
+            "event_time": event_time[mask],
+            "inference_id": cols["inference_id"][mask],
+        })
+        out_path = os.path.join(part_dir, f"part-{part_id}" + (".parquet" if fmt == "parquet" else ""))
+        _write_part(out_path, columns, fmt)
+        outputs.append(os.path.relpath(out_path, output_dir))
+    return path, n, outputs
+
+
+def load_manifest(output_dir: str) -> dict:
+    path = os.path.join(output_dir, MANIFEST)
+    if not os.path.exists(path):
+        return {"files": {}}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_manifest(output_dir: str, manifest: dict):
+    path = os.path.join(output_dir, MANIFEST)
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def _record(manifest: dict, output_dir: str, path: str, st, rows: int, outputs):
+    # um ficheiro alterado pode já não ter eventos nalguma hora: apaga as partes antigas que sobram
+    previous = manifest["files"].get(path, {}).get("outputs", [])
+    for stale in set(previous) - set(outputs):
+        stale_path = os.path.join(output_dir, stale)
+        if os.path.isdir(stale_path):
+            shutil.rmtree(stale_path)
+        elif os.path.exists(stale_path):
+            os.remove(stale_path)
+    manifest["files"][path] = {"size": st.st_size, "mtime": st.st_mtime, "rows": rows, "outputs": outputs}
+
+
+def main():
+    args = parse_args()
+    fmt = resolve_format(args.format)
+    os.makedirs(args.output_dir, exist_ok=True)
+    manifest = load_manifest(args.output_dir)
+    if manifest.get("format", fmt) != fmt:
+        raise RuntimeError(f"{args.output_dir} already holds {manifest['format']} parts, not {fmt}")
+    manifest["format"] = fmt
+
+    pending, skipped = [], 0
+    for path in iter_capture_files(args.capture_dir):
+        st = os.stat(path)
+        done = manifest["files"].get(path)
+        if done and done["size"] == st.st_size and done["mtime"] == st.st_mtime:
+            skipped += 1
+            continue
+        pending.append((path, st))
+
+    t0 = time.perf_counter()
+    tasks = [(path, args.output_dir, fmt, args.n_features) for path, _ in pending]
+    stats = {path: st for path, st in pending}
+    total_rows = 0
+    if args.workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            results = pool.map(convert_file, tasks, chunksize=max(1, len(tasks) // (args.workers * 4)))
+            for path, rows, outputs in results:
+                _record(manifest, args.output_dir, path, stats[path], rows, outputs)
+                total_rows += rows
+    else:
+        for task in tasks:
+            path, rows, outputs = convert_file(task)
+            _record(manifest, args.output_dir, path, stats[path], rows, outputs)
+            total_rows += rows
+    save_manifest(args.output_dir, manifest)
+
+    elapsed = time.perf_counter() - t0
+    print(f"{len(tasks)} ficheiros convertidos ({total_rows} linhas, {fmt}) em {elapsed:.2f}s; "
+          f"{skipped} já convertidos")
+    print("Store colunar em:", args.output_dir)
+
+
+if __name__ == "__main__":
+    main()
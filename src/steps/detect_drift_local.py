@@ -0,0 +1,262 @@
+"""
+Deteção de drift local e incremental contra o baseline do Model Monitor.
+
+Em vez de um processing job que relê a janela toda de data capture, mantém sketches mergeable
+por feature (momentos, KLL, histogramas; ver src/common/sketches.py) por hora de evento,
+num ficheiro de estado. Cada execução só lê as linhas de capture novas, junta as horas da
+janela (--window-hours, contada a partir da hora mais recente) e compara com statistics.json:
+  - linf: distância L-infinito entre CDFs (a do baseline_drift_check, contra comparison_threshold
+    do constraints.json)
+  - psi nos 10 intervalos do baseline, deslocamento da média em desvios-padrão do baseline
+  - completude contra a dos constraints
+O relatório só lista as features que mudaram desde a última execução (estado de drift diferente
+ou distância que mexeu mais de --min-change).
+
+Amostras do capture do container (byoc/capture.py) trazem pesos 1/p; são desbastadas para
+uma amostra uniforme antes de entrar nos sketches, para o score alto não parecer drift. O
+desbaste usa um só peso máximo para todos os ficheiros e execuções (--max-weight, ou o maior
+peso já visto, guardado no estado): com o máximo de cada ficheiro, um ficheiro só com linhas
+de peso 1 ficaria inteiro e os sketches deixavam de ser uma amostra uniforme.
+
+Exemplo (com a árvore de capture descarregada de s3://.../monitoring/datacapture/):
+  python -m src.steps.detect_drift_local --capture-dir capture/ \
+      --baseline-statistics baseline/statistics.json --baseline-constraints baseline/constraints.json
+"""
+import argparse
+import calendar
+import json
+import os
+import time
+from urllib.parse import urlparse
+
+import numpy as np
+
+from src.common.capture import decode_capture_file, iter_capture_files, thin_to_uniform
+from src.common.sketches import DatasetSketch, linf_distance, psi
+
+# 2: files guarda também as linhas já lidas de cada ficheiro
+# 3: max_weight, o peso máximo com que os sketches foram desbastados
+STATE_VERSION = 3
+
+
+def parse_args():
+    p = argparse.ArgumentParser()
+    p.add_argument("--capture-dir", type=str, required=True, help="árvore local de data capture")
+    p.add_argument("--baseline-statistics", type=str, required=True, help="statistics.json (local ou s3://)")
+    p.add_argument("--baseline-constraints", type=str, default="", help="constraints.json (local ou s3://)")
+    p.add_argument("--state", type=str, default="reports/drift_state.json")
+    p.add_argument("--output", type=str, default="reports/drift_report.json")
+    p.add_argument("--window-hours", type=int, default=24)
+    p.add_argument("--threshold", type=float, default=None,
+                   help="por omissão o comparison_threshold do constraints.json (ou 0.1)")
+    p.add_argument("--min-change", type=float, default=0.02)
+    p.add_argument("--sketch-k", type=int, default=256, help="k do KLL guardado por hora")
+    p.add_argument("--max-weight", type=float, default=0.0,
+                   help="peso máximo para o desbaste, 1/BYOC_CAPTURE_BASE_RATE do container; por omissão "
+                        "o maior peso visto (um peso maior do que o do estado obriga a reler tudo)")
+    p.add_argument("--rebuild", action="store_true", help="ignora o estado e relê tudo")
+    return p.parse_args()
+
+
+def load_json(path: str) -> dict:
+    if path.startswith("s3://"):
+        import boto3
+
+        parsed = urlparse(path)
+        body = boto3.client("s3").get_object(Bucket=parsed.netloc, Key=parsed.path.lstrip("/"))["Body"]
+        return json.loads(body.read())
+    with open(path) as f:
+        return json.load(f)
+
+
+def load_state(path: str, baseline: str, rebuild: bool) -> dict:
+    empty = {"version": STATE_VERSION, "baseline": baseline, "files": {}, "hours": {}, "last": {},
+             "max_weight": 1.0}
+    if rebuild or not os.path.exists(path):
+        return empty
+    with open(path) as f:
+        state = json.load(f)
+    if state.get("version") != STATE_VERSION or state.get("baseline") != baseline:
+        # outro baseline: as comparisons anteriores já não valem
+        return empty
+    return state
+
+
+def save_state(path: str, state: dict):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+
+def _hour_key(ts: float) -> str:
+    return time.strftime("%Y-%m-%dT%H", time.gmtime(ts))
+
+
+class _Restart(Exception):
+    """
+    O que já está nos sketches não se pode corrigir: ficheiro reescrito ou desbaste com outro peso máximo.
+    """
+
+
+def _ingest_files(state: dict, paths, names, sketch_k: int, rng: np.random.Generator, max_weight: float):
+    # primeiro lê as linhas novas de todos os ficheiros, para o desbaste usar um só peso máximo
+    pending = []
+    for path, st in paths:
+        seen = state["files"].get(path)
+        if seen is not None and seen[:2] == [st.st_size, st.st_mtime]:
+            continue
+        cols = decode_capture_file(path, n_features=len(names))
+        total = len(cols["weight"])
+        offset = seen[2] if seen is not None else 0
+        if total < offset:
+            raise _Restart(path)
+        pending.append((path, st, total, {k: cols[k][offset:] for k in ("features", "weight", "event_time")}))
+
+    top = max_weight or max([state["max_weight"]] + [c["weight"].max() for *_, c in pending if len(c["weight"])])
+    if top != state["max_weight"] and state["hours"]:
+        raise _Restart(f"max weight {state['max_weight']} -> {top}")
+    state["max_weight"] = top
+
+    hours = {key: DatasetSketch.from_state(s) for key, s in state["hours"].items()}
+    new_rows = 0
+    for path, st, total, cols in pending:
+        keep = thin_to_uniform(cols["weight"], rng, max_weight=top)
+        X = cols["features"][keep]
+        event_time = np.where(np.isnan(cols["event_time"][keep]), st.st_mtime, cols["event_time"][keep])
+        keys = np.array([_hour_key(t) for t in (event_time // 3600 * 3600)])
+        for key in np.unique(keys):
+            sketch = hours.setdefault(key, DatasetSketch(names, k=sketch_k))
+            sketch.update(X[keys == key])
+        state["files"][path] = [st.st_size, st.st_mtime, total]
+        new_rows += len(X)
+    return hours, len(pending), new_rows
+
+
+def ingest(state: dict, capture_dir: str, names, sketch_k: int, rng: np.random.Generator,
+           max_weight: float = 0.0):
+    """
+    Junta aos sketches por hora as linhas de capture que ainda não foram lidas.
+    Os ficheiros de capture só crescem: de um ficheiro que mudou desde a última leitura só
+    entram as linhas a seguir às já lidas. Se algum encolheu (foi reescrito), ou se o peso
+    máximo do desbaste mudou (max_weight, ou um peso maior do que os já vistos), o que já está
+    nos sketches não se consegue corrigir, e tudo é relido do início.
+    """
+    paths = [(path, os.stat(path)) for path in iter_capture_files(capture_dir)]
+    if not any(path in state["files"] and st.st_size < state["files"][path][0] for path, st in paths):
+        try:
+            return _ingest_files(state, paths, names, sketch_k, rng, max_weight)
+        except _Restart:
+            pass
+    state["files"], state["hours"], state["max_weight"] = {}, {}, 1.0
+    return _ingest_files(state, paths, names, sketch_k, rng, max_weight)
+
+
+def compare(baseline: DatasetSketch, current: DatasetSketch, completeness, threshold: float):
+    results = []
+    for b, c in zip(baseline.features, current.features):
+        linf = linf_distance(b.kll, c.kll) if c.num_numeric else float("nan")
+        edges = np.linspace(b.min, b.max, 11) if b.num_numeric and b.max > b.min else np.array([])
+        result = {
+            "feature": b.name,
+            "rows": c.num_present + c.num_missing,
+            "linf": linf,
+            "psi": psi(b.kll, c.kll, edges) if c.num_numeric else float("nan"),
+            "mean": c.mean if c.num_numeric else None,
+            "baseline_mean": b.mean,
+            "mean_shift_std": (c.mean - b.mean) / b.std_dev if c.num_numeric and b.std_dev > 0 else None,
+            "completeness": c.completeness,
+            "baseline_completeness": completeness.get(b.name),
+        }
+        result["drift"] = bool(linf > threshold) if not np.isnan(linf) else False
+        expected = completeness.get(b.name)
+        result["completeness_violation"] = bool(expected is not None and c.completeness < expected)
+        results.append(result)
+    return results
+
+
+def changed_only(results, last: dict, min_change: float):
+    changed = []
+    for r in results:
+        prev = last.get(r["feature"])
+        moved = (prev is None or prev["drift"] != r["drift"]
+                 or prev["completeness_violation"] != r["completeness_violation"]
+                 or (not np.isnan(r["linf"]) and (prev["linf"] is None or abs(r["linf"] - prev["linf"]) >= min_change)))
+        if moved:
+            changed.append({**r, "previous_linf": prev["linf"] if prev else None})
+    return changed
+
+
+def _clean(value):
+    # NaN não é JSON válido
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    return value
+
+
+def main():
+    args = parse_args()
+    statistics = load_json(args.baseline_statistics)
+    constraints = load_json(args.baseline_constraints) if args.baseline_constraints else {}
+    baseline = DatasetSketch.from_statistics(statistics)
+    names = baseline.names
+
+    threshold = args.threshold
+    if threshold is None:
+        threshold = (constraints.get("monitoring_config", {}).get("distribution_constraints", {})
+                     .get("comparison_threshold", 0.1))
+    completeness = {f["name"]: f["completeness"] for f in constraints.get("features", []) if "completeness" in f}
+
+    state = load_state(args.state, args.baseline_statistics, args.rebuild)
+    t0 = time.perf_counter()
+    hours, new_files, new_rows = ingest(state, args.capture_dir, names, args.sketch_k, np.random.default_rng(),
+                                       args.max_weight)
+
+    # janela: as últimas window_hours horas até à hora mais recente com dados
+    keys = sorted(hours)
+    window = []
+    if keys:
+        end = calendar.timegm(time.strptime(keys[-1], "%Y-%m-%dT%H"))
+        start_key = _hour_key(end - (args.window_hours - 1) * 3600)
+        window = [k for k in keys if k >= start_key]
+        hours = {k: hours[k] for k in window}
+
+    current = DatasetSketch(names, k=args.sketch_k)
+    for key in window:
+        current.merge(hours[key])
+
+    results = compare(baseline, current, completeness, threshold) if current.item_count else []
+    changed = changed_only(results, state["last"], args.min_change)
+
+    state["hours"] = {k: s.to_state() for k, s in hours.items()}
+    state["last"] = {r["feature"]: {"linf": _clean(r["linf"]), "drift": r["drift"],
+                                    "completeness_violation": r["completeness_violation"]} for r in results}
+    save_state(args.state, state)
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "baseline_statistics": args.baseline_statistics,
+        "capture_dir": args.capture_dir,
+        "window": {"start": window[0] if window else None, "end": window[-1] if window else None,
+                   "hours": len(window), "rows": current.item_count},
+        "new_files": new_files,
+        "new_rows": new_rows,
+        "elapsed_s": time.perf_counter() - t0,
+        "threshold": threshold,
+        "drifting": [r["feature"] for r in results if r["drift"]],
+        "changed": [{k: _clean(v) for k, v in r.items()} for r in changed],
+    }
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"{new_files} ficheiros novos ({new_rows} linhas), janela {len(window)}h com {current.item_count} linhas")
+    for r in changed:
+        flag = "DRIFT" if r["drift"] else "ok"
+        print(f"  {r['feature']}: linf={r['linf']:.3f} psi={r['psi']:.3f} {flag}")
+    print("Relatório guardado em:", args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -8,6 +8,8 @@ BUCKET = os.getenv("BUCKET", "aidm-creditcard-fraud-267567228900")
 ENDPOINT_NAME = os.getenv("ENDPOINT_NAME", "transactionsfraud-byoc-endpoint")
 NEW_CONFIG_NAME = os.getenv("CAPTURE_CONFIG_NAME", f"{ENDPOINT_NAME}-config-capture")
 CAPTURE_S3 = os.getenv("CAPTURE_S3", f"s3://{BUCKET}/monitoring/datacapture/")
+# com o capture amostrado do container (BYOC_CAPTURE_DIR) pode baixar-se bastante
+SAMPLING_PERCENTAGE = int(os.getenv("CAPTURE_SAMPLING_PERCENTAGE", "100"))
 
 sm = boto3.client("sagemaker", region_name=AWS_REGION)
 
@@ -44,7 +46,7 @@ def main():
 
     data_capture = {
         "EnableCapture": True,
-        "InitialSamplingPercentage": 100,
+        "InitialSamplingPercentage": SAMPLING_PERCENTAGE,
         "DestinationS3Uri": CAPTURE_S3,
         "CaptureOptions": [{"CaptureMode": "Input"}, {"CaptureMode": "Output"}],
         "CaptureContentTypeHeader": {
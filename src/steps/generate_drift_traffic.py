@@ -0,0 +1,314 @@
+"""
+Gerador de tráfego com drift, concorrente e guiado por perfis declarativos.
+
+Substitui o ciclo de simulate_drift_csv.py (300 pedidos sequenciais de uma linha, com um shift
+fixo no Amount): as linhas vêm do test.csv real e cada perfil diz, por feature, como as alterar
+e quando. O drift avança com o número do pedido (0 no primeiro, 1 no último), por isso horas de
+tráfego com drift cabem em minutos, com a concorrência e o ritmo que se pedir.
+
+Perfil (JSON, ou o nome de um de PROFILES):
+  {
+    "onset": "gradual",          # ou "sudden"; pode ser redefinido por feature
+    "start": 0.2,                # fração da corrida em que o drift começa
+    "ramp": 0.5,                 # gradual: fração da corrida até à intensidade máxima
+    "features": {
+      "Amount": {"shift": 250.0, "shift_std": 0.0, "scale": 1.5},   # x -> média + (x - média) * scale + shift
+      "V14": {"missing": 0.1, "onset": "sudden", "start": 0.5}      # fração de valores em falta
+    },
+    "mix": {"query": "Class == 1", "fraction": 0.3}                 # linhas reais trocadas por outras do test.csv
+  }
+Tudo é multiplicado pela intensidade do momento (shift e missing escalam, scale vai de 1 ao valor).
+
+Valores em falta saem como campo vazio no CSV e null no JSON, a forma que o data capture e o
+Model Monitor leem como valor em falta. O BYOC não avalia linhas incompletas (o sklearn também
+não) e responde 400 ao pedido todo, por isso no perfil missing_values os pedidos com algum valor
+em falta são rejeições esperadas: o relatório separa os estados esperados (200 sem valores em
+falta, 400 com) dos inesperados. Para ver a completude a cair nos checks, guarde as linhas com
+--save-rows e passe-as a check_constraints_local.py --data.
+
+Destino: --endpoint-name (invoke_endpoint, boto3) ou --url (servidor local, POST /invocations).
+
+Exemplo:
+  python -m src.steps.generate_drift_traffic --url http://127.0.0.1:8080 --profile amount_gradual \
+      --requests 20000 --batch-size 20 --concurrency 16 --rate 200 --save-rows reports/drift_rows.csv
+"""
+import argparse
+import http.client
+import io
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import numpy as np
+import pandas as pd
+
+AWS_REGION = "eu-west-1"
+TARGET = "Class"
+
+PROFILES = {
+    "none": {"features": {}},
+    # o mesmo cenário de simulate_drift_csv.py: Amount muito acima do normal desde o início
+    "amount_shift": {"onset": "sudden", "start": 0.0, "features": {"Amount": {"shift": 5000.0}}},
+    "amount_gradual": {"onset": "gradual", "start": 0.1, "ramp": 0.6,
+                       "features": {"Amount": {"shift_std": 2.0, "scale": 1.5}}},
+    "missing_values": {"onset": "sudden", "start": 0.5,
+                       "features": {"V1": {"missing": 0.2}, "V2": {"missing": 0.2}, "V3": {"missing": 0.2}}},
+    "fraud_mix": {"onset": "gradual", "start": 0.2, "ramp": 0.5, "mix": {"query": "Class == 1", "fraction": 0.3}},
+}
+
+
+def parse_args():
+    p = argparse.ArgumentParser()
+    target = p.add_mutually_exclusive_group(required=True)
+    target.add_argument("--endpoint-name", type=str, help="endpoint SageMaker (invoke_endpoint)")
+    target.add_argument("--url", type=str, help="servidor local, ex.: http://127.0.0.1:8080")
+    p.add_argument("--profile", type=str, default="amount_gradual", help=f"ficheiro JSON ou um de {sorted(PROFILES)}")
+    p.add_argument("--data", type=str, default="data/splits/test.csv")
+    p.add_argument("--requests", type=int, default=1000)
+    p.add_argument("--batch-size", type=int, default=10, help="linhas por pedido")
+    p.add_argument("--concurrency", type=int, default=8)
+    p.add_argument("--rate", type=float, default=0.0, help="pedidos por segundo (0 = sem limite)")
+    p.add_argument("--content-type", choices=["text/csv", "application/json"], default="text/csv")
+    p.add_argument("--seed", type=int, default=None)
+    p.add_argument("--save-rows", type=str, default="", help="CSV com as linhas enviadas (sem header)")
+    p.add_argument("--output", type=str, default="reports/drift_traffic.json")
+    return p.parse_args()
+
+
+def load_profile(value: str) -> dict:
+    if value in PROFILES:
+        return PROFILES[value]
+    with open(value) as f:
+        return json.load(f)
+
+
+def intensity(spec: dict, profile: dict, progress: np.ndarray) -> np.ndarray:
+    """
+    Intensidade do drift (0..1) em cada ponto da corrida; spec pode redefinir onset/start/ramp.
+    """
+    onset = spec.get("onset", profile.get("onset", "sudden"))
+    start = float(spec.get("start", profile.get("start", 0.0)))
+    if onset == "sudden":
+        return (progress >= start).astype(np.float64)
+    ramp = max(float(spec.get("ramp", profile.get("ramp", 0.5))), 1e-9)
+    return np.clip((progress - start) / ramp, 0.0, 1.0)
+
+
+class DriftSource:
+    """
+    Linhas do test.csv com o perfil aplicado; drifted(...) é vetorizado por pedido.
+    """
+
+    def __init__(self, df: pd.DataFrame, profile: dict):
+        self.profile = profile
+        self.names = [c for c in df.columns if c != TARGET]
+        self.rows = np.ascontiguousarray(df[self.names].to_numpy(dtype=np.float64))
+        self.mean = self.rows.mean(axis=0)
+        self.std = self.rows.std(axis=0)
+        self.features = []
+        for name, spec in profile.get("features", {}).items():
+            if name not in self.names:
+                raise ValueError(f"Profile feature {name!r} is not a column of the data ({len(self.names)} columns)")
+            self.features.append((self.names.index(name), spec))
+        self.mix = profile.get("mix")
+        self.mix_rows = None
+        if self.mix:
+            pool = df.query(self.mix["query"]) if self.mix.get("query") else df
+            if pool.empty:
+                raise ValueError(f"Mix query {self.mix.get('query')!r} matched no rows")
+            self.mix_rows = np.ascontiguousarray(pool[self.names].to_numpy(dtype=np.float64))
+
+    def drifted(self, n: int, progress: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+        X = self.rows[rng.integers(len(self.rows), size=n)]
+        if self.mix_rows is not None:
+            swap = rng.random(n) < float(self.mix.get("fraction", 0.0)) * intensity(self.mix, self.profile, progress)
+            X[swap] = self.mix_rows[rng.integers(len(self.mix_rows), size=int(swap.sum()))]
+        for j, spec in self.features:
+            level = intensity(spec, self.profile, progress)
+            scale = 1.0 + (float(spec.get("scale", 1.0)) - 1.0) * level
+            shift = (float(spec.get("shift", 0.0)) + float(spec.get("shift_std", 0.0)) * self.std[j]) * level
+            X[:, j] = self.mean[j] + (X[:, j] - self.mean[j]) * scale + shift
+            if spec.get("missing"):
+                X[rng.random(n) < float(spec["missing"]) * level, j] = np.nan
+        return X
+
+
+_NAN_FIELD = re.compile(r"(?<![^,\n])nan(?![^,\n])")
+
+
+def encode(X: np.ndarray, content_type: str) -> bytes:
+    """
+    Corpo do pedido; valores em falta (NaN) saem como null no JSON e campo vazio no CSV.
+    """
+    if content_type == "application/json":
+        missing = np.isnan(X)
+        rows = np.where(missing, None, X).tolist() if missing.any() else X.tolist()
+        return json.dumps({"instances": rows}).encode("utf-8")
+    buf = io.StringIO()
+    np.savetxt(buf, X, delimiter=",", fmt="%.10g")
+    text = buf.getvalue()
+    return _NAN_FIELD.sub("", text).encode("utf-8")
+
+
+def make_sender(args):
+    """
+    call(body) -> (status, segundos); uma ligação por thread.
+    """
+    local = threading.local()
+    if args.endpoint_name:
+        import boto3
+        from botocore.config import Config
+        from botocore.exceptions import BotoCoreError, ClientError
+
+        rt = boto3.client("sagemaker-runtime", region_name=AWS_REGION,
+                          config=Config(max_pool_connections=args.concurrency, retries={"max_attempts": 2}))
+
+        def call(body):
+            t0 = time.perf_counter()
+            try:
+                rt.invoke_endpoint(EndpointName=args.endpoint_name, ContentType=args.content_type,
+                                   Accept="application/json", Body=body)
+                status = 200
+            except ClientError as e:
+                # erro do container: o SageMaker responde 424 (ModelError) e guarda o estado original
+                status = (e.response.get("OriginalStatusCode")
+                          or e.response.get("ResponseMetadata", {}).get("HTTPStatusCode", 0))
+            except BotoCoreError:
+                # timeouts, ligações recusadas, credenciais: sem resposta HTTP, como no caminho local
+                status = 0
+            return status, time.perf_counter() - t0
+        return call
+
+    parsed = urlparse(args.url)
+
+    def call(body):
+        t0 = time.perf_counter()
+        conn = getattr(local, "conn", None)
+        if conn is None:
+            conn = local.conn = http.client.HTTPConnection(parsed.hostname, parsed.port or 80, timeout=60)
+        try:
+            conn.request("POST", "/invocations", body=body,
+                         headers={"Content-Type": args.content_type, "Accept": "application/json"})
+            resp = conn.getresponse()
+            resp.read()
+            status = resp.status
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            local.conn = None
+            status = 0
+        return status, time.perf_counter() - t0
+    return call
+
+
+def run(source: DriftSource, call, args):
+    """
+    Os pedidos são numerados; com --rate, o pedido i não sai antes de t0 + i / rate.
+    """
+    seed_seq = np.random.SeedSequence(args.seed)
+    lock = threading.Lock()
+    counter = iter(range(args.requests))
+    statuses, latencies, saved = {}, [], []
+    expected = {200: 0, 400: 0, "unexpected": 0}
+    intensity_log = []
+    t0 = time.perf_counter()
+
+    def worker(rng):
+        local_lat, local_status, local_rows = [], {}, []
+        local_expected = {200: 0, 400: 0, "unexpected": 0}
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                break
+            if args.rate > 0:
+                delay = t0 + i / args.rate - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            progress = np.full(args.batch_size, i / max(args.requests - 1, 1))
+            X = source.drifted(args.batch_size, progress, rng)
+            status, elapsed = call(encode(X, args.content_type))
+            local_lat.append(elapsed)
+            local_status[status] = local_status.get(status, 0) + 1
+            # linhas com valores em falta: o BYOC recusa o pedido
+            want = 400 if np.isnan(X).any() else 200
+            local_expected[want] += 1
+            if status != want:
+                local_expected["unexpected"] += 1
+            if args.save_rows:
+                local_rows.append((i, X))
+        with lock:
+            latencies.extend(local_lat)
+            for status, n in local_status.items():
+                statuses[status] = statuses.get(status, 0) + n
+            for key, n in local_expected.items():
+                expected[key] += n
+            saved.extend(local_rows)
+
+    rngs = [np.random.default_rng(s) for s in seed_seq.spawn(args.concurrency)]
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(worker, rngs))
+    wall = time.perf_counter() - t0
+
+    # intensidade por feature em 10 pontos da corrida, para ler os relatórios de monitoring contra ela
+    checkpoints = np.linspace(0.0, 1.0, 11)
+    for j, spec in source.features:
+        intensity_log.append({"feature": source.names[j],
+                              "intensity": intensity(spec, source.profile, checkpoints).round(3).tolist()})
+    if source.mix:
+        intensity_log.append({"feature": "mix", "intensity": intensity(source.mix, source.profile,
+                                                                        checkpoints).round(3).tolist()})
+    return statuses, expected, latencies, wall, saved, intensity_log
+
+
+def main():
+    args = parse_args()
+    profile = load_profile(args.profile)
+    source = DriftSource(pd.read_csv(args.data), profile)
+    call = make_sender(args)
+
+    statuses, expected, latencies, wall, saved, intensity_log = run(source, call, args)
+
+    lat_ms = np.asarray(latencies) * 1000
+    sent = len(latencies)
+    ok = statuses.get(200, 0)
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "target": args.endpoint_name or args.url,
+        "profile": args.profile,
+        "profile_spec": profile,
+        "requests": sent,
+        "rows": sent * args.batch_size,
+        "ok": ok,
+        "statuses": {str(k): v for k, v in sorted(statuses.items())},
+        # 200 esperado sem valores em falta, 400 com; "unexpected" conta os que não bateram certo
+        "expected_statuses": {str(k): v for k, v in expected.items()},
+        "wall_s": wall,
+        "requests_per_s": sent / wall if wall > 0 else None,
+        "rows_per_s": sent * args.batch_size / wall if wall > 0 else None,
+        "latency_ms": {q: float(np.percentile(lat_ms, p)) if sent else None
+                       for q, p in (("p50", 50), ("p95", 95), ("p99", 99))},
+        "intensity_checkpoints": np.linspace(0.0, 1.0, 11).round(2).tolist(),
+        "intensity": intensity_log,
+    }
+    if args.save_rows and saved:
+        os.makedirs(os.path.dirname(args.save_rows) or ".", exist_ok=True)
+        # pela ordem dos pedidos, para o drift aparecer no ficheiro como na corrida
+        with open(args.save_rows, "wb") as f:
+            f.write(encode(np.concatenate([X for _, X in sorted(saved, key=lambda s: s[0])]), "text/csv"))
+        report["saved_rows"] = args.save_rows
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"{sent} pedidos ({sent * args.batch_size} linhas) em {wall:.1f}s: "
+          f"{report['rows_per_s']:.0f} linhas/s, {ok} ok, estados {report['statuses']}, "
+          f"{expected['unexpected']} fora do esperado")
+    print("Relatório guardado em:", args.output)
+
+
+if __name__ == "__main__":
+    main()
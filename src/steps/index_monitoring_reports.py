@@ -0,0 +1,193 @@
+"""
+Indexa os relatórios do Model Monitor (statistics.json e constraint_violations.json de cada
+execução) num índice colunar local (src/common/report_index.py) e responde a queries sobre ele.
+
+  ingest: lê os relatórios novos ou alterados de uma árvore local ou diretamente de S3
+          (o OUTPUT_S3 dos scripts de monitoring) e acrescenta um segmento ao índice; uma
+          execução nova que escreveu por cima de outra na mesma hora entra como execução à parte
+  query:  série temporal de uma feature, violações num intervalo e desde quando é que a
+          feature está em violação, por schedule
+
+Exemplo:
+  python -m src.steps.index_monitoring_reports ingest \
+      --reports s3://aidm-creditcard-fraud-267567228900/monitoring/reports/
+  python -m src.steps.index_monitoring_reports query --feature Amount --start 2026-10-01 --column p50
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlparse
+
+import numpy as np
+
+from src.common.report_index import (ReportIndex, execution_time, parse_report_path, report_key, report_rows,
+                                     run_written)
+
+
+def parse_args():
+    p = argparse.ArgumentParser()
+    p.add_argument("--index-dir", type=str, default="reports/monitoring_index")
+    sub = p.add_subparsers(dest="command", required=True)
+
+    ingest = sub.add_parser("ingest")
+    ingest.add_argument("--reports", type=str, required=True, help="árvore local ou prefixo s3:// dos reports")
+    ingest.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="processos a ler relatórios (com S3, mais do que CPUs compensa)")
+    ingest.add_argument("--compact", action="store_true", help="junta os segmentos num só no fim")
+
+    query = sub.add_parser("query")
+    query.add_argument("--feature", type=str, default=None, help="nome no statistics.json (ou Time/V1..V28/Amount)")
+    query.add_argument("--column", type=str, default="mean",
+                       help="estatística da série (mean, std_dev, p50, completeness, ...) ou distance")
+    query.add_argument("--schedule", type=str, default=None)
+    query.add_argument("--check", type=str, default=None, help="filtra as violações por constraint_check_type")
+    query.add_argument("--start", type=str, default=None, help="ex.: 2026-10-01 ou 2026-10-18T13")
+    query.add_argument("--end", type=str, default=None)
+    query.add_argument("--output", type=str, default="reports/monitoring_query.json")
+    return p.parse_args()
+
+
+def iter_local_reports(root: str):
+    """
+    (chave, assinatura, caminho, mtime) dos relatórios numa árvore local.
+    """
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith("."))
+        for name in sorted(filenames):
+            if name in ("statistics.json", "constraint_violations.json"):
+                # caminho absoluto: o schedule e a hora vêm dos diretórios acima de root
+                path = os.path.abspath(os.path.join(dirpath, name))
+                st = os.stat(path)
+                yield path, f"{st.st_size}:{st.st_mtime_ns}", path, st.st_mtime
+
+
+def iter_s3_reports(prefix: str):
+    """
+    (chave, ETag, chave S3, LastModified) dos relatórios sob um prefixo S3.
+    """
+    import boto3
+
+    parsed = urlparse(prefix)
+    s3 = boto3.client("s3")
+    for page in s3.get_paginator("list_objects_v2").paginate(Bucket=parsed.netloc, Prefix=parsed.path.lstrip("/")):
+        for obj in page.get("Contents", []):
+            if obj["Key"].endswith(("/statistics.json", "/constraint_violations.json")):
+                yield obj["Key"], obj["ETag"], obj["Key"], obj["LastModified"].timestamp()
+
+
+_s3 = None
+
+
+def load_report(task):
+    """
+    Corre num processo: lê um relatório (local ou S3) e devolve (tabela, linhas).
+    """
+    global _s3
+    location, bucket, kind = task
+    if bucket:
+        if _s3 is None:
+            import boto3
+
+            _s3 = boto3.client("s3")
+        report = json.loads(_s3.get_object(Bucket=bucket, Key=location)["Body"].read())
+    else:
+        with open(location) as f:
+            report = json.load(f)
+    return report_rows(report, kind)
+
+
+def ingest(index: ReportIndex, reports: str, workers: int) -> dict:
+    if reports.startswith("s3://"):
+        listing, bucket = iter_s3_reports(reports), urlparse(reports).netloc
+    else:
+        listing, bucket = iter_local_reports(reports), ""
+
+    counts = {"read": 0, "skipped": 0, "unrecognized": 0}
+    folders = {}
+    for path, signature, location, modified in listing:
+        parsed = parse_report_path(path)
+        if parsed is None:
+            counts["unrecognized"] += 1
+            continue
+        folders.setdefault(os.path.dirname(path), []).append((path, signature, location, parsed, modified))
+
+    pending = []
+    for folder_reports in folders.values():
+        # statistics.json e constraint_violations.json da mesma execução ficam com o mesmo instante;
+        # um relatório reescrito mais tarde fica com o da execução que o escreveu
+        written = run_written([modified for *_, modified in folder_reports])
+        for (path, signature, location, (schedule, hour, kind), _), run in zip(folder_reports, written):
+            when = execution_time(hour, run)
+            key = report_key(path, when)
+            if index.needs(key, signature):
+                pending.append((key, signature, location, (schedule, when, kind)))
+            else:
+                counts["skipped"] += 1
+
+    tasks = [(location, bucket, kind) for _, _, location, (_, _, kind) in pending]
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(load_report, tasks, chunksize=max(1, len(tasks) // (workers * 4))))
+    else:
+        results = [load_report(task) for task in tasks]
+    for (key, signature, _, (schedule, when, _)), (table, rows) in zip(pending, results):
+        index.add_rows(key, signature, schedule, when, table, rows)
+    counts["read"] = len(pending)
+    counts["rows"] = index.commit()
+    return counts
+
+
+def _records(df):
+    df = df.copy()
+    df["execution_time"] = df["execution_time"].map(lambda t: t.isoformat())
+    return json.loads(df.replace({np.nan: None}).to_json(orient="records"))
+
+
+def main():
+    args = parse_args()
+    t0 = time.perf_counter()
+    index = ReportIndex(args.index_dir)
+
+    if args.command == "ingest":
+        counts = ingest(index, args.reports, args.workers)
+        if args.compact:
+            index.compact()
+        print(f"{counts['read']} relatórios novos ({counts['rows']} linhas), {counts['skipped']} já indexados, "
+              f"{counts['unrecognized']} fora do layout <schedule>/AAAA/MM/DD/HH/: "
+              f"{time.perf_counter() - t0:.2f}s")
+        print(f"Índice em: {args.index_dir} ({len(index.manifest['segments'])} segmentos)")
+        return
+
+    if args.feature and not index.has_feature(args.feature):
+        known = ", ".join(index.manifest["features"][:10])
+        sys.exit(f"error: feature {args.feature!r} is not in the index (indexed: {known or 'none'}"
+                 f"{', ...' if len(index.manifest['features']) > 10 else ''})")
+
+    result = {"feature": args.feature, "schedule": args.schedule, "start": args.start, "end": args.end}
+    violations = index.violations(args.feature, args.check, args.schedule, args.start, args.end)
+    result["violations"] = _records(violations)
+    if args.feature:
+        trend = index.trend(args.feature, args.column, args.schedule, args.start, args.end)
+        result["column"] = args.column
+        result["trend"] = _records(trend)
+        result["onset"] = index.onset(args.feature, args.check or "baseline_drift_check", args.schedule)
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(result, f, indent=2)
+
+    print(f"{len(violations)} violações", end="")
+    if args.feature:
+        print(f", {len(result['trend'])} pontos de {args.column} para {args.feature}", end="")
+    print(f" ({time.perf_counter() - t0:.3f}s)")
+    for o in result.get("onset", []):
+        state = f"em violação desde {o['since']} ({o['executions']} execuções)" if o["since"] else "sem violação"
+        print(f"  {o['schedule']}: {state}")
+    print("Relatório guardado em:", args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Baseline de data quality local, numa só passagem, sem processing job.
+
+Substitui o DefaultModelMonitor.suggest_baseline de suggest_data_quality_baseline.py: o CSV é
+partido em intervalos de bytes alinhados a linhas, cada intervalo é lido e resumido num
+processo (completude, tipos, momentos, sketch KLL; ver src/common/sketches.py) e os resumos
+são juntos no fim. Escreve statistics.json e constraints.json no formato do Model Monitor,
+prontos para o BaselineConfig dos schedules (e para detect_drift_local.py).
+
+Exemplo:
+  python -m src.steps.suggest_baseline_local --data data/baseline.csv --output-dir reports/baseline
+  # e, se quiseres publicar onde os schedules esperam:
+  python -m src.steps.suggest_baseline_local --data data/baseline.csv \
+      --output-s3 s3://aidm-creditcard-fraud-267567228900/monitoring/baseline/results/
+"""
+import argparse
+import io
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlparse
+
+import pandas as pd
+
+from src.common.sketches import KLL_K, DatasetSketch, default_feature_names, frame_to_matrix
+
+
+def parse_args():
+    p = argparse.ArgumentParser()
+    p.add_argument("--data", type=str, required=True, help="CSV do baseline")
+    p.add_argument("--header", action="store_true",
+                   help="o CSV tem header (por omissão não, como DatasetFormat.csv(header=False))")
+    p.add_argument("--output-dir", type=str, default="reports/baseline")
+    p.add_argument("--output-s3", type=str, default="", help="prefixo S3 para onde copiar os dois ficheiros")
+    p.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    p.add_argument("--chunk-mb", type=float, default=64.0, help="tamanho máximo de cada intervalo lido")
+    p.add_argument("--sketch-k", type=int, default=KLL_K)
+    return p.parse_args()
+
+
+def read_columns(path: str, header: bool):
+    """
+    (nomes das colunas, offset do início dos dados).
+    """
+    with open(path, "rb") as f:
+        first = f.readline()
+    if not first:
+        raise ValueError(f"{path} is empty")
+    fields = next(iter(pd.read_csv(io.BytesIO(first), header=None, dtype=str).itertuples(index=False)))
+    if header:
+        return [str(v) for v in fields], len(first)
+    return default_feature_names(len(fields)), 0
+
+
+def byte_ranges(path: str, start: int, n_ranges: int):
+    """
+    Intervalos [a, b) que começam sempre no início de uma linha.
+    """
+    size = os.path.getsize(path)
+    step = max(1, (size - start) // n_ranges)
+    bounds = [start]
+    with open(path, "rb") as f:
+        for i in range(1, n_ranges):
+            pos = start + i * step
+            if pos <= bounds[-1]:
+                continue
+            f.seek(pos)
+            f.readline()
+            if f.tell() >= size:
+                break
+            bounds.append(f.tell())
+    bounds.append(size)
+    return [(a, b) for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+
+
+def profile_range(task):
+    """
+    Corre num processo: lê um intervalo do CSV e devolve o estado do sketch.
+    """
+    path, start, end, names, sketch_k = task
+    with open(path, "rb") as f:
+        f.seek(start)
+        body = f.read(end - start)
+    sketch = DatasetSketch(names, k=sketch_k)
+    if body.strip():
+        df = pd.read_csv(io.BytesIO(body), header=None, names=list(range(len(names))),
+                         skip_blank_lines=True, low_memory=False)
+        X, n_string = frame_to_matrix(df)
+        sketch.update(X, n_string)
+    return sketch.to_state()
+
+
+def upload(local_path: str, s3_prefix: str):
+    import boto3
+
+    parsed = urlparse(s3_prefix)
+    key = parsed.path.lstrip("/").rstrip("/") + "/" + os.path.basename(local_path)
+    boto3.client("s3").upload_file(local_path, parsed.netloc, key)
+    return f"s3://{parsed.netloc}/{key}"
+
+
+def main():
+    args = parse_args()
+    t0 = time.perf_counter()
+
+    names, start = read_columns(args.data, args.header)
+    size = os.path.getsize(args.data)
+    n_ranges = max(args.workers, int(size / (args.chunk_mb * 1024 * 1024)) + 1)
+    tasks = [(args.data, a, b, names, args.sketch_k) for a, b in byte_ranges(args.data, start, n_ranges)]
+
+    sketch = DatasetSketch(names, k=args.sketch_k)
+    if args.workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            for state in pool.map(profile_range, tasks):
+                sketch.merge(DatasetSketch.from_state(state))
+    else:
+        for task in tasks:
+            sketch.merge(DatasetSketch.from_state(profile_range(task)))
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    paths = {}
+    for name, content in (("statistics.json", sketch.to_statistics()), ("constraints.json", sketch.to_constraints())):
+        paths[name] = os.path.join(args.output_dir, name)
+        with open(paths[name], "w") as f:
+            json.dump(content, f, indent=2)
+
+    elapsed = time.perf_counter() - t0
+    print(f"{sketch.item_count} linhas, {len(names)} colunas, {len(tasks)} intervalos, "
+          f"{args.workers} processos: {elapsed:.2f}s")
+    print(f"Statistics:  {paths['statistics.json']}")
+    print(f"Constraints: {paths['constraints.json']}")
+    if args.output_s3:
+        for path in paths.values():
+            print("Uploaded:", upload(path, args.output_s3))
+
+
+if __name__ == "__main__":
+    main()
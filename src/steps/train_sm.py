@@ -1,6 +1,8 @@
 import argparse
+import json
 import os
 import joblib
+import numpy as np
 import pandas as pd
 
 from sklearn.linear_model import LogisticRegression
@@ -23,6 +25,11 @@ def parse_args():
     return parser.parse_args()
 
 
+# Artefacto compilado lido pelo container BYOC (byoc/scorer.py) com mmap
+COMPILED_DIR = "model_compiled"
+COMPILED_FORMAT_VERSION = 1
+
+
 def load_channel_csv(channel_dir: str) -> pd.DataFrame:
     files = [f for f in os.listdir(channel_dir) if f.endswith(".csv")]
     if not files:
@@ -30,6 +37,42 @@ def load_channel_csv(channel_dir: str) -> pd.DataFrame:
     return pd.read_csv(os.path.join(channel_dir, files[0]))
 
 
+def save_compiled_model(model: Pipeline, model_dir: str):
+    """
+    Escreve ao lado do model.joblib um artefacto sem pickle:
+    header.json + arrays .npy (pesos já com o scaler dobrado, estatísticas do scaler, coeficientes).
+    """
+    scaler = model.named_steps["scaler"]
+    clf = model.named_steps["clf"]
+
+    coef = clf.coef_[0].astype(np.float64)
+    mean = scaler.mean_.astype(np.float64)
+    scale = scaler.scale_.astype(np.float64)
+    # z = ((x - mean) / scale) @ coef + b = x @ weights + bias
+    weights = coef / scale
+    bias = float(clf.intercept_[0]) - float(mean @ weights)
+
+    out_dir = os.path.join(model_dir, COMPILED_DIR)
+    os.makedirs(out_dir, exist_ok=True)
+    arrays = {"weights": weights, "mean": mean, "scale": scale, "coef": coef}
+    for name, arr in arrays.items():
+        np.save(os.path.join(out_dir, f"{name}.npy"), np.ascontiguousarray(arr))
+
+    header = {
+        "format": "byoc-linear",
+        "version": COMPILED_FORMAT_VERSION,
+        "n_features": int(weights.shape[0]),
+        "feature_names": [str(c) for c in model.feature_names_in_],
+        "classes": clf.classes_.tolist(),
+        "bias": bias,
+        "intercept": float(clf.intercept_[0]),
+        "dtype": "float64",
+        "arrays": {name: f"{name}.npy" for name in arrays},
+    }
+    with open(os.path.join(out_dir, "header.json"), "w") as f:
+        json.dump(header, f, indent=2)
+
+
 def main():
     args = parse_args()
 
@@ -70,6 +113,7 @@ def main():
 
     os.makedirs(args.model_dir, exist_ok=True)
     joblib.dump(model, os.path.join(args.model_dir, "model.joblib"))
+    save_compiled_model(model, args.model_dir)
 
 
 if __name__ == "__main__":
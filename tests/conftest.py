@@ -0,0 +1,39 @@
+"""
+Os módulos de byoc/ importam-se uns aos outros pelo nome (como no container, onde correm a
+partir de /opt/program), por isso a pasta entra no sys.path; src.* importa-se da raiz.
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (ROOT, os.path.join(ROOT, "byoc")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+N_FEATURES = 30
+
+
+@pytest.fixture(scope="session")
+def pipeline():
+    """
+    StandardScaler + LogisticRegression treinado em dados sintéticos com 30 features.
+    """
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import StandardScaler
+
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(500, N_FEATURES)) * rng.uniform(0.5, 50, size=N_FEATURES)
+    y = (X[:, 0] / 10 + X[:, 1] / 40 + rng.normal(size=500) > 0).astype(int)
+    return Pipeline([("scaler", StandardScaler()), ("clf", LogisticRegression(max_iter=1000))]).fit(X, y)
+
+
+@pytest.fixture
+def model_dir(tmp_path, pipeline):
+    import joblib
+
+    joblib.dump(pipeline, tmp_path / "model.joblib")
+    return str(tmp_path)
@@ -0,0 +1,35 @@
+import numpy as np
+
+from cache import PredictionCache, predict_cached
+
+
+def _predict(calls):
+    def predict(X):
+        calls.append(len(X))
+        return {"pred": (X[:, 0] > 0).astype(np.int64), "proba": 1 / (1 + np.exp(-X[:, 0]))}
+    return predict
+
+
+def test_alternating_versions_keep_their_entries():
+    cache, calls = PredictionCache(max_entries=100, ttl_s=60), []
+    X = np.random.default_rng(0).normal(size=(4, 3))
+    # hot reload: pedidos das duas versões intercalados
+    for _ in range(3):
+        for version in ("old", "new"):
+            out = predict_cached(cache, X, version, _predict(calls))
+            np.testing.assert_array_equal(out["pred"], X[:, 0] > 0)
+    assert calls == [4, 4]
+    assert cache.stats()["hits"] == 16
+    assert cache.stats()["entries"] == 8
+
+
+def test_partial_hits_and_lru():
+    cache, calls = PredictionCache(max_entries=3, ttl_s=60), []
+    X = np.random.default_rng(1).normal(size=(3, 3))
+    predict_cached(cache, X[:2], "v", _predict(calls))
+    out = predict_cached(cache, X, "v", _predict(calls))
+    assert calls == [2, 1]
+    np.testing.assert_allclose(out["proba"], 1 / (1 + np.exp(-X[:, 0])))
+    # uma versão nova entra e empurra as entradas mais antigas para fora
+    predict_cached(cache, X[:1], "w", _predict(calls))
+    assert cache.stats()["evictions"] == 1 and cache.stats()["entries"] == 3
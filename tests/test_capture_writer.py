@@ -0,0 +1,79 @@
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+import capture
+
+
+def _batch(rows: int):
+    return {"X": np.zeros((rows, 3)), "pred": np.zeros(rows, dtype=int), "proba": np.zeros(rows),
+            "weight": np.ones(rows), "time": time.time(), "id": "test"}
+
+
+def _files(root):
+    return sorted(name for _, _, names in os.walk(root) for name in names)
+
+
+def test_failed_segment_is_closed_and_removed(monkeypatch, tmp_path):
+    segments = []
+    write = capture._Segment.write
+
+    def failing_write(self, batch):
+        segments.append(self)
+        if self.rows:
+            raise OSError("No space left on device")
+        write(self, batch)
+
+    monkeypatch.setattr(capture._Segment, "write", failing_write)
+    writer = capture.CaptureWriter(str(tmp_path), "jsonl", rotate_rows=1000, rotate_s=3600)
+    writer._ensure_thread()
+    with writer._cond:
+        writer._buffer.extend([_batch(2), _batch(3)])
+        writer._buffered_rows = 5
+        writer._cond.notify()
+    writer.close()
+
+    assert segments and segments[0]._file.closed
+    assert _files(tmp_path) == []
+    assert writer.stats()["rows_captured"] == 0
+
+
+def test_segments_are_renamed_on_close(tmp_path):
+    writer = capture.CaptureWriter(str(tmp_path), "jsonl", rotate_rows=1000, rotate_s=3600)
+    writer._ensure_thread()
+    with writer._cond:
+        writer._buffer.append(_batch(4))
+        writer._buffered_rows = 4
+        writer._cond.notify()
+    writer.close()
+
+    files = _files(tmp_path)
+    assert len(files) == 1 and files[0].endswith(".jsonl.gz")
+    assert writer.stats()["rows_captured"] == 4
+
+
+def test_rows_seen_counts_concurrent_submits(monkeypatch, tmp_path):
+    # taxa 0: nenhuma linha é guardada, só contada
+    monkeypatch.setattr(capture, "sampling_probability", lambda X, *args: np.zeros(len(X)))
+    writer = capture.CaptureWriter(str(tmp_path), "jsonl", rotate_rows=1000, rotate_s=3600)
+    X, prediction = np.zeros((1, 3)), {"pred": np.zeros(1), "proba": np.zeros(1)}
+
+    def submit_many():
+        for _ in range(2000):
+            writer.submit(X, prediction)
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        threads = [threading.Thread(target=submit_many) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    finally:
+        sys.setswitchinterval(interval)
+    writer.close()
+    assert writer.stats()["rows_seen"] == 16000
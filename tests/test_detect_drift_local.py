@@ -0,0 +1,87 @@
+import json
+import os
+
+import numpy as np
+
+from src.steps.detect_drift_local import STATE_VERSION, ingest
+
+NAMES = ["a", "b"]
+
+
+def _append(path, rows, hour="2026-10-18T12", weights=None):
+    with open(path, "a") as f:
+        for i, row in enumerate(rows):
+            meta = {"inferenceTime": f"{hour}:30:00Z"}
+            if weights is not None:
+                meta["samplingWeights"] = [weights[i]]
+            f.write(json.dumps({
+                "captureData": {"endpointInput": {"observedContentType": "text/csv", "mode": "INPUT",
+                                                  "data": ",".join(map(str, row)), "encoding": "CSV"}},
+                "eventMetadata": meta,
+            }) + "\n")
+    # o mtime tem de mudar mesmo em sistemas de ficheiros com resolução grosseira
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+
+def _empty_state():
+    return {"version": STATE_VERSION, "baseline": "b", "files": {}, "hours": {}, "last": {}, "max_weight": 1.0}
+
+
+def _rows(hours):
+    return sum(s.item_count for s in hours.values())
+
+
+def test_appended_rows_are_ingested_once(tmp_path):
+    path = tmp_path / "capture.jsonl"
+    _append(path, [[1, 2], [3, 4]])
+    state, rng = _empty_state(), np.random.default_rng(0)
+
+    hours, files, rows = ingest(state, str(tmp_path), NAMES, 64, rng)
+    assert (files, rows, _rows(hours)) == (1, 2, 2)
+    state["hours"] = {k: s.to_state() for k, s in hours.items()}
+
+    _append(path, [[5, 6], [7, 8], [9, 10]], hour="2026-10-18T13")
+    hours, files, rows = ingest(state, str(tmp_path), NAMES, 64, rng)
+    assert (files, rows, _rows(hours)) == (1, 3, 5)
+    assert sorted(hours) == ["2026-10-18T12", "2026-10-18T13"]
+    state["hours"] = {k: s.to_state() for k, s in hours.items()}
+
+    # sem alterações: nada é relido
+    hours, files, rows = ingest(state, str(tmp_path), NAMES, 64, rng)
+    assert (files, rows, _rows(hours)) == (0, 0, 5)
+
+
+def test_rewritten_file_rebuilds_everything(tmp_path):
+    path = tmp_path / "capture.jsonl"
+    _append(path, [[1, 2], [3, 4], [5, 6]])
+    _append(tmp_path / "other.jsonl", [[0, 0]])
+    state, rng = _empty_state(), np.random.default_rng(0)
+    hours, _, _ = ingest(state, str(tmp_path), NAMES, 64, rng)
+    state["hours"] = {k: s.to_state() for k, s in hours.items()}
+
+    path.unlink()
+    _append(path, [[7, 8]])
+    hours, files, rows = ingest(state, str(tmp_path), NAMES, 64, rng)
+    assert (files, rows, _rows(hours)) == (2, 2, 2)
+
+
+
+def test_files_are_thinned_against_one_max_weight(tmp_path):
+    # um ficheiro só com linhas de peso 1 (score alto) e outro com o peso da taxa base (10)
+    _append(tmp_path / "a.jsonl", [[1, 1]] * 2000, weights=[1.0] * 2000)
+    state, rng = _empty_state(), np.random.default_rng(0)
+    hours, _, rows = ingest(state, str(tmp_path), NAMES, 64, rng)
+    assert (rows, state["max_weight"]) == (2000, 1.0)
+    state["hours"] = {k: s.to_state() for k, s in hours.items()}
+
+    # o peso 10 muda o desbaste: as linhas de peso 1 já nos sketches têm de ser relidas a 1/10
+    _append(tmp_path / "b.jsonl", [[0, 0]] * 200, weights=[10.0] * 200)
+    hours, files, rows = ingest(state, str(tmp_path), NAMES, 64, rng)
+    assert files == 2 and state["max_weight"] == 10.0
+    assert 150 <= rows - 200 <= 250
+
+    # com --max-weight fixo, o primeiro ficheiro também fica a 1/10 à primeira
+    state = _empty_state()
+    hours, _, rows = ingest(state, str(tmp_path), NAMES, 64, rng, max_weight=10.0)
+    assert 150 <= rows - 200 <= 250
@@ -0,0 +1,37 @@
+import inference
+
+
+class _Recorder:
+    def __init__(self):
+        self.rows = 0
+
+    def submit(self, X, prediction, *args):
+        self.rows += len(X)
+
+
+def test_reload_warmup_is_not_captured_or_shadowed(monkeypatch, model_dir):
+    """
+    Num hot reload o capture e o shadow já existem: as linhas sintéticas do warmup não lhes chegam.
+    """
+    capture, shadow = _Recorder(), _Recorder()
+    monkeypatch.setattr(inference, "WARMUP_ENABLED", True)
+    monkeypatch.setattr(inference, "_capture", capture)
+    monkeypatch.setattr(inference, "_shadow", shadow)
+
+    model = inference.model_fn(model_dir)
+    assert "warmup_s" in inference.STARTUP
+    assert capture.rows == 0 and shadow.rows == 0
+
+    X = inference.input_fn(b"0," * 29 + b"0\n", "text/csv")
+    inference.predict_fn(X, model)
+    assert capture.rows == 1 and shadow.rows == 1
+
+
+def test_warmup_does_not_touch_the_cache(monkeypatch, model_dir):
+    from cache import PredictionCache
+
+    cache = PredictionCache()
+    monkeypatch.setattr(inference, "WARMUP_ENABLED", True)
+    monkeypatch.setattr(inference, "_cache", cache)
+    inference.model_fn(model_dir)
+    assert cache.stats() == {"entries": 0, "hits": 0, "misses": 0, "evictions": 0, "expired": 0}
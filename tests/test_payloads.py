@@ -0,0 +1,231 @@
+import json
+import struct
+from io import BytesIO
+
+import numpy as np
+import pytest
+
+from payloads import (decode_csv, decode_json, decode_jsonlines, decode_npy, decode_raw_f32, encode_csv, encode_json,
+                      encode_jsonlines, encode_npy, encode_raw_f32, parse_media_type)
+
+N = 4
+
+
+@pytest.fixture
+def rows():
+    return np.random.default_rng(3).normal(size=(5, N)) * 1000
+
+
+def _csv(rows) -> str:
+    return "\n".join(",".join(repr(v) for v in row) for row in rows.tolist()) + "\n"
+
+
+def test_csv_round_trip(rows):
+    out = decode_csv(_csv(rows), n_features=N)
+    assert out.dtype == np.float64
+    np.testing.assert_array_equal(out, rows)
+    # CRLF, linhas vazias e sem newline final
+    text = _csv(rows).replace("\n", "\r\n") + "\r\n"
+    np.testing.assert_array_equal(decode_csv(text.rstrip(), n_features=N), rows)
+
+
+def test_csv_float32(rows):
+    out = decode_csv(_csv(rows), n_features=N, dtype=np.float32)
+    assert out.dtype == np.float32
+    np.testing.assert_array_equal(out, rows.astype(np.float32))
+
+
+@pytest.mark.parametrize("body, message", [
+    ("", "Empty CSV"),
+    ("1,2,3,4\n1,2,3\n", "Row 1: expected 4 values, got 3"),
+    # mesmo total de campos, larguras diferentes
+    ("1,2,3\n4,5,6,7,8\n", "Row 0: expected 4 values, got 3"),
+    ("1,2,x,4\n", "Row 0, column 2: invalid numeric value 'x'"),
+    ("1,2,3,4\n1,nan,3,4\n", "Row 1, column 1: non-finite value 'nan'"),
+    ("1,2,3,inf\n", "Row 0, column 3: non-finite value 'inf'"),
+    ("1,2,3,4\n1,,3,4\n", r"Row 1, column 1: missing value \(empty field\)"),
+    ("1,2,3,4\n-inf,2,3,4\n1,2,3\n", "Row 2: expected 4 values, got 3"),
+    ("1,2,3,4\n1,-Infinity,3,4,5\n", "Row 1: expected 4 values, got 5"),
+    ("1,2,3,4\n1,-Infinity,3,4\n", "Row 1, column 1: non-finite value '-Infinity'"),
+])
+def test_csv_errors(body, message):
+    with pytest.raises(ValueError, match=message):
+        decode_csv(body, n_features=N)
+
+
+def test_json_instances_data_and_flat_row(rows):
+    for key in ("instances", "data"):
+        np.testing.assert_array_equal(decode_json(json.dumps({key: rows.tolist()}), n_features=N), rows)
+    np.testing.assert_array_equal(decode_json(json.dumps({"instances": rows[0].tolist()}), n_features=N), rows[:1])
+
+
+@pytest.mark.parametrize("body, message", [
+    ("[[1, 2, 3, 4]]", "must be an object"),
+    ('{"rows": [[1, 2, 3, 4]]}', "must include 'instances'"),
+    ('{"instances": []}', "non-empty list"),
+    ('{"instances": [[1, 2, 3, 4], [1, 2]]}', "Row 1: expected 4 values, got 2"),
+    ('{"instances": [[1, 2, "x", 4]]}', "Row 0, column 2: invalid numeric value 'x'"),
+    ('{"instances": [[1, 2, 3, 4], [1, null, 3, 4]]}', r"Row 1, column 1: missing value \(null\)"),
+    ('{"instances": [[1, 2, 3, 4], [1, null, 3]]}', "Row 1: expected 4 values, got 3"),
+    ('{"instances": [[1, 2, "x", 4], [1, null, 3]]}', "Row 0, column 2: invalid numeric value 'x'"),
+    ('{"data": [1, NaN, 3, 4]}', "Row 0, column 1: non-finite value nan"),
+    ('{"instances": [[1, 2, 3, "-inf"]]}', "Row 0, column 3: non-finite value '-inf'"),
+])
+def test_json_errors(body, message):
+    with pytest.raises(ValueError, match=message):
+        decode_json(body, n_features=N)
+
+
+def _npy(arr) -> bytes:
+    buf = BytesIO()
+    np.save(buf, arr, allow_pickle=False)
+    return buf.getvalue()
+
+
+@pytest.mark.parametrize("dtype", ["<f8", "<f4", "<i4", "<u2"])
+def test_npy_dtypes(rows, dtype):
+    arr = rows.astype(dtype)
+    out = decode_npy(_npy(arr), n_features=N)
+    assert out.dtype == arr.dtype
+    np.testing.assert_array_equal(out, arr)
+
+
+def test_npy_one_row_and_fortran_order(rows):
+    np.testing.assert_array_equal(decode_npy(_npy(rows[0]), n_features=N), rows[:1])
+    out = decode_npy(_npy(np.asfortranarray(rows)), n_features=N)
+    np.testing.assert_array_equal(out, rows)
+
+
+@pytest.mark.parametrize("body, message", [
+    (b"not a npy file", "Invalid .npy payload"),
+    (_npy(np.array([["a"] * N])), "Unsupported .npy dtype"),
+    (_npy(np.zeros((2, N + 1))), r"Expected .npy shape \(rows, 4\)"),
+    (_npy(np.zeros((2, 2, N))), "Expected .npy shape"),
+    (_npy(np.zeros((2, N)))[:-8], "Truncated .npy payload"),
+    (_npy(np.zeros((2, N))) + b"\0" * 8, "Truncated .npy payload"),
+])
+def test_npy_errors(body, message):
+    with pytest.raises(ValueError, match=message):
+        decode_npy(body, n_features=N)
+
+
+def test_raw_f32(rows):
+    body = struct.pack("<I", len(rows)) + rows.astype("<f4").tobytes()
+    out = decode_raw_f32(body, n_features=N)
+    assert out.dtype == np.float32
+    np.testing.assert_array_equal(out, rows.astype(np.float32))
+
+
+@pytest.mark.parametrize("body, message", [
+    (b"\x01\x00", "missing the row-count header"),
+    (struct.pack("<I", 0), "header says 0 rows"),
+    (struct.pack("<I", 2) + np.zeros(N, "<f4").tobytes(), "header says 2 rows of 4 features"),
+])
+def test_raw_f32_errors(body, message):
+    with pytest.raises(ValueError, match=message):
+        decode_raw_f32(body, n_features=N)
+
+
+def test_binary_encoders():
+    prediction = {"pred": [0, 1, 1], "proba": [0.1, 0.9, 0.75]}
+    expected = np.array([[0, 0.1], [1, 0.9], [1, 0.75]])
+    np.testing.assert_array_equal(np.load(BytesIO(encode_npy(prediction))), expected)
+    np.testing.assert_array_equal(decode_raw_f32(encode_raw_f32(prediction), n_features=2),
+                                  expected.astype(np.float32))
+    # sem proba: a coluna vai a NaN
+    out = np.load(BytesIO(encode_npy({"pred": [1, 0], "proba": None})))
+    np.testing.assert_array_equal(out[:, 0], [1, 0])
+    assert np.isnan(out[:, 1]).all()
+
+
+def test_jsonlines_lists_and_objects(rows):
+    lines = [json.dumps(r) if i % 2 else json.dumps({"features": r}) for i, r in enumerate(rows.tolist())]
+    body = "\n".join(lines[:2]) + "\r\n\n" + "\n".join(lines[2:])
+    np.testing.assert_array_equal(decode_jsonlines(body, n_features=N), rows)
+
+
+@pytest.mark.parametrize("body, message", [
+    ("\n  \n", "Empty JSON Lines payload"),
+    ("[1, 2, 3, 4]\n[1, 2,\n", "Row 1: invalid JSON"),
+    ('[1, 2, 3, 4]\n{"other": [1, 2, 3, 4]}\n', "Row 1: expected a list of 4 values, got NoneType"),
+    ("[1, 2, 3, 4]\n[1, 2, 3]\n", "Row 1: expected 4 values, got 3"),
+    ('[1, 2, 3, 4]\n{"features": [1, 2, null, 4]}\n', r"Row 1, column 2: missing value \(null\)"),
+    ('[1, 2, 3, 4]\n[NaN, 2, 3, 4]\n', "Row 1, column 0: non-finite value nan"),
+])
+def test_jsonlines_errors(body, message):
+    with pytest.raises(ValueError, match=message):
+        decode_jsonlines(body, n_features=N)
+
+
+@pytest.fixture
+def prediction():
+    proba = np.random.default_rng(4).random(6)
+    return {"pred": (proba >= 0.5).astype(np.int64), "proba": proba}
+
+
+def test_text_encoders_match_json(prediction):
+    pred, proba = prediction["pred"].tolist(), prediction["proba"].tolist()
+    assert json.loads(encode_json(prediction)) == {"pred": pred, "proba": proba}
+    assert encode_json(prediction) == json.dumps({"pred": pred, "proba": proba})
+    assert encode_jsonlines(prediction) == "".join(json.dumps({"pred": p, "proba": q}) + "\n"
+                                                   for p, q in zip(pred, proba))
+    assert encode_csv(prediction) == "".join(f"{p},{q!r}\n" for p, q in zip(pred, proba))
+
+
+def test_text_encoders_precision(prediction):
+    proba = [round(q, 3) for q in prediction["proba"].tolist()]
+    assert json.loads(encode_json(prediction, precision=3))["proba"] == proba
+    assert [json.loads(ln)["proba"] for ln in encode_jsonlines(prediction, precision=3).splitlines()] == proba
+    assert [ln.split(",")[1] for ln in encode_csv(prediction, precision=3).splitlines()] == [f"{q:.3f}" for q in proba]
+
+
+def test_text_encoders_without_proba():
+    prediction = {"pred": np.array([1, 0]), "proba": None}
+    assert encode_json(prediction) == '{"pred": [1, 0], "proba": null}'
+    assert encode_csv(prediction) == "1,\n0,\n"
+    assert encode_jsonlines(prediction) == '{"pred": 1, "proba": null}\n{"pred": 0, "proba": null}\n'
+
+
+def test_text_encoders_fallback_and_empty():
+    # NaN/inf não cabem no caminho formatado: passam pelo json.dumps, como null
+    prediction = {"pred": np.array([1, 0, 1]), "proba": np.array([0.5, np.nan, np.inf])}
+    assert encode_json(prediction) == '{"pred": [1, 0, 1], "proba": [0.5, null, null]}'
+    assert encode_csv(prediction) == "1,0.5\n0,nan\n1,inf\n"
+    assert encode_jsonlines(prediction) == ('{"pred": 1, "proba": 0.5}\n{"pred": 0, "proba": null}\n'
+                                            '{"pred": 1, "proba": null}\n')
+    for body in [encode_json(prediction)] + encode_jsonlines(prediction).splitlines():
+        json.loads(body, parse_constant=lambda name: pytest.fail(f"invalid JSON constant {name}"))
+
+    empty = {"pred": np.array([], dtype=np.int64), "proba": np.array([])}
+    assert encode_json(empty) == '{"pred": [], "proba": []}'
+    assert encode_csv(empty) == ""
+    assert encode_jsonlines(empty) == ""
+
+
+def test_parse_media_type():
+    assert parse_media_type(None) == ("", {})
+    assert parse_media_type("Application/JSON") == ("application/json", {})
+    assert parse_media_type('application/json; Precision="4"; explain=3') == (
+        "application/json", {"precision": "4", "explain": "3"})
+
+
+def test_text_encoders_with_contributions():
+    prediction = {
+        "pred": np.array([1, 0]),
+        "proba": np.array([0.9, 0.2]),
+        "contributions": {
+            "names": ["Time", "V1", "Amount"],
+            "features": np.array([[2, 0], [1, 2]]),
+            "values": np.array([[1.25, -0.5], [-0.75, 0.125]]),
+            "base": -3.5,
+        },
+    }
+    body = json.loads(encode_json(prediction))
+    assert body["contributions"] == [{"Amount": 1.25, "Time": -0.5}, {"V1": -0.75, "Amount": 0.125}]
+    assert body["base_value"] == -3.5
+    # a ordem das features é a do scorer
+    assert list(body["contributions"][0]) == ["Amount", "Time"]
+    assert encode_csv(prediction) == "1,0.9,Amount,1.25,Time,-0.5\n0,0.2,V1,-0.75,Amount,0.125\n"
+    lines = [json.loads(ln) for ln in encode_jsonlines(prediction, precision=1).splitlines()]
+    assert lines == [{"pred": 1, "proba": 0.9, "contributions": {"Amount": 1.2, "Time": -0.5}},
+                     {"pred": 0, "proba": 0.2, "contributions": {"V1": -0.8, "Amount": 0.1}}]
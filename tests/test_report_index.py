@@ -0,0 +1,89 @@
+import json
+import os
+
+import pytest
+
+from src.common.report_index import ReportIndex, execution_time, run_written
+from src.steps.index_monitoring_reports import ingest
+
+HOUR = 1792328400  # 2026-10-18T13:00Z
+
+
+def _write_execution(root, minute: int, mean: float, drift: bool, only: str = ""):
+    folder = os.path.join(root, "fraud-endpoint", "dq-5min", "2026", "10", "18", "13")
+    os.makedirs(folder, exist_ok=True)
+    statistics = {"dataset": {"item_count": 10}, "features": [
+        {"name": "Amount", "inferred_type": "Fractional",
+         "numerical_statistics": {"common": {"num_present": 10, "num_missing": 0}, "mean": mean}}]}
+    violations = {"violations": [
+        {"feature_name": "Amount", "constraint_check_type": "baseline_drift_check",
+         "description": "Baseline drift distance: 0.3 exceeds threshold: 0.1"}] if drift else []}
+    for name, report in (("statistics.json", statistics), ("constraint_violations.json", violations)):
+        if only and name != only:
+            continue
+        path = os.path.join(folder, name)
+        with open(path, "w") as f:
+            json.dump(report, f)
+        # a segunda escrita da mesma execução sai uns segundos depois
+        written = HOUR + minute * 60 + (3 if name.startswith("constraint") else 0)
+        os.utime(path, (written, written))
+
+
+def test_executions_in_the_same_hour_are_kept_apart(tmp_path):
+    reports, index_dir = str(tmp_path / "reports"), str(tmp_path / "index")
+    _write_execution(reports, 0, mean=1.0, drift=False)
+    assert ingest(ReportIndex(index_dir), reports, workers=1)["read"] == 2
+
+    # a execução seguinte do schedule de 5 minutos escreve por cima na mesma pasta HH/
+    _write_execution(reports, 5, mean=2.0, drift=True)
+    _write_execution(reports, 10, mean=3.0, drift=True)
+    index = ReportIndex(index_dir)
+    assert ingest(index, reports, workers=1)["read"] == 2
+
+    # a de 13:05 foi escrita por cima antes de ser lida; as de 13:00 e 13:10 ficam as duas
+    trend = index.trend("Amount", "mean")
+    assert trend["mean"].tolist() == [1.0, 3.0]
+    assert [t.minute for t in trend["execution_time"]] == [0, 10]
+    assert index.onset("Amount") == [{"schedule": "dq-5min", "since": "2026-10-18T13:10:00+00:00",
+                                      "executions": 1, "last_execution": "2026-10-18T13:10:00+00:00"}]
+
+
+def test_report_rewritten_alone_is_a_new_execution(tmp_path):
+    reports, index_dir = str(tmp_path / "reports"), str(tmp_path / "index")
+    _write_execution(reports, 0, mean=1.0, drift=False)
+    index = ReportIndex(index_dir)
+    ingest(index, reports, workers=1)
+
+    # uma execução posterior só reescreve constraint_violations.json
+    _write_execution(reports, 20, mean=2.0, drift=True, only="constraint_violations.json")
+    index = ReportIndex(index_dir)
+    assert ingest(index, reports, workers=1)["read"] == 1
+    assert [t.minute for t in index.violations("Amount")["execution_time"]] == [20]
+    assert index.trend("Amount", "mean")["mean"].tolist() == [1.0]
+    assert index.onset("Amount")[0]["since"] == "2026-10-18T13:20:03+00:00"
+
+
+def test_run_written():
+    assert run_written([]) == []
+    assert run_written([HOUR + 3, HOUR]) == [HOUR, HOUR]
+    assert run_written([HOUR, HOUR + 1203]) == [HOUR, HOUR + 1203]
+    # agrupa a partir do primeiro relatório do grupo, não em cadeia
+    assert run_written([HOUR, HOUR + 50, HOUR + 100]) == [HOUR, HOUR, HOUR + 100]
+
+
+def test_unknown_feature_returns_nothing(tmp_path):
+    reports, index_dir = str(tmp_path / "reports"), str(tmp_path / "index")
+    _write_execution(reports, 0, mean=1.0, drift=True)
+    index = ReportIndex(index_dir)
+    ingest(index, reports, workers=1)
+    assert not index.has_feature("V99")
+    assert index.stats("V99").empty
+    assert index.violations("V99").empty
+    assert index.trend("V99", "distance").empty
+    assert index.onset("V99") == []
+
+
+@pytest.mark.parametrize("written, expected", [
+    (None, HOUR), (HOUR + 310.5, HOUR + 310), (HOUR + 4000, HOUR + 4000), (HOUR + 86400, HOUR), (HOUR - 1, HOUR)])
+def test_execution_time(written, expected):
+    assert execution_time(HOUR, written) == expected
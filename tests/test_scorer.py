@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import MinMaxScaler
+
+from conftest import N_FEATURES
+from scorer import compile_model
+
+
+@pytest.fixture(scope="module")
+def X():
+    rng = np.random.default_rng(7)
+    return rng.normal(size=(2000, N_FEATURES)) * rng.uniform(0.5, 50, size=N_FEATURES)
+
+
+def test_float64_matches_sklearn(pipeline, X):
+    scorer = compile_model(pipeline, dtype="float64")
+    pred, proba = scorer.predict_with_proba(X)
+    np.testing.assert_array_equal(pred, pipeline.predict(X))
+    np.testing.assert_allclose(proba, pipeline.predict_proba(X)[:, 1], rtol=1e-12, atol=1e-15)
+    np.testing.assert_allclose(scorer.decision_function(X), pipeline.decision_function(X), rtol=1e-10, atol=1e-10)
+    np.testing.assert_allclose(scorer.predict_proba(X), pipeline.predict_proba(X), rtol=1e-12, atol=1e-15)
+
+
+def test_float32_is_close_to_sklearn(pipeline, X):
+    scorer = compile_model(pipeline, dtype="float32")
+    proba = scorer.predict_with_proba(X)[1]
+    np.testing.assert_allclose(proba, pipeline.predict_proba(X)[:, 1], atol=1e-5)
+
+
+def test_single_row_and_width_check(pipeline, X):
+    scorer = compile_model(pipeline)
+    pred, proba = scorer.predict_with_proba(X[0])
+    assert pred.shape == proba.shape == (1,)
+    with pytest.raises(ValueError, match="features"):
+        scorer.predict_with_proba(X[:, :-1])
+
+
+def test_contributions_add_up_to_the_logit(pipeline, X):
+    scorer = compile_model(pipeline)
+    pred, proba, idx, values = scorer.predict_with_contributions(X[:50], top_k=0)
+    np.testing.assert_allclose(scorer.intercept + values.sum(axis=1), pipeline.decision_function(X[:50]),
+                               rtol=1e-9, atol=1e-9)
+    top = scorer.predict_with_contributions(X[:50], top_k=3)
+    np.testing.assert_array_equal(top[2], idx[:, :3])
+    assert np.all(np.diff(np.abs(values), axis=1) <= 0)
+
+
+def test_other_models_are_not_compiled(pipeline, X):
+    y = pipeline.predict(X)
+    assert compile_model(RandomForestClassifier(n_estimators=2).fit(X, y)) is None
+    minmax = Pipeline([("scaler", MinMaxScaler()), ("clf", LogisticRegression())]).fit(X, y)
+    assert compile_model(minmax) is None
+    bare = LogisticRegression(max_iter=1000).fit(X, y)
+    np.testing.assert_allclose(compile_model(bare).predict_with_proba(X)[1], bare.predict_proba(X)[:, 1],
+                               rtol=1e-12, atol=1e-15)
+
+
+@pytest.mark.parametrize("value", [np.nan, np.inf, -np.inf])
+def test_non_finite_input_is_rejected_like_sklearn(pipeline, X, value):
+    bad = X[:5].copy()
+    bad[3, 7] = value
+    with pytest.raises(ValueError, match="Input X contains"):
+        pipeline.predict_proba(bad)
+    scorer = compile_model(pipeline)
+    for score in (scorer.predict_with_proba, scorer.decision_function,
+                  lambda rows: scorer.predict_with_contributions(rows, top_k=3)):
+        with pytest.raises(ValueError, match=r"Row 3, column 7: non-finite value"):
+            score(bad)
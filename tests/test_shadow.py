@@ -0,0 +1,35 @@
+import time
+
+import numpy as np
+
+from shadow import Shadow
+
+
+def _slow_predict(X, model):
+    time.sleep(0.05)
+    return {"pred": np.zeros(len(X), dtype=int), "proba": np.zeros(len(X))}
+
+
+def _wait(condition, timeout_s=5.0):
+    deadline = time.monotonic() + timeout_s
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.005)
+    assert condition()
+
+
+def test_queue_is_bounded_by_estimated_time(tmp_path):
+    shadow = Shadow(None, _slow_predict, lambda model: "champion", "challenger",
+                    max_cpu_fraction=1.0, max_backlog_ms=120, log_path=str(tmp_path / "shadow.jsonl"))
+    X = np.zeros((1, 3))
+    champion = {"pred": np.zeros(1, dtype=int), "proba": np.zeros(1)}
+
+    # o primeiro batch ensina o custo (~50 ms por linha)
+    shadow.submit(X, champion, None, 0.001)
+    _wait(lambda: shadow.batches == 1 and shadow.stats()["backlog_ms"] == 0)
+
+    for _ in range(5):
+        shadow.submit(X, champion, None, 0.001)
+    assert shadow.dropped == 3
+    assert shadow.stats()["backlog_ms"] <= 120
+    _wait(lambda: shadow.batches == 3)
+    assert len((tmp_path / "shadow.jsonl").read_text().splitlines()) == 3
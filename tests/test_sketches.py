@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+from src.common.sketches import FeatureSketch, KLLSketch, linf_distance
+
+QS = np.linspace(0.01, 0.99, 99)
+
+
+def _rank_error(sketch: KLLSketch, sorted_values: np.ndarray) -> float:
+    """
+    Maior erro de rank (fração de n) dos quantis estimados.
+    """
+    ranks = np.searchsorted(sorted_values, sketch.quantile(QS), side="right") / len(sorted_values)
+    return float(np.max(np.abs(ranks - QS)))
+
+
+@pytest.fixture(scope="module")
+def values():
+    return np.random.default_rng(1).lognormal(size=200_000)
+
+
+def test_single_pass_quantiles(values):
+    sketch = KLLSketch(k=256, seed=0)
+    for chunk in np.array_split(values, 50):
+        sketch.update(chunk)
+    assert sketch.weight == len(values)
+    assert _rank_error(sketch, np.sort(values)) < 0.02
+
+
+def test_merge_matches_single_pass_accuracy(values):
+    parts = []
+    for i, chunk in enumerate(np.array_split(values, 16)):
+        part = KLLSketch(k=256, seed=i)
+        part.update(chunk)
+        parts.append(part)
+    merged = parts[0]
+    for part in parts[1:]:
+        merged.merge(part)
+    assert merged.weight == len(values)
+    assert _rank_error(merged, np.sort(values)) < 0.02
+    # memória limitada: muito menos itens do que valores
+    assert len(merged.items()) < 10 * 256
+
+
+def test_cdf_and_round_trip(values):
+    sketch = KLLSketch(k=256, seed=0)
+    sketch.update(values)
+    points = np.quantile(values, [0.1, 0.5, 0.9])
+    assert np.allclose(sketch.cdf(points), [0.1, 0.5, 0.9], atol=0.02)
+    restored = KLLSketch.from_dict(sketch.to_dict())
+    assert np.array_equal(restored.quantile(QS), sketch.quantile(QS))
+
+
+def test_linf_distance_separates_shifted_data(values):
+    a, b, shifted = KLLSketch(k=256, seed=0), KLLSketch(k=256, seed=1), KLLSketch(k=256, seed=2)
+    a.update(values[::2])
+    b.update(values[1::2])
+    shifted.update(values[1::2] * 1.5)
+    assert linf_distance(a, b) < 0.03
+    assert linf_distance(a, shifted) > 0.1
+
+
+def test_feature_sketch_merge_matches_single_pass(values):
+    whole = FeatureSketch("x", k=256)
+    whole.update(values)
+    merged = FeatureSketch("x", k=256)
+    for chunk in np.array_split(values, 7):
+        part = FeatureSketch("x", k=256)
+        part.update(chunk)
+        merged.merge(part)
+    assert merged.num_numeric == whole.num_numeric
+    assert merged.mean == pytest.approx(values.mean())
+    assert merged.std_dev == pytest.approx(values.std())
+    assert (merged.min, merged.max) == (values.min(), values.max())
@@ -0,0 +1,80 @@
+import io
+import time
+
+import pytest
+
+import admission
+import wsgi
+from batch_transform import stream_transform
+from scorer import compile_model
+
+
+@pytest.fixture
+def app(monkeypatch, pipeline):
+    monkeypatch.setattr(wsgi, "RELOAD_INTERVAL_S", 0)
+    monkeypatch.setattr(wsgi, "_model", compile_model(pipeline))
+    monkeypatch.setattr(wsgi, "_model_dir", "test")
+    monkeypatch.setattr(wsgi, "_limiter", admission.InflightLimiter(limit=1))
+    return wsgi.app
+
+
+def _stream(app, rows: int, **headers):
+    """
+    POST text/csv -> text/csv sem Content-Length, o que força o caminho de streaming.
+    Devolve (status, corpo).
+    """
+    body = b"".join(b",".join([b"0"] * 30) + b"\n" for _ in range(rows))
+    environ = {"PATH_INFO": "/invocations", "REQUEST_METHOD": "POST", "CONTENT_TYPE": "text/csv",
+               "HTTP_ACCEPT": "text/csv", "wsgi.input": io.BytesIO(body), **headers}
+    status = []
+    out = b"".join(app(environ, lambda s, h: status.append(int(s.split()[0]))))
+    return status[0], out
+
+
+def test_stream_enforces_row_limit(monkeypatch, app):
+    monkeypatch.setattr(admission, "MAX_ROWS", 5)
+    status, out = _stream(app, 5)
+    assert status == 200 and len(out.splitlines()) == 5
+    status, out = _stream(app, 6)
+    assert status == 413
+    assert wsgi._limiter.inflight == 0
+
+
+def test_stream_enforces_row_limit_across_chunks(pipeline):
+    row = b",".join([b"0"] * 30) + b"\n"
+    chunks = stream_transform(iter([row] * 6), "text/csv", "text/csv", compile_model(pipeline),
+                              chunk_rows=2, max_rows=5)
+    next(chunks)
+    next(chunks)
+    with pytest.raises(admission.TooManyRows):
+        next(chunks)
+
+
+def test_stream_is_shed_when_worker_is_full(app):
+    assert wsgi._limiter.try_acquire()
+    try:
+        status, _ = _stream(app, 1)
+    finally:
+        wsgi._limiter.release()
+    assert status == 503
+    assert _stream(app, 1)[0] == 200
+    assert wsgi._limiter.inflight == 0
+
+
+def test_stream_deadline_counts_time_before_the_app(app):
+    started = f"t={time.time() - 1:.3f}"
+    status, _ = _stream(app, 1, HTTP_X_REQUEST_START=started, HTTP_X_BYOC_DEADLINE_MS="500")
+    assert status == 504
+    assert _stream(app, 1, HTTP_X_BYOC_DEADLINE_MS="500")[0] == 200
+    assert wsgi._limiter.inflight == 0
+
+
+@pytest.mark.parametrize("value", ["t={:.3f}", "{:.0f}", "t={:.0f}"])
+def test_request_start_units(value):
+    now = time.perf_counter()
+    epoch = time.time() - 2
+    scale = 1 if value == "t={:.3f}" else (1000 if value == "{:.0f}" else 1_000_000)
+    arrived = admission.request_start(now, value.format(epoch * scale))
+    assert 1.9 < now - arrived < 2.5
+    assert admission.request_start(now, "garbage") == now
+    assert admission.request_start(now, f"t={time.time() + 60}") == now